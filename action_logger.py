@@ -1,20 +1,171 @@
 """
 Comprehensive Action Logger for Ultron Agent 2
 Logs all system actions, user inputs, responses, and system status changes.
+
+Actions are appended to ``actions_<session>.jsonl`` (one JSON object per
+line) by a background `ActionLogWriter` that commits them in groups, so
+``log_action`` never waits for disk I/O.  Only the most recent
+``max_retained_actions`` entries are kept in memory; the session summary
+is built from running counters.
+
+Both the text log and the action log are kept in rotated, gzip-compressed
+segments with retention under ``segment_dir`` (default: ``logs`` next to
+the log file, see `utils.log_storage.SegmentedLog`), and `read_actions`
+only opens the segments that overlap the requested time window.
+``segmented=False`` opts back into the flat, unbounded
+``ultron_actions.log`` and ``actions_<session>.jsonl`` files.
+
+Actions are also indexed in SQLite (see `utils.action_index.ActionIndex`)
+for filtered, aggregate and full-text queries, which back the API's
+``/actions`` endpoints.  The index lives at ``index_path`` (default:
+``actions.db`` in the segment directory); ``indexed=False`` turns it off.
 """
 
 import logging
 import json
+import queue
+import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 import threading
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
+
+from utils.action_index import ActionIndex, init_action_index
+from utils.log_storage import SegmentedLog, SegmentedLogHandler, json_timestamp
+
+
+class ActionLogWriter:
+    """Background thread that appends action entries to a JSONL file.
+
+    Entries are written in groups: a batch is committed once it holds
+    ``flush_size`` entries, once ``flush_interval`` seconds have passed
+    since its first entry, on `flush`, and on `close`.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: Path, flush_size: int = 64, flush_interval: float = 1.0, max_queue: int = 10000,
+                 storage: Optional[SegmentedLog] = None, index: Optional[ActionIndex] = None):
+        self.path = Path(path)
+        self.storage = storage
+        self.index = index
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self.stats = {"written": 0, "batches": 0, "dropped": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="ultron-action-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """Queue an entry for writing; returns False if the queue is full."""
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Block until everything submitted so far is on disk."""
+        if not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._commit(batch)
+                batch = []
+                continue
+            if item is self._STOP:
+                self._commit(batch)
+                return
+            if isinstance(item, threading.Event):
+                self._commit(batch)
+                batch = []
+                item.set()
+                continue
+            batch.append(item)
+            if len(batch) == 1:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.flush_size:
+                self._commit(batch)
+                batch = []
+
+    def _commit(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        lines = [json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in batch]
+        removed = self.storage.stats["segments_removed"] if self.storage is not None else 0
+        try:
+            if self.storage is not None:
+                # Segment time ranges follow the actions' own timestamps, which
+                # is what index pruning compares against
+                times = [ts for ts in map(json_timestamp, lines) if ts is not None]
+                if times:
+                    self.storage.write_many(lines, min(times), max(times))
+                else:
+                    self.storage.write_many(lines)
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.getLogger(__name__).error(f"Failed to write {len(batch)} actions to {self.path}: {e}")
+        if self.index is not None:
+            try:
+                self.index.add_many(batch)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.getLogger(__name__).error(f"Failed to index {len(batch)} actions: {e}")
+            if self.storage is not None and self.storage.stats["segments_removed"] != removed:
+                self._prune_index()
+
+    def _prune_index(self) -> None:
+        """Drop index rows older than the oldest segment retention kept."""
+        segments = self.storage.segments_between()
+        try:
+            self.index.prune(before=segments[0]["start"] if segments else None)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.getLogger(__name__).error(f"Failed to prune the action index: {e}")
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Write the remaining entries and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+        if self.storage is not None:
+            self.storage.close()
+
 
 class ActionLogger:
-    def __init__(self, log_file: str = "ultron_actions.log", config_file: str = "ultron_config.json"):
+    def __init__(self, log_file: str = "ultron_actions.log", config_file: str = "ultron_config.json",
+                 max_retained_actions: int = 1000, flush_size: int = 64, flush_interval: float = 1.0,
+                 segment_dir: Optional[str] = None, index_path: Optional[str] = None, segmented: bool = True,
+                 indexed: bool = True):
         self.log_file = Path(log_file)
         self.config_file = Path(config_file)
         self.lock = threading.Lock()
+        self.max_retained_actions = max_retained_actions
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.segment_dir = None
+        if segmented:
+            self.segment_dir = Path(segment_dir) if segment_dir else Path(log_file).parent / "logs"
+        self.index_path = None
+        if indexed:
+            self.index_path = index_path or str((self.segment_dir or Path(log_file).parent / "logs") / "actions.db")
         
         # Setup comprehensive logging
         self.setup_logging()
@@ -34,15 +185,27 @@ class ActionLogger:
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
             handlers=[
-                logging.FileHandler(self.log_file, encoding='utf-8'),
+                (SegmentedLogHandler(self.segment_dir, self.log_file.stem) if self.segment_dir
+                 else logging.FileHandler(self.log_file, encoding='utf-8')),
                 logging.StreamHandler()  # Also log to console
             ]
         )
         self.logger = logging.getLogger(__name__)
         
-        # Create separate detailed action log
-        self.action_log_file = self.log_file.parent / f"actions_{self.session_id}.json"
-        self.actions = []
+        # Create separate detailed action log (append-only JSONL)
+        self.action_log_file = self.log_file.parent / f"actions_{self.session_id}.jsonl"
+        self.actions = deque(maxlen=self.max_retained_actions)
+        self.action_counts: Dict[str, int] = {}
+        self.total_actions = 0
+        self.session_start: Optional[str] = None
+        self.action_storage = SegmentedLog(self.segment_dir, "actions") if self.segment_dir else None
+        self.action_index = None
+        if self.index_path:
+            # Index rows live as long as the segments they were logged to
+            retention = self.action_storage.retention_seconds if self.action_storage else 7 * 24 * 3600.0
+            self.action_index = init_action_index(self.index_path, retention_seconds=retention)
+        self.writer = ActionLogWriter(self.action_log_file, self.flush_size, self.flush_interval,
+                                      storage=self.action_storage, index=self.action_index)
     
     def load_config(self) -> Dict[str, Any]:
         """Load configuration for context"""
@@ -67,14 +230,18 @@ class ActionLogger:
                 "details": details or {}
             }
             
-            # Add to memory
+            # Keep a bounded window in memory and update the running counters
             self.actions.append(action_entry)
+            self.total_actions += 1
+            self.action_counts[action_type] = self.action_counts.get(action_type, 0) + 1
+            if self.session_start is None:
+                self.session_start = timestamp
             
             # Log to file immediately
             self.logger.info(f"[{action_type}] {description}")
             
-            # Save detailed JSON log
-            self.save_action_log()
+            # Hand the entry to the background JSONL writer
+            self.writer.submit(action_entry)
     
     def log_user_input(self, input_text: str, input_method: str = "text"):
         """Log user input"""
@@ -209,33 +376,69 @@ class ActionLogger:
             }
         )
     
-    def save_action_log(self):
-        """Save actions to JSON file"""
+    def save_action_log(self) -> bool:
+        """Flush queued actions to the JSONL action log"""
         try:
-            with open(self.action_log_file, 'w', encoding='utf-8') as f:
-                json.dump(self.actions, f, indent=2, ensure_ascii=False)
+            if not self.writer.flush():
+                self.logger.error("Timed out flushing action log")
+                return False
+            return True
         except Exception as e:
             self.logger.error(f"Failed to save action log: {e}")
+            return False
+    
+    def read_actions(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """Yield logged actions between ``start`` and ``end`` from disk"""
+        self.save_action_log()
+        start_ts = start.timestamp() if start else None
+        end_ts = end.timestamp() if end else None
+        if self.action_storage is not None:
+            lines = self.action_storage.read_lines(start_ts, end_ts, timestamp_of=json_timestamp)
+        elif self.action_log_file.exists():
+            lines = open(self.action_log_file, 'r', encoding='utf-8')
+        else:
+            return
+        try:
+            for line in lines:
+                try:
+                    action = json.loads(line)
+                    ts = datetime.fromisoformat(action["timestamp"]).timestamp()
+                except (ValueError, KeyError):
+                    continue
+                if (start_ts is None or ts >= start_ts) and (end_ts is None or ts <= end_ts):
+                    yield action
+        finally:
+            lines.close()
     
     def get_session_summary(self) -> Dict[str, Any]:
         """Get summary of current session"""
-        action_counts = {}
-        for action in self.actions:
-            action_type = action["action_type"]
-            action_counts[action_type] = action_counts.get(action_type, 0) + 1
-        
-        return {
-            "session_id": self.session_id,
-            "total_actions": len(self.actions),
-            "action_counts": action_counts,
-            "session_start": self.actions[0]["timestamp"] if self.actions else None,
-            "session_duration": len(self.actions)
-        }
+        with self.lock:
+            duration = 0.0
+            if self.session_start:
+                duration = (datetime.now() - datetime.fromisoformat(self.session_start)).total_seconds()
+            # The .jsonl file is only written in legacy (unsegmented) mode
+            if self.action_storage is not None:
+                segment = self.action_storage.current_segment()
+                location = {"action_log_dir": str(self.action_storage.directory),
+                            "action_log_segment": str(segment) if segment else None}
+            else:
+                location = {"action_log_file": str(self.action_log_file)}
+            return {
+                "session_id": self.session_id,
+                "total_actions": self.total_actions,
+                "action_counts": dict(self.action_counts),
+                "session_start": self.session_start,
+                "session_duration": round(duration, 3),
+                "retained_actions": len(self.actions),
+                **location,
+                "dropped_actions": self.writer.stats["dropped"],
+            }
     
     def shutdown(self):
         """Shutdown logger and save final state"""
         self.log_action("SYSTEM_SHUTDOWN", "Ultron Agent 2 session ended")
         self.save_action_log()
+        self.writer.close()
         
         # Save session summary
         summary = self.get_session_summary()
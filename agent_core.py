@@ -18,6 +18,9 @@ from datetime import datetime
 import uuid
 import traceback
 import uvicorn
+from utils.log_storage import SegmentedLogHandler
+from utils.tracing import current_span, traced
+from ultron_agent.logging_config import RateLimitFilter, queue_handlers
 
 class UltronAgent:
     """Core ULTRON agent with essential functionality"""
@@ -71,8 +74,8 @@ class UltronAgent:
             '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
         )
 
-        # Setup file handler
-        file_handler = logging.FileHandler('ultron_agent_core.log')
+        # Setup file handler (rotated, compressed segments with retention)
+        file_handler = SegmentedLogHandler('logs', 'ultron_agent_core')
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
 
@@ -84,18 +87,22 @@ class UltronAgent:
         # Configure logger
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-
-        # Also configure root logger
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('ultron.log'),
-                logging.StreamHandler()
-            ]
-        )
+        # File and console I/O happen on a background listener thread; per-event
+        # INFO logs (pings, clicks, chat messages) are rate-limited per call site.
+        # The filter sits on the logger so it also applies to records that
+        # propagate to the root handlers
+        self.logger.addFilter(RateLimitFilter())
+        self.logger.addHandler(queue_handlers(file_handler, console_handler))
+
+        # Also configure root logger, unless the entry point already did
+        if not logging.getLogger().handlers:
+            root_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            root_handlers = [SegmentedLogHandler('logs', 'ultron'), logging.StreamHandler()]
+            for handler in root_handlers:
+                handler.setFormatter(root_formatter)
+            root_handler = queue_handlers(*root_handlers)
+            root_handler.addFilter(RateLimitFilter())
+            logging.basicConfig(level=logging.INFO, handlers=[root_handler])
 
     async def initialize(self):
         """Initialize agent - required by web_bridge.py"""
@@ -213,6 +220,7 @@ class UltronAgent:
 
         self.logger.info("✅ Socket.IO events configured")
 
+    @traced("llm.nvidia_chat")
     async def process_user_message(self, session_id: str, user_text: str, model: str):
         """Process user message with NVIDIA models"""
         self.logger.info(f"🔄 Processing message for {session_id} with model {model}")
@@ -232,6 +240,7 @@ class UltronAgent:
 
             model_id = self.nvidia_models.get(model, self.nvidia_models[self.current_model])
             self.logger.info(f"🎯 Using model ID: {model_id}")
+            current_span().set_attribute("model", model_id)
 
             # Enhanced prompt with context awareness
             enhanced_messages = await self.enhance_messages_with_context(messages, session_id)
@@ -265,6 +274,7 @@ class UltronAgent:
                     }, to=session_id)
 
             self.logger.info(f"✅ Streaming complete: {chunk_count} chunks, {len(assistant_response)} characters")
+            current_span().set_attribute("chunks", chunk_count)
 
             # Add assistant response to conversation history
             self.conversations[session_id].append({
@@ -289,6 +299,7 @@ class UltronAgent:
 
         except Exception as e:
             self.error_counts['nvidia_api'] = self.error_counts.get('nvidia_api', 0) + 1
+            current_span().set_error(e)
             self.logger.error(f"❌ NVIDIA API error (error #{self.error_counts['nvidia_api']}): {e}")
             self.logger.error(traceback.format_exc())
             await self.sio.emit('error', {
@@ -8,10 +8,11 @@ from os import path as os_path, listdir
 from re import sub as re_sub
 from json import loads as json_loads, dumps as json_dumps, JSONDecodeError
 from requests import get as requests_get
-from asyncio import new_event_loop, set_event_loop, TimeoutError as AsyncTimeoutError
+from asyncio import new_event_loop, set_event_loop, to_thread, TimeoutError as AsyncTimeoutError
 from aiohttp import ClientSession, ClientError, ClientTimeout
 from pathlib import Path
 from security_utils import sanitize_log_input, sanitize_html_output, validate_file_path
+from utils.tracing import span, traced
 
 from tools.openai_tools import OpenAITools
 
@@ -65,8 +66,16 @@ class UltronBrain:
         if not prompt or not prompt.strip():
             return "Empty prompt provided."
 
-        ollama_base_url = self.config.get("ollama_base_url", "http://localhost:11434")
         model = self.config.get("llm_model", "qwen2.5:latest")
+        with span("llm.ollama_chat", model=model, prompt_chars=len(prompt)) as llm_span:
+            reply = await self._ollama_chat(prompt, model, progress_callback)
+            llm_span.set_attribute("reply_chars", len(reply))
+            if reply.startswith("[") and reply.endswith("]"):
+                llm_span.set_error(reply)
+            return reply
+
+    async def _ollama_chat(self, prompt: str, model: str, progress_callback=None) -> str:
+        ollama_base_url = self.config.get("ollama_base_url", "http://localhost:11434")
 
         info(f"Sending prompt to Ollama model '{sanitize_log_input(model)}' at {sanitize_log_input(ollama_base_url)}")
 
@@ -178,6 +187,7 @@ class UltronBrain:
             error(f"Error in think method: {sanitize_log_input(str(e))}")
             return f"Error processing request: {sanitize_html_output(str(e))}"
 
+    @traced("brain.plan_and_act")
     async def plan_and_act(self, message, progress_callback=None):
         """Enhanced planning and action execution with Ollama integration"""
 
@@ -188,16 +198,22 @@ class UltronBrain:
             # Check if this is a simple greeting or status request
             message_lower = message.lower().strip()
 
-            if any(greeting in message_lower for greeting in ["hello", "hi", "hey", "greetings"]):
-                prompt = f"You are ULTRON, an advanced AI assistant. Respond to this greeting in character: {message}"
-            elif any(status in message_lower for status in ["status", "how are you", "state"]):
-                prompt = f"You are ULTRON, an advanced AI assistant. Respond about your current status: {message}"
-            elif "help" in message_lower:
-                available_tools = [tool.__class__.__name__ for tool in self.tools] if self.tools else ["No tools loaded"]
-                prompt = f"You are ULTRON, an advanced AI assistant. List your capabilities and available tools. Available tools: {', '.join(available_tools)}. User asked: {message}"
-            else:
-                # For complex requests, use enhanced prompting
-                prompt = self._build_enhanced_prompt(message)
+            with span("brain.route_intent") as route_span:
+                if any(greeting in message_lower for greeting in ["hello", "hi", "hey", "greetings"]):
+                    intent = "greeting"
+                    prompt = f"You are ULTRON, an advanced AI assistant. Respond to this greeting in character: {message}"
+                elif any(status in message_lower for status in ["status", "how are you", "state"]):
+                    intent = "status"
+                    prompt = f"You are ULTRON, an advanced AI assistant. Respond about your current status: {message}"
+                elif "help" in message_lower:
+                    intent = "help"
+                    available_tools = [tool.__class__.__name__ for tool in self.tools] if self.tools else ["No tools loaded"]
+                    prompt = f"You are ULTRON, an advanced AI assistant. List your capabilities and available tools. Available tools: {', '.join(available_tools)}. User asked: {message}"
+                else:
+                    # For complex requests, use enhanced prompting
+                    intent = "general"
+                    prompt = await self._build_enhanced_prompt(message)
+                route_span.set_attribute("intent", intent)
 
             if progress_callback:
                 progress_callback(20, "Sending to Ollama...")
@@ -208,7 +224,8 @@ class UltronBrain:
                     if progress_callback:
                         progress_callback(25, "Trying agent network...")
 
-                    agent_response = await self.agent_network.delegate_task(message)
+                    with span("agent_network.delegate"):
+                        agent_response = await self.agent_network.delegate_task(message)
                     if agent_response and "error" not in agent_response.lower():
                         if progress_callback:
                             progress_callback(100, "Agent network completed task")
@@ -237,7 +254,7 @@ class UltronBrain:
                 progress_callback(0, error_msg, error=True)
             return error_msg
 
-    def _build_enhanced_prompt(self, user_input: str) -> str:
+    async def _build_enhanced_prompt(self, user_input: str) -> str:
         """Build an enhanced prompt with context and instructions"""
 
         # System context
@@ -250,15 +267,21 @@ class UltronBrain:
 
 You should respond helpfully, accurately, and in character as ULTRON."""
 
-        # Add memory context if available
+        # Add memory context if available; hybrid retrieval embeds and scores
+        # synchronously, so it runs in a worker thread off the event loop
         memory_context = ""
         if self.memory and hasattr(self.memory, 'get_recent_context'):
             try:
-                recent_context = self.memory.get_recent_context(limit=3)
+                recent_context = await to_thread(
+                    self.memory.get_recent_context,
+                    limit=self.config.get("memory_context_items", 3),
+                    query=user_input,
+                    max_chars=self.config.get("memory_context_max_chars", 1500)
+                )
                 if recent_context:
-                    memory_context = f"\n\nRecent conversation context:\n{recent_context}"
+                    memory_context = f"\n\nRelevant memory context:\n{recent_context}"
             except Exception as e:
-                logging.warning(f"Could not retrieve memory context: {e}")
+                warning(f"Could not retrieve memory context: {sanitize_log_input(str(e))}")
 
         # Add available tools context
         tools_context = ""
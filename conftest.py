@@ -17,7 +17,12 @@ import asyncio
 def pytest_pyfunc_call(pyfuncitem):
     testfunc = pyfuncitem.obj
     if inspect.iscoroutinefunction(testfunc):
-        loop = asyncio.get_event_loop()
+        try:
+            loop = asyncio.get_event_loop()
+        except RuntimeError:
+            # asyncio.run() in an earlier test leaves no current loop behind
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
         # collect fixture arguments
         funcargs = {arg: pyfuncitem.funcargs[arg] for arg in pyfuncitem._fixtureinfo.argnames}
         loop.run_until_complete(testfunc(**funcargs))
@@ -15,6 +15,8 @@ from pathlib import Path
 import logging
 import math
 
+from utils.tracing import span
+
 # Enhanced voice system
 try:
     from voice_manager import get_voice_manager, speak as voice_speak, test_voice_system
@@ -843,34 +845,38 @@ class AgentGUI:
         
         # Process in background to keep UI responsive
         def process_in_background():
-            try:
-                # Update model status to show it's working
-                self.root.after(0, self.update_component_status, 'modelname', 'orange')
-                
-                # Process with agent (non-blocking)
-                response = self.agent.handle_text(command)
-                
-                # Update UI with response
-                self.root.after(0, self.add_to_conversation, "ULTRON", response)
-                self.root.after(0, self.set_stt_text, "🎤 Click Voice to speak again...")
-                self.root.after(0, self.update_component_status, 'brain', 'green')
-                self.root.after(0, self.update_component_status, 'modelname', 'green')
-                
-                # Trigger voice output if enabled
-                if self.voice_manager or (hasattr(self.agent, 'voice') and self.agent.voice):
-                    threading.Thread(target=self.speak_response_smooth, args=(response,), daemon=True).start()
-                
-                self.is_processing = False
-                
-            except Exception as e:
-                error_msg = f"Error processing command: {str(e)}"
-                self.root.after(0, self.add_to_conversation, "SYSTEM", f"❌ {error_msg}")
-                self.root.after(0, self.set_stt_text, "❌ Processing failed")
-                self.root.after(0, self.update_component_status, 'brain', 'red')
-                self.root.after(0, self.update_component_status, 'modelname', 'red')
-                self.log_action(f"Command error: {str(e)}")
-                self.is_processing = False
-        
+            # Routing, plan_and_act, LLM and tool calls and TTS land in one
+            # voice.command trace, so the reply is spoken on this thread
+            with span("voice.command", chars=len(command)) as voice_span:
+                try:
+                    # Update model status to show it's working
+                    self.root.after(0, self.update_component_status, 'modelname', 'orange')
+
+                    # Process with agent (non-blocking)
+                    response = self.agent.handle_text(command)
+
+                    # Update UI with response
+                    self.root.after(0, self.add_to_conversation, "ULTRON", response)
+                    self.root.after(0, self.set_stt_text, "🎤 Click Voice to speak again...")
+                    self.root.after(0, self.update_component_status, 'brain', 'green')
+                    self.root.after(0, self.update_component_status, 'modelname', 'green')
+
+                    self.is_processing = False
+
+                    # Trigger voice output if enabled
+                    if self.voice_manager or (hasattr(self.agent, 'voice') and self.agent.voice):
+                        self.speak_response_smooth(response)
+
+                except Exception as e:
+                    voice_span.set_error(e)
+                    error_msg = f"Error processing command: {str(e)}"
+                    self.root.after(0, self.add_to_conversation, "SYSTEM", f"❌ {error_msg}")
+                    self.root.after(0, self.set_stt_text, "❌ Processing failed")
+                    self.root.after(0, self.update_component_status, 'brain', 'red')
+                    self.root.after(0, self.update_component_status, 'modelname', 'red')
+                    self.log_action(f"Command error: {str(e)}")
+                    self.is_processing = False
+
         threading.Thread(target=process_in_background, daemon=True).start()
 
     def speak_response_smooth(self, text):
@@ -880,7 +886,8 @@ class AgentGUI:
             self.log_action(f"Speaking response: {text[:30]}...")
             
             if self.voice_manager and hasattr(self.voice_manager, 'speak'):
-                self.voice_manager.speak(text)
+                with span("voice.tts", engine="voice_manager"):
+                    self.voice_manager.speak(text)
             elif hasattr(self.agent, 'voice') and self.agent.voice:
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
@@ -53,7 +53,9 @@ class EnhancedUltronAgent:
         # Initialize action logger
         if ActionLogger:
             try:
-                self.action_logger = ActionLogger("ultron_gui_session.log")
+                self.action_logger = ActionLogger(
+                    "ultron_gui_session.log", segment_dir=self.config.get("log_directory")
+                )
                 self.action_logger.log_action("GUI_SESSION_START", "ULTRON GUI session starting")
                 print("✅ Action Logger initialized")
             except Exception as e:
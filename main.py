@@ -16,6 +16,7 @@ sys.path.insert(0, str(project_root))
 
 from agent_core import UltronAgent
 from security_utils import sanitize_log_input
+from ultron_agent.logging_config import queue_root_handlers, shutdown_logging
 
 
 def setup_signal_handlers() -> None:
@@ -36,6 +37,8 @@ def main() -> int:
             level=logging.INFO,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
+        # Keep console I/O off the request, streaming and audio threads
+        queue_root_handlers()
         logger = logging.getLogger(__name__)
 
         logger.info("Starting ULTRON Agent 3.0...")
@@ -103,5 +106,6 @@ def main() -> int:
 
 if __name__ == "__main__":
     exit_code = main()
+    shutdown_logging()
     sys.exit(exit_code)
 
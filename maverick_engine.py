@@ -16,6 +16,7 @@ from enum import Enum
 
 from ultron_multi_ai_router import UltronMultiAIRouter
 from utils.event_system import EventSystem
+from utils.log_storage import SegmentedLogHandler
 
 
 class ImprovementStatus(Enum):
@@ -76,7 +77,7 @@ class MaverickEngine:
         # File paths
         self.project_root = Path(".")
         self.suggestions_file = self.project_root / "maverick_suggestions.json"
-        self.analysis_log = self.project_root / "maverick_analysis.log"
+        self.analysis_log_dir = self.project_root / "logs"
 
         # Setup logging
         self._setup_logging()
@@ -88,7 +89,7 @@ class MaverickEngine:
 
     def _setup_logging(self):
         """Setup dedicated Maverick logging"""
-        handler = logging.FileHandler(self.analysis_log)
+        handler = SegmentedLogHandler(self.analysis_log_dir, "maverick_analysis")
         handler.setFormatter(logging.Formatter(
             '%(asctime)s - MAVERICK - %(levelname)s - %(message)s'
         ))
@@ -126,7 +127,7 @@ class MaverickEngine:
         self.logger.info("🎯 Starting Maverick continuous monitoring")
 
         # Emit start event
-        await self.event_system.emit("maverick_started", {
+        await self.event_system.emit("maverick.started", {
             "timestamp": datetime.now().isoformat(),
             "analysis_interval": self.analysis_interval
         })
@@ -144,7 +145,7 @@ class MaverickEngine:
         self.running = False
         self.logger.info("🛑 Maverick monitoring stopped")
 
-        await self.event_system.emit("maverick_stopped", {
+        await self.event_system.emit("maverick.stopped", {
             "timestamp": datetime.now().isoformat()
         })
 
@@ -164,7 +165,7 @@ class MaverickEngine:
             await self._process_auto_apply_suggestions()
 
             # 4. Emit analysis complete event
-            await self.event_system.emit("maverick_analysis_complete", {
+            await self.event_system.emit("maverick.analysis_complete", {
                 "files_analyzed": len(files_to_analyze),
                 "new_suggestions": len([s for s in self.suggestions
                                      if s.status == ImprovementStatus.SUGGESTED]),
@@ -175,7 +176,7 @@ class MaverickEngine:
 
         except Exception as e:
             self.logger.error(f"Analysis cycle failed: {e}")
-            await self.event_system.emit("maverick_error_detected", {
+            await self.event_system.emit("maverick.error_detected", {
                 "error": str(e),
                 "timestamp": datetime.now().isoformat()
             })
@@ -231,7 +232,7 @@ class MaverickEngine:
                     self.logger.info(f"💡 New suggestion for {file_path}: {suggestion.description}")
 
                     # Emit event
-                    await self.event_system.emit("maverick_improvement_suggested", {
+                    await self.event_system.emit("maverick.improvement_suggested", {
                         "file": str(file_path),
                         "suggestion": suggestion.to_dict()
                     })
@@ -358,7 +359,7 @@ Return suggestions in JSON format:
             suggestion.test_results = "Auto-applied successfully"
 
             # Emit event
-            await self.event_system.emit("maverick_changes_applied", {
+            await self.event_system.emit("maverick.changes_applied", {
                 "suggestion_id": suggestion.id,
                 "file": suggestion.file_path,
                 "description": suggestion.description
@@ -8,6 +8,10 @@ class Memory:
     def __init__(self, short_term_limit=10, long_term_file='long_term_memory.json'):
         self.short_term_memory = deque(maxlen=short_term_limit)
         self.long_term_memory = self.load_long_term_memory(long_term_file)
+        # Optional hot/cold tier manager (see ultron_addons.tiered_memory)
+        self.tiers = None
+        # Optional near-duplicate detector (see ultron_addons.dedup)
+        self.dedup = None
         logging.info("Memory initialized with shortterm and longterm storage. - memory.py:11")
 
     def load_long_term_memory(self, file_path):
@@ -25,9 +29,25 @@ class Memory:
         logging.info(f"Added to shortterm memory: {item} - memory.py:25")
 
     def add_to_long_term(self, item):
+        if self.dedup is not None:
+            duplicate_id = self.dedup.find_duplicate(item, exists=self._has_long_term)
+            if duplicate_id is not None:
+                count = self.dedup.record_duplicate(duplicate_id, item)
+                if self.tiers and duplicate_id in self.long_term_memory:
+                    self.tiers.touch(duplicate_id)
+                logging.info(f"Suppressed duplicate of longterm memory {duplicate_id} (x{count}) - memory.py:30")
+                return duplicate_id
         item_id = str(uuid.uuid4())
         self.long_term_memory[item_id] = item
+        if self.tiers:
+            self.tiers.admit(item_id, item)
+        if self.dedup is not None:
+            self.dedup.add(item_id, item)
         logging.info(f"Added to longterm memory: {item_id} > {item} - memory.py:30")
+        return item_id
+
+    def _has_long_term(self, item_id):
+        return item_id in self.long_term_memory or bool(self.tiers and item_id in self.tiers.cold)
 
     def retrieve_short_term(self):
         return list(self.short_term_memory)
@@ -41,6 +61,8 @@ class Memory:
 
     def clear_long_term(self):
         self.long_term_memory.clear()
+        if self.dedup is not None:
+            self.dedup.clear()
         logging.info("Cleared longterm memory. - memory.py:44")
     
     def get_recent_memory(self, limit=5):
@@ -77,5 +99,38 @@ class Memory:
                 results.append(item)
             elif isinstance(item, dict) and any(query_lower in str(v).lower() for v in item.values()):
                 results.append(item)
+
+        # Fall back to the cold tier only when nothing in RAM matched
+        if not results and self.tiers:
+            results.extend(value for _, value, _ in self.tiers.search_cold(query))
         
-        return results
\ No newline at end of file
+        return results
+
+    def get_recent_context(self, limit=3, query=None, max_chars=1500):
+        """Build a bounded context block for prompt assembly.
+
+        Items matching the query come first, followed by the most recent
+        memories, formatted as one ``- item`` line each.
+        """
+        candidates = self.search_memory(query) if query else []
+        candidates = candidates + self.get_recent_memory(limit)
+
+        lines = []
+        seen = set()
+        used = 0
+        for item in candidates:
+            text = " ".join(str(item).split())
+            if text in seen:
+                continue
+            seen.add(text)
+            remaining = max_chars - used
+            if remaining <= 4:
+                break
+            line = f"- {text}"
+            if len(line) > remaining:
+                line = line[:remaining - 3].rstrip() + "..."
+            lines.append(line)
+            used += len(line) + 1
+            if len(lines) >= limit:
+                break
+        return "\n".join(lines)
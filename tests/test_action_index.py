@@ -0,0 +1,134 @@
+"""
+Tests for the SQLite action index
+"""
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from utils.action_index import ActionIndex
+
+
+def _action(action_type, description, minutes_ago=0, **details):
+    return {
+        "timestamp": (datetime.now() - timedelta(minutes=minutes_ago)).isoformat(),
+        "session_id": "s1",
+        "action_type": action_type,
+        "description": description,
+        "details": details,
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ActionIndex(tmp_path / "actions.db")
+    yield index
+    index.close()
+
+
+class TestActionIndex:
+    """Test filtered, aggregate and full-text action queries"""
+
+    def test_recent_voice_failures(self, index):
+        index.add_many([
+            _action("VOICE_ACTIVITY", "Voice listen: FAILED", minutes_ago=5),
+            _action("VOICE_ACTIVITY", "Voice listen: SUCCESS", minutes_ago=5),
+            _action("VOICE_ACTIVITY", "Voice speak: FAILED", minutes_ago=120),
+        ])
+
+        failures = index.query(action_type="VOICE_ACTIVITY", success=False, since=timedelta(hours=1))
+        assert [a["description"] for a in failures] == ["Voice listen: FAILED"]
+
+    def test_percentile_by_model(self, index):
+        index.add_many(
+            [_action("AI_RESPONSE", "r", model="llama", processing_time_seconds=t) for t in range(1, 21)]
+            + [_action("AI_RESPONSE", "r", model="qwen", processing_time_seconds=0.5)]
+            + [_action("USER_INPUT", "hi", full_text="hi")]
+        )
+
+        p95 = index.percentile("processing_time_seconds", 0.95, action_type="AI_RESPONSE", group_by="model")
+        assert p95 == {"llama": 19.0, "qwen": 0.5}
+        assert index.percentile("processing_time_seconds", 0.5) == {"all": 10.0}
+        with pytest.raises(ValueError):
+            index.percentile("x; DROP TABLE actions", 0.5)
+
+    def test_full_text_search(self, index):
+        index.add_many([
+            _action("USER_INPUT", "User input via voice: what's the weather", full_text="what's the weather in Paris"),
+            _action("AI_RESPONSE", "AI response", full_response="The forecast for Paris is sunny", model="llama"),
+            _action("USER_INPUT", "User input via text: open notepad", full_text="open notepad"),
+        ])
+
+        results = index.search("paris")
+        assert {r["action_type"] for r in results} == {"USER_INPUT", "AI_RESPONSE"}
+        assert index.search("paris", action_type="AI_RESPONSE")[0]["details"]["model"] == "llama"
+        assert index.counts() == {"USER_INPUT": 2, "AI_RESPONSE": 1}
+
+    def test_prune_by_age_and_row_count(self, tmp_path):
+        index = ActionIndex(tmp_path / "actions.db", retention_seconds=3600, max_rows=3)
+        index.add_many([_action("USER_INPUT", f"old paris {i}", minutes_ago=120) for i in range(2)])
+        index.add_many([_action("USER_INPUT", f"new paris {i}", minutes_ago=5 - i) for i in range(5)])
+
+        assert index.prune() == 4
+        assert [a["description"] for a in index.query()] == ["new paris 4", "new paris 3", "new paris 2"]
+        assert len(index.search("paris")) == 3
+        assert index.stats["pruned"] == 4
+        index.close()
+
+    def test_action_logger_prunes_with_segment_retention(self, tmp_path):
+        from action_logger import ActionLogWriter
+        from utils.log_storage import SegmentedLog
+
+        storage = SegmentedLog(tmp_path, "actions", max_segment_bytes=150, max_total_bytes=600,
+                               retention_seconds=None, compress=False)
+        index = ActionIndex(tmp_path / "actions.db", retention_seconds=None)
+        writer = ActionLogWriter(tmp_path / "a.jsonl", flush_size=1, storage=storage, index=index)
+        for i in range(40):
+            writer.submit(_action("USER_INPUT", f"command {i}", minutes_ago=40 - i))
+        writer.flush()
+
+        kept = [line for seg in storage.segments_between() for line in storage.segment_lines(seg)]
+        assert storage.stats["segments_removed"] > 0
+        assert len(index) == len(kept) < 40
+        assert index.query(limit=1)[0]["description"] == "command 39"
+        writer.close()
+        index.close()
+
+    def test_action_logger_feeds_index(self, tmp_path):
+        from action_logger import ActionLogger
+
+        logger = ActionLogger(str(tmp_path / "a.log"), str(tmp_path / "missing.json"),
+                              index_path=str(tmp_path / "actions.db"))
+        logger.logger = Mock()
+        logger.log_ai_response("It is sunny", model="llama", processing_time=1.5)
+        logger.save_action_log()
+
+        assert logger.action_index.search("sunny")[0]["action_type"] == "AI_RESPONSE"
+        logger.writer.close()
+
+    def test_action_logger_indexes_by_default(self, tmp_path):
+        from action_logger import ActionLogger
+        from utils.action_index import get_action_index
+
+        logger = ActionLogger(str(tmp_path / "a.log"), str(tmp_path / "missing.json"))
+        logger.logger = Mock()
+        logger.log_user_input("where is the reactor manual")
+        logger.save_action_log()
+
+        assert logger.index_path == str(tmp_path / "logs" / "actions.db")
+        assert get_action_index() is logger.action_index
+        assert get_action_index().search("reactor")[0]["action_type"] == "USER_INPUT"
+        logger.writer.close()
+
+    def test_reinit_closes_previous_index(self, tmp_path):
+        import sqlite3
+
+        from utils.action_index import init_action_index
+
+        first = init_action_index(tmp_path / "first.db")
+        second = init_action_index(tmp_path / "second.db")
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            len(first)
+        assert len(second) == 0
+        second.close()
@@ -531,3 +531,62 @@ class TestActionLoggerIntegration:
             error_actions = [a for a in logger.actions if a["action_type"] == "ERROR"]
             assert len(error_actions) == 1
             assert "PermissionError" in error_actions[0]["details"]["error_type"]
+
+
+class TestActionLogWriter:
+    """Tests for the append-only JSONL action log"""
+
+    def test_actions_are_appended_as_jsonl(self, tmp_path):
+        logger = ActionLogger(str(tmp_path / "actions.log"), str(tmp_path / "missing.json"),
+                              max_retained_actions=3, flush_interval=60, segmented=False)
+        logger.logger = Mock()
+        for i in range(5):
+            logger.log_user_input(f"input {i}")
+        assert logger.save_action_log()
+
+        lines = logger.action_log_file.read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["action_type"] for line in lines] == ["SYSTEM_START"] + ["USER_INPUT"] * 5
+        assert len(logger.actions) == 3
+        summary = logger.get_session_summary()
+        assert summary["total_actions"] == 6
+        assert summary["action_counts"]["USER_INPUT"] == 5
+        assert summary["action_log_file"] == str(logger.action_log_file)
+        logger.writer.close()
+
+    def test_group_commit_batches_writes(self, tmp_path):
+        from action_logger import ActionLogWriter
+
+        writer = ActionLogWriter(tmp_path / "actions.jsonl", flush_size=10, flush_interval=60)
+        for i in range(25):
+            writer.submit({"n": i})
+        writer.close()
+
+        assert writer.stats["written"] == 25
+        assert writer.stats["batches"] == 3
+        assert len((tmp_path / "actions.jsonl").read_text().splitlines()) == 25
+
+    def test_segmented_action_storage(self, tmp_path):
+        logger = ActionLogger(str(tmp_path / "actions.log"), str(tmp_path / "missing.json"),
+                              segment_dir=str(tmp_path / "segments"))
+        logger.logger = Mock()
+        logger.log_error("IOError", "disk full")
+        start = datetime.now()
+        logger.log_user_input("hello")
+
+        assert [a["action_type"] for a in logger.read_actions(start=start)] == ["USER_INPUT"]
+        summary = logger.get_session_summary()
+        assert "action_log_file" not in summary
+        assert summary["action_log_dir"] == str(tmp_path / "segments")
+        assert Path(summary["action_log_segment"]).parent == tmp_path / "segments"
+        logger.shutdown()
+        assert list((tmp_path / "segments").glob("actions-*.log.gz"))
+
+    def test_segmented_by_default(self, tmp_path):
+        logger = ActionLogger(str(tmp_path / "actions.log"), str(tmp_path / "missing.json"))
+        logger.logger = Mock()
+        logger.log_user_input("hello")
+        logger.shutdown()
+
+        assert logger.segment_dir == tmp_path / "logs"
+        assert list((tmp_path / "logs").glob("actions-*"))
+        assert not list(tmp_path.glob("actions_*.jsonl"))
@@ -0,0 +1,235 @@
+"""
+Tests for the cron expression engine
+"""
+import random
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from utils.cron import CronExpression, compile_cron
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+
+# ----------------------------------------------------------------------
+# Reference implementation: plain sets and a day-by-day scan
+# ----------------------------------------------------------------------
+_NAMES = {
+    "JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6, "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10,
+    "NOV": 11, "DEC": 12, "SUN": 0, "MON": 1, "TUE": 2, "WED": 3, "THU": 4, "FRI": 5, "SAT": 6,
+}
+
+
+def _ref_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        base, step = (part.split("/") + ["1"])[:2]
+        if base == "*":
+            lo, hi = low, high
+        elif "-" in base:
+            lo, hi = (int(_NAMES.get(x, x)) for x in base.split("-"))
+        else:
+            lo = int(_NAMES.get(base, base))
+            hi = high if "/" in part else lo
+        values.update(range(lo, hi + 1, int(step)))
+    return values
+
+
+def _ref_next(expression, after, horizon_days=4 * 366):
+    minute, hour, dom, month, dow = expression.split()
+    minutes, hours = _ref_field(minute, 0, 59), _ref_field(hour, 0, 23)
+    doms, months = _ref_field(dom, 1, 31), _ref_field(month, 1, 12)
+    dows = {d % 7 for d in _ref_field(dow, 0, 7)}
+    day = after.date()
+    for _ in range(horizon_days):
+        weekday = day.isoweekday() % 7
+        if dom.startswith("*") or dow.startswith("*"):
+            day_ok = day.day in doms and weekday in dows
+        else:
+            day_ok = day.day in doms or weekday in dows
+        if day.month in months and day_ok:
+            for h in sorted(hours):
+                for m in sorted(minutes):
+                    candidate = datetime(day.year, day.month, day.day, h, m)
+                    if candidate > after:
+                        return candidate
+        day += timedelta(days=1)
+    return None
+
+
+def _random_field(rng, low, high, names=()):
+    kind = rng.choice(["*", "value", "range", "step", "range_step", "list", "start_step"])
+    a, b = sorted(rng.sample(range(low, high + 1), 2))
+    if kind == "*":
+        return "*"
+    if kind == "value":
+        return str(a)
+    if kind == "range":
+        return f"{a}-{b}"
+    if kind == "step":
+        return f"*/{rng.randint(1, max(1, (high - low) // 2))}"
+    if kind == "range_step":
+        return f"{a}-{b}/{rng.randint(1, 5)}"
+    if kind == "start_step":
+        return f"{a}/{rng.randint(2, 10)}"
+    picked = sorted(rng.sample(range(low, high + 1), rng.randint(2, 4)))
+    return ",".join(names[v - low] if names and rng.random() < 0.3 else str(v) for v in picked)
+
+
+def _random_expression(rng):
+    months = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+    weekdays = ("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN")
+    return " ".join([
+        _random_field(rng, 0, 59),
+        _random_field(rng, 0, 23),
+        _random_field(rng, 1, 31),
+        _random_field(rng, 1, 12, months),
+        _random_field(rng, 0, 7, weekdays),
+    ])
+
+
+class TestCronExpression:
+    """Test parsing, day-field semantics and next-fire search"""
+
+    @pytest.mark.parametrize("expression, after, expected", [
+        ("*/15 9-17 * * MON-FRI", datetime(2025, 6, 6, 17, 50), datetime(2025, 6, 9, 9, 0)),
+        ("0 0 31 * *", datetime(2025, 4, 1), datetime(2025, 5, 31)),
+        ("0 12 29 2 *", datetime(2025, 3, 1), datetime(2028, 2, 29, 12, 0)),
+        ("0 0 13 * 5", datetime(2025, 6, 1), datetime(2025, 6, 6)),
+        ("30 4 1,15 * 7", datetime(2025, 6, 2), datetime(2025, 6, 8, 4, 30)),
+        ("@monthly", datetime(2025, 12, 15), datetime(2026, 1, 1)),
+        ("*/20 * * * * *", datetime(2025, 1, 1, 0, 0, 41), datetime(2025, 1, 1, 0, 1)),
+        ("0 0 0 1 JAN ?", datetime(2025, 1, 1), datetime(2026, 1, 1)),
+    ])
+    def test_next_after(self, expression, after, expected):
+        assert CronExpression(expression).next_after(after) == expected
+
+    def test_never_firing_expression(self):
+        assert CronExpression("0 0 30 2 *").next_after(datetime(2025, 1, 1)) is None
+
+    @pytest.mark.parametrize("expression", [
+        "* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *", "* * * * 8",
+        "*/0 * * * *", "5-1 * * * *", "1,,2 * * * *", "* * * FOO *",
+    ])
+    def test_invalid_expressions(self, expression):
+        with pytest.raises(ValueError):
+            CronExpression(expression)
+
+    def test_matches(self):
+        cron = CronExpression("0 9 * * MON-FRI")
+        assert cron.matches(datetime(2025, 6, 6, 9, 0))
+        assert not cron.matches(datetime(2025, 6, 7, 9, 0))
+
+    def test_compile_cache(self):
+        assert compile_cron("@hourly") is compile_cron("@hourly")
+
+    def test_matches_reference_implementation(self):
+        rng = random.Random(2025)
+        for _ in range(300):
+            expression = _random_expression(rng)
+            after = datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+            expected = _ref_next(expression, after)
+            actual = CronExpression(expression).next_after(after)
+            if expected is None:
+                assert actual is None or actual > after + timedelta(days=4 * 365), expression
+            else:
+                assert actual == expected, (expression, after)
+
+    def test_fire_times_are_increasing_and_match(self):
+        rng = random.Random(7)
+        for _ in range(40):
+            expression = _random_expression(rng)
+            cron = CronExpression(expression)
+            previous = datetime(2025, 1, 1)
+            for fire in cron.iter_after(previous, 25):
+                assert fire > previous and cron.matches(fire), expression
+                previous = fire
+
+
+class TestCronTimeZones:
+    """Test DST transitions in a named time zone"""
+
+    def test_skipped_time_fires_once_after_spring_forward(self):
+        cron = CronExpression("30 2 * * *", tz="America/New_York")
+        fires = list(cron.iter_after(datetime(2025, 3, 8, 12, 0, tzinfo=NEW_YORK), 3))
+
+        assert [f.replace(tzinfo=None) for f in fires] == [
+            datetime(2025, 3, 9, 3, 30), datetime(2025, 3, 10, 2, 30), datetime(2025, 3, 11, 2, 30),
+        ]
+        assert fires[0].utcoffset() == timedelta(hours=-4)
+
+    def test_repeated_time_fires_once_after_fall_back(self):
+        cron = CronExpression("30 1 * * *", tz="America/New_York")
+        first, second = cron.iter_after(datetime(2025, 11, 1, 12, 0, tzinfo=NEW_YORK), 2)
+
+        assert first.replace(tzinfo=None) == datetime(2025, 11, 2, 1, 30)
+        assert first.utcoffset() == timedelta(hours=-4)
+        assert second.replace(tzinfo=None) == datetime(2025, 11, 3, 1, 30)
+
+    def test_frequent_schedule_fires_through_repeated_hour(self):
+        berlin = ZoneInfo("Europe/Berlin")
+        cron = CronExpression("*/15 * * * *", tz="Europe/Berlin")
+        fires = list(cron.iter_after(datetime(2025, 10, 26, 1, 50, tzinfo=berlin), 10))
+
+        # 00:00 UTC is 02:00 CEST; clocks go back to 02:00 CET at 01:00 UTC
+        utc = ZoneInfo("UTC")
+        assert [f.astimezone(utc) for f in fires] == [
+            datetime(2025, 10, 26, 0, 0, tzinfo=utc) + timedelta(minutes=15 * i) for i in range(10)
+        ]
+        assert [(f.hour, f.minute, f.fold) for f in fires] == [
+            (2, 0, 0), (2, 15, 0), (2, 30, 0), (2, 45, 0),
+            (2, 0, 1), (2, 15, 1), (2, 30, 1), (2, 45, 1),
+            (3, 0, 0), (3, 15, 0),
+        ]
+
+    def test_frequent_schedule_is_monotonic_across_transitions(self):
+        cron = CronExpression("*/20 * * * *", tz="America/New_York")
+        for start in (datetime(2025, 3, 9, 0, 0), datetime(2025, 11, 2, 0, 0)):
+            fires = list(cron.iter_after(start.replace(tzinfo=NEW_YORK), 15))
+            instants = [f.timestamp() for f in fires]
+            assert instants == sorted(set(instants))
+            assert all(cron.matches(f) for f in fires)
+
+    def test_utc_input_is_converted(self):
+        cron = CronExpression("0 9 * * *", tz="Europe/Berlin")
+        fire = cron.next_after(datetime(2025, 7, 1, 6, 0, tzinfo=ZoneInfo("UTC")))
+        assert fire == datetime(2025, 7, 1, 9, 0, tzinfo=ZoneInfo("Europe/Berlin"))
+
+
+class TestSchedulerCron:
+    """Test cron and monthly schedules in TaskScheduler"""
+
+    def test_cron_schedule(self, tmp_path):
+        from utils.task_scheduler import TaskScheduler
+
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        assert scheduler.schedule_task("report", "weekly report", {"type": "cron", "cron": "0 9 * * MON"})
+        assert not scheduler.schedule_task("broken", "x", {"type": "cron", "cron": "0 25 * * *"})
+        assert not scheduler.update_task("report", {"schedule": {"type": "cron", "cron": "bad"}})
+
+        next_run = scheduler.tasks["report"]["next_run"]
+        assert next_run.weekday() == 0 and (next_run.hour, next_run.minute) == (9, 0)
+        assert "broken" not in scheduler.tasks
+
+    def test_cron_schedule_in_time_zone_returns_local_time(self, tmp_path):
+        from utils.task_scheduler import TaskScheduler
+
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        now = datetime(2025, 7, 1, 12, 0)
+        next_run = scheduler._calculate_cron_next_run("0 9 * * *", now, "Asia/Tokyo")
+        assert next_run.tzinfo is None
+        assert next_run.astimezone(ZoneInfo("Asia/Tokyo")).hour == 9
+
+    def test_monthly_on_missing_day_runs_on_last_day(self, tmp_path, monkeypatch):
+        import utils.task_scheduler as task_scheduler
+
+        class FakeDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime(2025, 4, 10, 8, 0)
+
+        monkeypatch.setattr(task_scheduler, "datetime", FakeDatetime)
+        scheduler = task_scheduler.TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        next_run = scheduler._calculate_next_run({"type": "monthly", "day": 31, "time": {"hour": 3}})
+        assert next_run == datetime(2025, 4, 30, 3, 0)
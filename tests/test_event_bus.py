@@ -0,0 +1,166 @@
+"""
+Tests for the cross-process event bus
+"""
+import asyncio
+import tempfile
+
+import pytest
+
+from utils.event_bus import (
+    CODEC_JSON, FRAME_HELLO, EventBusBridge, EventBusServer, decode_event, encode_event, encode_frame,
+    event_topic, parse_address, read_credentials
+)
+from utils.event_system import EventSystem
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+class TestFraming:
+    """Test frame encoding and address parsing"""
+
+    def test_event_roundtrip(self):
+        frame = encode_event("maverick.started", {"ok": True, "n": [1, 2]}, "core", CODEC_JSON)
+        payload = frame[6:]
+
+        assert event_topic(payload) == "maverick.started"
+        assert decode_event(payload, CODEC_JSON) == ("maverick.started", "core", {"ok": True, "n": [1, 2]})
+
+    def test_parse_address(self):
+        assert parse_address("127.0.0.1:9000") == ("127.0.0.1", 9000)
+        assert parse_address("/tmp/bus.sock") == "/tmp/bus.sock"
+        assert parse_address(("localhost", 1)) == ("localhost", 1)
+
+    def test_parse_address_rejects_remote_hosts(self):
+        with pytest.raises(ValueError):
+            parse_address("0.0.0.0:9000")
+        with pytest.raises(ValueError):
+            parse_address(("example.com", 9000))
+        assert parse_address("0.0.0.0:9000", allow_remote=True) == ("0.0.0.0", 9000)
+
+
+class TestEventBus:
+    """Test routing, publisher-side filtering, loop prevention and reconnection"""
+
+    @pytest.mark.asyncio
+    async def test_events_flow_between_processes(self, tmp_path):
+        address = str(tmp_path / "bus.sock")
+        server = EventBusServer(address)
+        await server.start()
+        core, gui = EventSystem(), EventSystem()
+        core_bridge = EventBusBridge(core, address, name="core", subscribe=("gui.#",))
+        gui_bridge = EventBusBridge(gui, address, name="gui", subscribe=("maverick.*",))
+        received = {"core": [], "gui": []}
+        core.subscribe("#", lambda e, d: received["core"].append((e, d)), inline=True, pass_event=True)
+        gui.subscribe("#", lambda e, d: received["gui"].append((e, d)), inline=True, pass_event=True)
+        await core_bridge.start()
+        await gui_bridge.start()
+        await _wait_for(lambda: core_bridge._remote_interest is not None
+                        and core_bridge._remote_interest.match("maverick.started"))
+        await _wait_for(lambda: gui_bridge._remote_interest is not None
+                        and gui_bridge._remote_interest.match("gui.click"))
+
+        await core.emit("maverick.started", {"cycle": 1})
+        await core.emit("voice.stt", "not subscribed by anyone")
+        await gui.emit("gui.click", {"x": 1})
+        await _wait_for(lambda: len(received["gui"]) == 2 and len(received["core"]) == 3)
+        await asyncio.sleep(0.05)
+
+        assert received["gui"] == [("gui.click", {"x": 1}), ("maverick.started", {"cycle": 1})]
+        assert ("gui.click", {"x": 1}) in received["core"]
+        assert core_bridge.stats["filtered"] == 1
+        # Remote events are not echoed back to the bus
+        assert gui_bridge.stats["sent"] == 1
+        assert sorted(server.clients) == ["core", "gui"]
+
+        await core_bridge.stop()
+        await gui_bridge.stop()
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_bridge_buffers_and_reconnects(self, tmp_path):
+        address = str(tmp_path / "bus.sock")
+        producer, consumer = EventSystem(), EventSystem()
+        received = []
+        consumer.subscribe("status", received.append, inline=True)
+        producer_bridge = EventBusBridge(producer, address, name="producer", reconnect_min=0.01, reconnect_max=0.05)
+        await producer_bridge.start()
+        await producer.emit("status", "queued while offline")
+        assert producer_bridge.stats["buffered"] == 1
+
+        server = EventBusServer(address)
+        await server.start()
+        consumer_bridge = EventBusBridge(consumer, address, name="consumer", subscribe=("status",))
+        await consumer_bridge.start()
+        await consumer_bridge.connected.wait()
+        await _wait_for(lambda: "consumer" in server.clients)
+        await _wait_for(lambda: producer_bridge.connected.is_set())
+        await producer.emit("status", "online")
+        await _wait_for(lambda: "online" in received)
+
+        await server.stop()
+        await _wait_for(lambda: not producer_bridge.connected.is_set())
+        server = EventBusServer(address)
+        await server.start()
+        await _wait_for(lambda: producer_bridge.connected.is_set() and consumer_bridge.connected.is_set())
+        await _wait_for(lambda: producer_bridge._remote_interest is not None
+                        and producer_bridge._remote_interest.match("status"))
+        await producer.emit("status", "after reconnect")
+        await _wait_for(lambda: "after reconnect" in received)
+        assert producer_bridge.stats["reconnects"] >= 1
+
+        await producer_bridge.stop()
+        await consumer_bridge.stop()
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_tcp_requires_token(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        server = EventBusServer(("127.0.0.1", 0))
+        await server.start()
+        assert server.address[1] != 0
+        assert read_credentials() == {"host": "127.0.0.1", "port": server.address[1], "token": server.token}
+
+        # A client without the token is disconnected and never registered
+        reader, writer = await asyncio.open_connection(*server.address)
+        writer.write(encode_frame(FRAME_HELLO, b'{"name": "intruder", "token": "guess"}'))
+        assert await reader.read() == b""
+        writer.close()
+        assert server.stats["rejected"] == 1
+
+        # A bridge picks the token up from the credentials file
+        bridge = EventBusBridge(EventSystem(), server.address, name="gui")
+        await bridge.start()
+        await bridge.connected.wait()
+        await _wait_for(lambda: "gui" in server.clients)
+        assert "intruder" not in server.clients
+
+        await bridge.stop()
+        await server.stop()
+        assert read_credentials() is None
+
+    @pytest.mark.asyncio
+    async def test_bridge_drops_when_server_stalls(self, tmp_path):
+        address = str(tmp_path / "bus.sock")
+        server = EventBusServer(address)
+        await server.start()
+        local = EventSystem()
+        bridge = EventBusBridge(local, address, name="core", max_write_buffer=1024)
+        await bridge.start()
+        await bridge.connected.wait()
+        # Pretend the server stopped reading and the socket buffer filled up
+        bridge._writer.transport.get_write_buffer_size = lambda: 4096
+        bridge._remote_interest = None
+
+        await local.emit("status", "x")
+
+        assert bridge.stats["dropped_slow_server"] == 1
+        assert bridge.stats["sent"] == 0
+
+        await bridge.stop()
+        await server.stop()
@@ -0,0 +1,154 @@
+"""
+Tests for the durable event log and replay
+"""
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+import pytest
+
+from utils.event_log import EventLog, main
+from utils.event_system import EventSystem
+
+
+class TestEventLog:
+    """Test sequence numbers, segment seeking, filtering and recovery"""
+
+    def test_sequence_numbers_continue_after_restart(self, tmp_path):
+        log = EventLog(tmp_path)
+        assert [log.append("tick", i) for i in range(3)] == [1, 2, 3]
+        log.close()
+
+        reopened = EventLog(tmp_path)
+        assert reopened.append("tick", 3) == 4
+        assert [r["data"] for r in reopened.read()] == [0, 1, 2, 3]
+        reopened.close()
+
+    def test_read_from_offset_across_compressed_segments(self, tmp_path):
+        log = EventLog(tmp_path, flush_size=1, max_segment_bytes=200, max_segment_age=None, retention_seconds=None)
+        for i in range(50):
+            log.append("maverick.analysis_complete" if i % 2 else "voice.stt", {"i": i})
+
+        log.flush()
+        assert len(log.storage.segments) > 5
+        assert [r["seq"] for r in log.read(from_seq=45)] == [45, 46, 47, 48, 49, 50]
+        assert [r["seq"] for r in log.read(from_seq=10, to_seq=12)] == [10, 11, 12]
+        assert [r["data"]["i"] for r in log.read(event_name="maverick.*", limit=3)] == [1, 3, 5]
+        log.close()
+
+    def test_time_range_filter(self, tmp_path):
+        log = EventLog(tmp_path)
+        for minute in (0, 10, 20):
+            log.append("scheduler.run", minute, timestamp=datetime(2025, 1, 1, 12, minute).timestamp())
+
+        records = log.read(since=datetime(2025, 1, 1, 12, 5), until=datetime(2025, 1, 1, 12, 15))
+        assert [r["data"] for r in records] == [10]
+        log.close()
+
+    def test_survives_crash_with_torn_write(self, tmp_path):
+        log = EventLog(tmp_path)
+        log.append("maverick.started", {"cycle": 1})
+        log.flush()
+        log.storage._active.write('{"seq": 2, "event": "mave')
+        log.storage._active.close()  # crash: never closed properly
+
+        recovered = EventLog(tmp_path)
+        assert recovered.append("maverick.started", {"cycle": 2}) == 2
+        assert [r["data"]["cycle"] for r in recovered.read()] == [1, 2]
+        assert recovered.stats["corrupt_lines"] >= 1
+        recovered.close()
+
+    def test_unserializable_data_is_stringified(self, tmp_path):
+        log = EventLog(tmp_path)
+        log.append("gui.error", {"error": ValueError("boom")})
+        assert next(log.read())["data"] == {"error": "boom"}
+        log.close()
+
+    def test_disk_io_happens_on_writer_thread(self, tmp_path):
+        log = EventLog(tmp_path, flush_interval=60)
+        writers = []
+        write_many = log.storage.write_many
+
+        def recording_write_many(*args):
+            writers.append(threading.current_thread().name)
+            write_many(*args)
+
+        log.storage.write_many = recording_write_many
+        assert [log.append("tick", i) for i in range(3)] == [1, 2, 3]
+        assert writers == []
+        assert [r["data"] for r in log.read()] == [0, 1, 2]
+        assert writers == ["ultron-event-log-writer"]
+        log.close()
+
+
+class TestEventSystemReplay:
+    """Test logging from EventSystem and catch-up subscriptions"""
+
+    @pytest.mark.asyncio
+    async def test_late_subscriber_catches_up_then_gets_live_events(self, tmp_path):
+        event_system = EventSystem(event_log=EventLog(tmp_path))
+        for i in range(3):
+            await event_system.emit("maverick.cycle", i)
+        await event_system.emit("voice.stt", "ignored")
+
+        seen = []
+        event_system.subscribe("maverick.*", lambda e, d: seen.append(d), inline=True, pass_event=True, replay_from=2)
+        await event_system.emit("maverick.cycle", 3)
+
+        assert seen == [1, 2, 3]
+        assert event_system.get_metrics()["event_log"]["next_seq"] == 6
+        event_system.event_log.close()
+
+    @pytest.mark.asyncio
+    async def test_events_emitted_during_replay_are_held_back(self, tmp_path):
+        event_system = EventSystem(event_log=EventLog(tmp_path))
+        for i in range(3):
+            await event_system.emit("tick", i)
+
+        seen = []
+        read = event_system.event_log.read
+
+        def slow_read(*args, **kwargs):
+            # An emit from another thread lands while the log is being read
+            emitter = threading.Thread(target=asyncio.run, args=(event_system.emit("tick", 3),))
+            emitter.start()
+            emitter.join()
+            yield from read(*args, **kwargs)
+
+        event_system.event_log.read = slow_read
+        event_system.subscribe("tick", seen.append, inline=True, replay_from=1)
+        await event_system.emit("tick", 4)
+
+        assert seen == [0, 1, 2, 3, 4]
+        event_system.event_log.close()
+
+    def test_replay_requires_log_and_plain_callable(self):
+        async def handler(data):
+            pass
+
+        with pytest.raises(ValueError):
+            EventSystem().subscribe("evt", print, replay_from=0)
+        with pytest.raises(TypeError):
+            EventSystem(event_log=object()).subscribe("evt", handler, replay_from=0)
+
+
+class TestEventLogCli:
+    """Test dumping and filtering a log from the command line"""
+
+    def test_dump_filtered_range(self, tmp_path, capsys):
+        log = EventLog(tmp_path)
+        for i in range(5):
+            log.append("maverick.error_detected" if i == 3 else "status", i)
+        log.flush()
+
+        assert main([str(tmp_path), "--from-seq", "2", "--event", "maverick.#"]) == 0
+        lines = capsys.readouterr().out.splitlines()
+        assert [json.loads(line)["seq"] for line in lines] == [4]
+
+        main([str(tmp_path), "--stats"])
+        assert json.loads(capsys.readouterr().out)["next_seq"] == 6
+        # The reader must not disturb the writer's active segment
+        assert log.append("status", 5) == 6
+        assert [r["seq"] for r in log.read(from_seq=5)] == [5, 6]
+        log.close()
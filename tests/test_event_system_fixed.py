@@ -7,6 +7,7 @@ import asyncio
 from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime
 import logging
+import threading
 
 # Import the EventSystem
 import sys
@@ -511,3 +512,392 @@ class TestEventSystemIntegration:
         assert "ai_response" in event_types
         assert "error" in event_types
         assert "recovery" in event_types
+
+
+class TestConcurrentDispatch:
+    """Test concurrent dispatch, handler timeouts, metrics and emit_nowait"""
+
+    def test_slow_handlers_run_concurrently(self):
+        event_system = EventSystem()
+        results = []
+
+        async def slow_async(data):
+            await asyncio.sleep(0.2)
+            results.append("async")
+
+        def slow_sync(data):
+            import time
+            time.sleep(0.2)
+            results.append("sync")
+
+        event_system.subscribe("evt", slow_async)
+        event_system.subscribe("evt", slow_sync)
+        event_system.subscribe("evt", slow_sync)
+
+        import time
+        start = time.perf_counter()
+        asyncio.run(event_system.emit("evt"))
+        elapsed = time.perf_counter() - start
+        event_system.shutdown()
+
+        assert sorted(results) == ["async", "sync", "sync"]
+        assert elapsed < 0.5
+
+    def test_handler_timeout_and_error_isolation(self):
+        event_system = EventSystem(handler_timeout=0.05)
+        received = []
+
+        async def hangs(data):
+            await asyncio.sleep(5)
+
+        def fails(data):
+            raise ValueError("boom")
+
+        event_system.subscribe("evt", hangs)
+        event_system.subscribe("evt", fails, inline=True)
+        event_system.subscribe("evt", received.append, inline=True)
+
+        with patch('logging.error') as mock_error:
+            asyncio.run(event_system.emit("evt", 1))
+
+        assert received == [1]
+        assert mock_error.call_count == 2
+        handlers = event_system.get_metrics()["handlers"]
+        assert handlers[hangs.__qualname__]["timeouts"] == 1
+        assert handlers[fails.__qualname__]["errors"] == 1
+        assert handlers["list.append"]["calls"] == 1
+
+    def test_per_handler_timeout_override(self):
+        event_system = EventSystem(handler_timeout=0.01)
+        done = []
+
+        async def slower(data):
+            await asyncio.sleep(0.05)
+            done.append(data)
+
+        event_system.subscribe("evt", slower, timeout=None)
+        asyncio.run(event_system.emit("evt", "ok"))
+
+        assert done == ["ok"]
+
+    def test_sync_handlers_see_emitter_context(self):
+        from utils.tracing import current_span, span
+
+        event_system = EventSystem()
+        seen = []
+        event_system.subscribe("evt", lambda data: seen.append(current_span().name))
+
+        async def main():
+            with span("voice.command"):
+                await event_system.emit("evt")
+
+        asyncio.run(main())
+        event_system.shutdown()
+        assert seen == ["voice.command"]
+
+    def test_emit_nowait(self):
+        event_system = EventSystem()
+        received = []
+        event_system.subscribe("evt", received.append, inline=True)
+
+        async def main():
+            event_system.emit_nowait("evt", 1)
+            event_system.emit_nowait("evt", 2)
+            assert received == []
+            await event_system.drain(timeout=1)
+
+        asyncio.run(main())
+        assert sorted(received) == [1, 2]
+        assert event_system.get_metrics()["pending"] == 0
+
+    def test_emit_nowait_without_loop(self):
+        event_system = EventSystem()
+        received = []
+        event_system.subscribe("evt", received.append, inline=True)
+
+        event_system.emit_nowait("evt", "from thread")
+        event_system.shutdown(wait=True)
+
+        assert received == ["from thread"]
+
+    def test_emit_nowait_from_many_threads(self):
+        event_system = EventSystem()
+        received = []
+        lock = threading.Lock()
+
+        def record(data):
+            with lock:
+                received.append(data)
+
+        async def record_async(data):
+            record(("async", data))
+
+        event_system.subscribe("evt", record)
+        event_system.subscribe("evt", record_async)
+
+        def producer(n):
+            for i in range(25):
+                event_system.emit_nowait("evt", (n, i))
+
+        threads = [threading.Thread(target=producer, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        event_system.shutdown(wait=True)
+
+        expected = [(n, i) for n in range(8) for i in range(25)]
+        assert sorted(r for r in received if r[0] != "async") == expected
+        assert sorted(r[1] for r in received if r[0] == "async") == expected
+        assert event_system.get_metrics()["events_emitted"] == 200
+        assert event_system.get_metrics()["pending"] == 0
+
+    def test_cancelled_handler_is_not_counted_as_ok(self):
+        event_system = EventSystem(handler_timeout=None)
+        started = asyncio.Event()
+
+        async def hangs(data):
+            started.set()
+            await asyncio.sleep(5)
+
+        event_system.subscribe("evt", hangs)
+
+        async def main():
+            task = asyncio.ensure_future(event_system.emit("evt"))
+            await started.wait()
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(main())
+        stats = event_system.get_metrics()["handlers"][hangs.__qualname__]
+        assert stats["calls"] == 1
+        assert stats["cancelled"] == 1
+
+
+class TestEventHistory:
+    """Test the ring-buffer history and its indexed queries"""
+
+    def test_ring_buffer_overwrites_oldest(self):
+        event_system = EventSystem(max_history=3)
+        for i in range(5):
+            asyncio.run(event_system.emit("tick" if i % 2 else "tock", i))
+
+        assert [e["data"] for e in event_system.event_history] == [2, 3, 4]
+        assert event_system.event_history[-1]["data"] == 4
+        assert [e["data"] for e in event_system.event_history[1:]] == [3, 4]
+        assert event_system.get_event_counts() == {"tock": 2, "tick": 1}
+
+    def test_resize_keeps_most_recent(self):
+        event_system = EventSystem()
+        for i in range(4):
+            event_system.event_history.append({"timestamp": datetime.now().isoformat(), "event": "e", "data": i})
+
+        event_system.max_history = 10
+        assert [e["data"] for e in event_system.event_history] == [0, 1, 2, 3]
+        event_system.max_history = 2
+        assert [e["data"] for e in event_system.event_history] == [2, 3]
+        assert event_system.max_history == 2
+
+    def test_query_by_name_and_time_range(self):
+        from datetime import timedelta
+
+        event_system = EventSystem(max_history=100)
+        base = datetime(2025, 1, 1, 12, 0)
+        for minute in range(60):
+            name = "error" if minute % 10 == 0 else "status"
+            event_system.event_history.append({
+                "timestamp": (base + timedelta(minutes=minute)).isoformat(), "event": name, "data": minute
+            })
+
+        errors = event_system.get_events("error", since=base + timedelta(minutes=15), until=base + timedelta(minutes=40))
+        assert [e["data"] for e in errors] == [20, 30, 40]
+        assert [e["data"] for e in event_system.get_events(until=base + timedelta(minutes=2))] == [0, 1, 2]
+        assert [e["data"] for e in event_system.get_recent_events(2, event_name="error")] == [40, 50]
+        assert event_system.get_events("missing") == []
+
+    def test_name_index_stays_consistent_under_eviction(self):
+        event_system = EventSystem(max_history=50)
+        for i in range(1000):
+            event_system.event_history.append({"timestamp": datetime.now().isoformat(), "event": f"e{i % 7}", "data": i})
+
+        for name in (f"e{k}" for k in range(7)):
+            expected = [e["data"] for e in event_system.event_history if e["event"] == name]
+            assert [e["data"] for e in event_system.get_events(name)] == expected
+        assert sum(event_system.get_event_counts().values()) == 50
+
+    def test_clear_history(self):
+        event_system = EventSystem()
+        asyncio.run(event_system.emit("evt"))
+        event_system.clear_history()
+
+        assert event_system.event_history == []
+        assert event_system.get_events("evt") == []
+
+
+class TestTopicSubscriptions:
+    """Test wildcard topic subscriptions"""
+
+    def test_wildcards(self):
+        event_system = EventSystem()
+        seen = {"star": [], "hash": [], "exact": []}
+        event_system.subscribe("maverick.*", lambda e, d: seen["star"].append(e), inline=True, pass_event=True)
+        event_system.subscribe("voice.#", lambda e, d: seen["hash"].append(e), inline=True, pass_event=True)
+        event_system.subscribe("maverick.started", seen["exact"].append, inline=True)
+
+        async def main():
+            for name in ("maverick.started", "maverick.error_detected", "maverick.analysis.deep",
+                         "voice", "voice.stt.done", "voices.stt"):
+                await event_system.emit(name, name)
+
+        asyncio.run(main())
+        assert seen["star"] == ["maverick.started", "maverick.error_detected"]
+        assert seen["hash"] == ["voice", "voice.stt.done"]
+        assert seen["exact"] == ["maverick.started"]
+
+    def test_match_cache_and_unsubscribe(self):
+        event_system = EventSystem()
+        received = []
+        unsubscribe = event_system.subscribe("*.error", received.append, inline=True)
+
+        assert event_system.topics.match("gui.error") == ("*.error",)
+        asyncio.run(event_system.emit("gui.error", 1))
+        unsubscribe()
+        assert event_system.topics.match("gui.error") == ()
+        assert event_system.topics._root["children"] == {}
+        asyncio.run(event_system.emit("gui.error", 2))
+        assert received == [1]
+
+    def test_hash_must_be_last(self):
+        with pytest.raises(ValueError):
+            EventSystem().subscribe("voice.#.done", print)
+
+
+class TestQueuedDispatch:
+    """Test queued mode: priorities, overflow policies, backpressure and metrics"""
+
+    def _run(self, event_system, produce):
+        delivered = []
+
+        async def record(name, data):
+            delivered.append(data)
+
+        event_system.subscribe("#", record, pass_event=True)
+
+        async def main():
+            await produce()
+            await event_system.join(timeout=2)
+            await event_system.stop_workers()
+
+        asyncio.run(main())
+        return delivered
+
+    def test_priorities_dispatch_high_first(self):
+        event_system = EventSystem(queued=True, dispatch_workers=1)
+
+        async def produce():
+            await event_system.emit("status", "low", priority=2)
+            await event_system.emit("status", "normal")
+            await event_system.emit("alert", "high", priority=0)
+
+        assert self._run(event_system, produce) == ["high", "normal", "low"]
+
+    @pytest.mark.parametrize("policy, expected", [
+        ("drop_oldest", [2, 3]),
+        ("drop_newest", [0, 1]),
+    ])
+    def test_drop_policies(self, policy, expected):
+        event_system = EventSystem(queued=True, queue_size=2, dispatch_workers=1, overflow_policy=policy)
+
+        async def produce():
+            for i in range(4):
+                await event_system.emit("tick", i)
+
+        assert self._run(event_system, produce) == expected
+        assert event_system.get_queue_metrics()[f"dropped_{policy.split('_')[1]}"] == 2
+
+    def test_coalesce_keeps_latest_per_key(self):
+        event_system = EventSystem(queued=True, dispatch_workers=1, overflow_policy="coalesce")
+
+        async def produce():
+            for i in range(5):
+                await event_system.emit("cpu", {"cpu": i})
+                await event_system.emit("gpu", {"gpu": i})
+
+        assert self._run(event_system, produce) == [{"cpu": 4}, {"gpu": 4}]
+        assert event_system.get_queue_metrics()["coalesced"] == 8
+
+    def test_block_applies_backpressure(self):
+        event_system = EventSystem(queued=True, queue_size=1, dispatch_workers=1, overflow_policy="block")
+
+        async def produce():
+            for i in range(5):
+                await event_system.emit("frame", i)
+
+        assert self._run(event_system, produce) == [0, 1, 2, 3, 4]
+        metrics = event_system.get_metrics()["queue"]
+        assert metrics["blocked"] > 0
+        assert metrics["dispatched"] == 5
+        assert metrics["depth"] == {"high": 0, "normal": 0, "low": 0}
+        assert metrics["max_wait_ms"] >= metrics["avg_wait_ms"] >= 0
+
+    def test_unknown_policy_rejected(self):
+        with pytest.raises(ValueError):
+            EventSystem(queued=True, overflow_policy="explode")
+
+
+class TestStateChannels:
+    """Test latest-value-wins state channels"""
+
+    def test_updates_are_coalesced_per_interval(self):
+        event_system = EventSystem()
+        event_system.state_channel("audio.level", interval=0.05)
+        received = []
+        event_system.subscribe("audio.level", received.append, inline=True)
+
+        async def main():
+            for level in range(10):
+                event_system.publish_state("audio.level", level)
+            await asyncio.sleep(0.01)
+            assert received == [9]
+            for level in range(10, 20):
+                event_system.publish_state("audio.level", level)
+            await asyncio.sleep(0.01)
+            assert received == [9]
+            await asyncio.sleep(0.08)
+            await event_system.drain()
+
+        asyncio.run(main())
+        assert received == [9, 19]
+        assert [e["data"] for e in event_system.get_events("audio.level")] == [9, 19]
+        assert event_system.get_state("audio.level") == 19
+        assert event_system.get_state_metrics()["audio.level"] == {
+            "interval": 0.05, "updates": 20, "emitted": 2, "coalesced": 18
+        }
+
+    def test_publish_from_other_thread(self):
+        import threading
+
+        event_system = EventSystem()
+        event_system.state_channel("model.status", interval=0.01)
+        received = []
+        event_system.subscribe("model.status", received.append, inline=True)
+
+        async def main():
+            event_system._loop = asyncio.get_running_loop()
+            worker = threading.Thread(target=lambda: [event_system.publish_state("model.status", s)
+                                                      for s in ("loading", "ready")])
+            worker.start()
+            worker.join()
+            await asyncio.sleep(0.05)
+            await event_system.drain()
+
+        asyncio.run(main())
+        assert received[-1] == "ready"
+        assert len(received) <= 2
+
+    def test_get_state_without_loop(self):
+        event_system = EventSystem()
+        event_system.publish_state("cpu", 12.5)
+
+        assert event_system.get_state("cpu") == 12.5
+        assert event_system.get_state("gpu", "n/a") == "n/a"
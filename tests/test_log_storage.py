@@ -0,0 +1,101 @@
+"""
+Tests for segmented, compressed log storage
+"""
+import gzip
+import json
+import logging
+from datetime import datetime
+
+from utils.log_storage import SegmentedLog, SegmentedLogHandler, json_timestamp
+
+
+class TestSegmentedLog:
+    """Test rotation, compression, retention and time-window reads"""
+
+    def test_rotates_by_size_and_compresses(self, tmp_path):
+        log = SegmentedLog(tmp_path, "app", max_segment_bytes=100, max_segment_age=None)
+        for i in range(20):
+            log.write(f"line {i:02d} " + "x" * 20, timestamp=1000.0 + i)
+
+        assert log.stats["rotations"] >= 4
+        closed = log.segments
+        assert all(seg["file"].endswith(".log.gz") for seg in closed)
+        with gzip.open(tmp_path / closed[0]["file"], "rt") as f:
+            assert f.readline().startswith("line 00")
+        assert list(log.read_lines())[-1].startswith("line 19")
+        log.close()
+
+    def test_rotates_by_age(self, tmp_path):
+        log = SegmentedLog(tmp_path, "app", max_segment_age=60)
+        log.write("old", timestamp=1000.0)
+        log.write("new", timestamp=1100.0)
+
+        assert len(log.segments) == 1
+        assert log.segments[0]["start"] == 1000.0
+        log.close()
+
+    def test_time_window_reads_only_overlapping_segments(self, tmp_path):
+        log = SegmentedLog(tmp_path, "app", max_segment_age=60, retention_seconds=None)
+        for hour in range(5):
+            log.write(f"hour {hour}", timestamp=hour * 3600.0)
+
+        segments = log.segments_between(2 * 3600.0, 3 * 3600.0)
+        assert len(segments) == 2
+        assert list(log.read_lines(2 * 3600.0, 3 * 3600.0)) == ["hour 2", "hour 3"]
+        log.close()
+
+    def test_retention_by_age_and_size(self, tmp_path):
+        log = SegmentedLog(tmp_path, "app", max_segment_age=60, retention_seconds=3 * 3600.0, compress=False)
+        for hour in range(6):
+            log.write(f"hour {hour}", timestamp=hour * 3600.0)
+
+        assert log.stats["segments_removed"] == 2
+        assert list(log.read_lines()) == ["hour 2", "hour 3", "hour 4", "hour 5"]
+
+        log.max_total_bytes = 8
+        log.apply_retention(now=5 * 3600.0)
+        assert len(log.segments) == 1
+        log.close()
+
+    def test_index_survives_restart_and_recovers_orphans(self, tmp_path):
+        log = SegmentedLog(tmp_path, "app", max_segment_age=60)
+        log.write("first", timestamp=1000.0)
+        log.write("second", timestamp=2000.0)
+        # Simulate a crash: the active segment is never closed
+        log._active.close()
+
+        reopened = SegmentedLog(tmp_path, "app", retention_seconds=None)
+        assert list(reopened.read_lines()) == ["first", "second"]
+        assert json.loads((tmp_path / "app.index.json").read_text())[-1]["file"].endswith(".gz")
+        reopened.close()
+
+    def test_json_timestamp_filter(self, tmp_path):
+        log = SegmentedLog(tmp_path, "actions")
+        for minute in (0, 10, 20):
+            ts = datetime(2025, 1, 1, 12, minute)
+            log.write(json.dumps({"timestamp": ts.isoformat(), "n": minute}), timestamp=ts.timestamp())
+
+        lines = log.read_lines(datetime(2025, 1, 1, 12, 5).timestamp(), datetime(2025, 1, 1, 12, 15).timestamp(),
+                               timestamp_of=json_timestamp)
+        assert [json.loads(line)["n"] for line in lines] == [10]
+        log.close()
+
+
+class TestSegmentedLogHandler:
+    """Test the logging handler"""
+
+    def test_handler_writes_formatted_records(self, tmp_path):
+        handler = SegmentedLogHandler(tmp_path, "component")
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        logger = logging.getLogger("test_log_storage.handler")
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            logger.warning("disk almost full")
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        reopened = SegmentedLog(tmp_path, "component")
+        assert list(reopened.read_lines()) == ["WARNING disk almost full"]
+        reopened.close()
@@ -0,0 +1,194 @@
+"""
+Tests for the queue-based logging pipeline in ultron_agent.logging_config
+"""
+import json
+import logging
+import random
+import threading
+
+import pytest
+
+from ultron_agent.logging_config import (
+    BoundedQueueHandler, RateLimitFilter, UltronJsonFormatter, get_logging_stats, queue_handlers,
+    queue_root_handlers, shutdown_logging,
+)
+
+
+class _BlockingHandler(logging.Handler):
+    """Handler that blocks until released, to fill the queue deterministically"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+        self.gate.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+class TestQueueLogging:
+    """Test bounded queueing, overflow policies and shutdown flushing"""
+
+    def test_records_are_written_by_listener(self):
+        target = _BlockingHandler()
+        target.gate.set()
+        handler = queue_handlers(target, queue_size=100)
+        logger = _logger("test.queue.basic", handler)
+
+        logger.info("hello %s", "world")
+        handler.stop()
+
+        assert target.messages == ["hello world"]
+        assert handler.get_stats()["enqueued"] == 1
+
+    @pytest.mark.parametrize("policy, kept", [("drop_new", ["m0", "m1", "m2"]), ("drop_oldest", ["m0", "m3", "m4"])])
+    def test_overflow_policies(self, policy, kept):
+        target = _BlockingHandler()
+        handler = BoundedQueueHandler([target], queue_size=2, overflow_policy=policy)
+        logger = _logger(f"test.queue.{policy}", handler)
+
+        logger.info("m0")
+        while handler.queue.qsize():
+            pass  # the listener has taken m0 and is blocked in the target
+        for i in range(1, 5):
+            logger.info(f"m{i}")
+        target.gate.set()
+        handler.stop()
+
+        assert target.messages == kept
+        stats = handler.get_stats()
+        assert stats["dropped"] == 2
+        assert stats["dropped_by_level"] == {"INFO": 2}
+
+    def test_logging_after_shutdown_is_synchronous(self):
+        target = _BlockingHandler()
+        target.gate.set()
+        handler = queue_handlers(target)
+        logger = _logger("test.queue.shutdown", handler)
+
+        shutdown_logging()
+        logger.warning("late message")
+
+        assert target.messages == ["late message"]
+        assert any(not stats["running"] for stats in get_logging_stats())
+
+    def test_records_carry_callers_trace_ids(self):
+        from utils.tracing import span
+
+        target = _BlockingHandler()
+        target.gate.set()
+        seen = []
+        target.addFilter(lambda record: seen.append((record.trace_id, record.span_id)) or True)
+        handler = queue_handlers(target)
+        logger = _logger("test.queue.trace", handler)
+
+        with span("voice.command") as active:
+            logger.info("inside span")
+        logger.info("outside span")
+        handler.stop()
+
+        assert seen == [(active.trace_id, active.span_id), (None, None)]
+
+    def test_exceptions_stay_structured(self):
+        target = _BlockingHandler()
+        target.gate.set()
+        target.setFormatter(UltronJsonFormatter())
+        formatted = []
+        target.addFilter(lambda record: formatted.append(target.format(record)) or True)
+        handler = queue_handlers(target)
+        logger = _logger("test.queue.exception", handler)
+
+        try:
+            raise ValueError("bad input")
+        except ValueError:
+            logger.exception("lookup %s failed", "x")
+        handler.stop()
+
+        entry = json.loads(formatted[0])
+        assert entry["message"] == "lookup x failed"
+        assert "ValueError: bad input" in entry["exc_info"]
+
+    def test_unknown_policy_rejected(self):
+        with pytest.raises(ValueError):
+            BoundedQueueHandler([], overflow_policy="explode")
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimitFilter:
+    """Test per-call-site rate limiting, sampling and suppression summaries"""
+
+    def _record(self, level=logging.INFO, lineno=10, msg="ping"):
+        return logging.LogRecord("ultron.test", level, "/app/agent_core.py", lineno, msg, None, None)
+
+    def test_token_bucket_per_call_site(self):
+        clock = _Clock()
+        rate_filter = RateLimitFilter(rate=1.0, burst=3, clock=clock)
+
+        assert [rate_filter.filter(self._record()) for _ in range(5)] == [True, True, True, False, False]
+        assert rate_filter.filter(self._record(lineno=11))
+        clock.now = 2.0
+        assert [rate_filter.filter(self._record()) for _ in range(3)] == [True, True, False]
+        assert rate_filter.stats["rate_limited"] == 3
+
+    def test_warnings_are_never_suppressed(self):
+        rate_filter = RateLimitFilter(rate=0.0, burst=0, sample_rates={"WARNING": 0.0})
+
+        assert all(rate_filter.filter(self._record(logging.WARNING)) for _ in range(10))
+
+    def test_sampling(self):
+        rate_filter = RateLimitFilter(rate=None, sample_rates={"DEBUG": 0.25}, rng=random.Random(1))
+
+        kept = sum(rate_filter.filter(self._record(logging.DEBUG)) for _ in range(2000))
+        assert 400 < kept < 600
+        assert rate_filter.filter(self._record(logging.INFO))
+
+    def test_suppression_summary(self, caplog):
+        clock = _Clock()
+        rate_filter = RateLimitFilter(rate=0.0, burst=1, summary_interval=60, clock=clock)
+        for _ in range(4):
+            rate_filter.filter(self._record())
+
+        with caplog.at_level(logging.INFO, logger="ultron.logging.ratelimit"):
+            clock.now = 61.0
+            rate_filter.filter(self._record())
+
+        summaries = [r for r in caplog.records if getattr(r, "rate_limit_summary", False)]
+        assert len(summaries) == 1
+        assert "Suppressed 4 similar messages" in summaries[0].getMessage()
+        assert "agent_core.py:10" in summaries[0].getMessage()
+        assert rate_filter.filter(summaries[0])
+
+    def test_root_queue_limits_propagated_records(self):
+        root_logger = logging.getLogger()
+        saved = root_logger.handlers[:]
+        target = _BlockingHandler()
+        target.gate.set()
+        root_logger.handlers = [target]
+        try:
+            root_handler = queue_root_handlers()
+            logger = logging.getLogger("ultron.test.propagated")
+            logger.setLevel(logging.INFO)
+            for _ in range(200):
+                logger.info("ping")
+            root_handler.stop()
+        finally:
+            root_logger.handlers = saved
+
+        assert 0 < len(target.messages) < 200
+        assert [type(f) for f in root_handler.filters] == [RateLimitFilter]
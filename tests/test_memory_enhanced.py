@@ -0,0 +1,542 @@
+"""
+Tests for the ultron_addons enhanced memory backends
+"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from ultron_addons.dedup import NearDuplicateDetector, attach_deduplicator
+from ultron_addons.embedding_cache import EmbeddingCache
+from ultron_addons.embedding_worker import EmbeddingWorker
+from ultron_addons.hashing_embedder import HashingEmbedder, cosine_similarity, evaluate_embedder, load_eval_set
+from ultron_addons.memory_enhanced import VectorMemory
+from ultron_addons.quantization import QuantizedVectorIndex
+from ultron_addons.retrieval import BM25Index, HybridRetriever, reciprocal_rank_fusion
+from ultron_addons.tiered_memory import TieredStore, attach_tiered_store
+
+
+class TestEmbeddingWorker:
+    """Test micro-batched background embedding"""
+
+    def test_items_are_batched(self):
+        batches = []
+
+        def encode(texts):
+            batches.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        results = {}
+        worker = EmbeddingWorker(encode, max_batch_size=4, max_wait=0.2)
+        for i in range(8):
+            worker.submit(i, "x" * i, lambda k, v: results.__setitem__(k, v))
+
+        assert worker.flush(timeout=5)
+        worker.stop()
+        assert results == {i: [float(i)] for i in range(8)}
+        assert all(len(b) <= 4 for b in batches)
+        assert len(batches) < 8
+
+    def test_batch_closes_on_time_bound(self):
+        done = threading.Event()
+        worker = EmbeddingWorker(lambda texts: [[1.0] for _ in texts], max_batch_size=100, max_wait=0.01)
+        start = time.monotonic()
+        worker.submit("a", "text", lambda k, v: done.set())
+        assert done.wait(timeout=2)
+        assert time.monotonic() - start < 1
+        worker.stop()
+
+    def test_encode_failure_is_isolated(self):
+        results = {}
+
+        def encode(texts):
+            raise RuntimeError("model crashed")
+
+        worker = EmbeddingWorker(encode, max_wait=0)
+        worker.submit("a", "text", lambda k, v: results.__setitem__(k, v))
+        assert worker.flush(timeout=5)
+        worker.stop()
+        assert results == {"a": None}
+        assert worker.stats["errors"] == 1
+
+
+class TestEmbeddingCache:
+    """Test the content-hash embedding cache"""
+
+    def test_lru_hits_and_eviction(self):
+        cache = EmbeddingCache(max_entries=2)
+        cache.put("m", "a", [1.0])
+        cache.put("m", "b", [2.0])
+        assert cache.get("m", "a") == [1.0]
+        cache.put("m", "c", [3.0])  # evicts "b", the least recently used
+
+        assert cache.get("m", "b") is None
+        assert cache.get("m", "c") == [3.0]
+        assert cache.get("other-model", "a") is None
+        metrics = cache.get_metrics()
+        assert metrics["hits"] == 2
+        assert metrics["misses"] == 2
+        assert metrics["evictions"] == 1
+        assert metrics["hit_rate"] == 0.5
+
+    def test_get_or_compute_only_encodes_misses(self):
+        cache = EmbeddingCache()
+        calls = []
+
+        def compute(texts):
+            calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        assert cache.get_or_compute("m", ["aa", "b", "aa"], compute) == [[2.0], [1.0], [2.0]]
+        assert cache.get_or_compute("m", ["b", "ccc"], compute) == [[1.0], [3.0]]
+        assert calls == [["aa", "b"], ["ccc"]]
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = tmp_path / "embeddings.db"
+        cache = EmbeddingCache(disk_path=path)
+        cache.put("m", "hello", [0.5, 0.25])
+        cache.close()
+
+        reopened = EmbeddingCache(disk_path=path)
+        assert reopened.get("m", "hello") == [0.5, 0.25]
+        assert reopened.stats["disk_hits"] == 1
+        reopened.close()
+
+
+class TestVectorMemory:
+    """Test VectorMemory with the background embedding pipeline"""
+
+    def test_add_is_keyword_searchable_before_embedding(self):
+        release = threading.Event()
+        memory = VectorMemory()
+
+        def slow_batch(texts):
+            release.wait(timeout=5)
+            return [[1.0, 0.0] for _ in texts]
+
+        memory.worker.encode_batch = slow_batch
+        memory.add("the reactor is overheating")
+        assert memory.long_term_memory["1"]["embedding"] is None
+        assert memory.search("reactor overheating", top_k=1) == ["the reactor is overheating"]
+
+        release.set()
+        assert memory.flush(timeout=5)
+        assert memory.long_term_memory["1"]["embedding"] == [1.0, 0.0]
+        memory.close()
+
+    def test_wait_for_embeddings(self):
+        memory = VectorMemory()
+        for i in range(5):
+            memory.add(f"item {i}")
+
+        assert asyncio.run(memory.wait_for_embeddings(timeout=5))
+        assert all(info["embedding"] is not None for info in memory.long_term_memory.values())
+        memory.close()
+
+    def test_synchronous_mode(self):
+        memory = VectorMemory(async_embedding=False)
+        memory.add("hello")
+        assert memory.worker is None
+        assert memory.long_term_memory["1"]["embedding"] is not None
+        assert memory.flush() is True
+
+    def test_repeated_text_is_served_from_cache(self):
+        cache = EmbeddingCache()
+        memory = VectorMemory(async_embedding=False, cache=cache)
+        memory.add("status: all systems nominal")
+        memory.add("status: all systems nominal")
+        memory.search("status: all systems nominal")
+
+        assert cache.stats["misses"] == 1
+        assert cache.stats["hits"] == 2
+
+    def test_fallback_vectors_are_cached_under_their_own_model(self):
+        class BrokenModel:
+            model_id = "broken-model"
+
+            def encode(self, texts):
+                raise RuntimeError("model crashed")
+
+        cache = EmbeddingCache()
+        memory = VectorMemory(async_embedding=False, cache=cache)
+        memory.embedder = BrokenModel()
+        memory.add("fallback text")
+
+        assert cache.get(memory.fallback_embedder.model_id, "fallback text") is not None
+        assert cache.get("broken-model", "fallback text") is None
+
+
+class TestHashingEmbedder:
+    """Test the offline hashed n-gram embedder"""
+
+    def test_fixed_dimensionality_and_normalisation(self):
+        embedder = HashingEmbedder(dim=64)
+        vectors = embedder.encode(["hello world", "", "a much longer sentence about ollama"])
+        assert len(vectors) == 3
+        assert all(len(v) == 64 for v in vectors)
+        assert sum(x * x for x in vectors[0]) == pytest.approx(1.0, abs=1e-5)
+        assert not any(vectors[1])
+
+    def test_similar_text_scores_higher(self):
+        embedder = HashingEmbedder()
+        query, near, far = embedder.encode(["restart the ollama server", "the ollama server restarted", "weather forecast"])
+        assert cosine_similarity(query, near) > cosine_similarity(query, far)
+
+    def test_fit_changes_model_id(self):
+        embedder = HashingEmbedder()
+        before = embedder.model_id
+        embedder.fit(["one document", "another document"])
+        assert embedder.model_id != before
+
+    def test_bundled_eval_set_quality(self):
+        data = load_eval_set()
+        scores = evaluate_embedder(HashingEmbedder().fit(data["documents"].values()), data)
+        assert scores["recall@3"] >= 0.8
+        assert scores["mrr"] >= 0.7
+
+    def test_vector_memory_uses_hashing_fallback(self):
+        memory = VectorMemory(async_embedding=False, cache=EmbeddingCache())
+        if not isinstance(memory.embedder, HashingEmbedder):
+            pytest.skip("sentence_transformers is installed")
+        memory.add("the gpu temperature is 80 degrees")
+        memory.add("remember to buy milk")
+        assert memory.search("gpu temperature", top_k=1) == ["the gpu temperature is 80 degrees"]
+
+
+class TestHybridRetrieval:
+    """Test BM25 + vector retrieval with reciprocal rank fusion"""
+
+    def test_bm25_ranks_matching_documents(self):
+        index = BM25Index()
+        index.add("a", "ollama server is running on port 11434")
+        index.add("b", "the weather is sunny")
+        index.add("c", "restart the ollama server")
+        results = index.search("ollama server")
+        assert {doc for doc, _ in results} == {"a", "c"}
+
+        index.remove("c")
+        assert [doc for doc, _ in index.search("ollama")] == ["a"]
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([[("a", 9.0), ("b", 5.0)], [("b", 0.9), ("c", 0.8)]])
+        assert fused[0][0] == "b"
+        assert {doc for doc, _ in fused} == {"a", "b", "c"}
+
+    def test_retriever_returns_ready_sources_within_budget(self):
+        class SlowVectorMemory:
+            def keyword_search(self, query, top_k):
+                return [("fast", 1.0)]
+
+            def vector_search(self, query, top_k):
+                time.sleep(0.5)
+                return [("slow", 1.0)]
+
+            def get_item(self, key):
+                return key
+
+        retriever = HybridRetriever(SlowVectorMemory(), budget_ms=20)
+        start = time.monotonic()
+        assert retriever.retrieve("anything") == [("fast", pytest.approx(1 / 61))]
+        assert time.monotonic() - start < 0.3
+        assert retriever.stats["late"]["vector"] == 1
+
+        # The still-running vector search is skipped rather than queued again
+        retriever.retrieve("anything")
+        assert retriever.stats["skipped"]["vector"] == 1
+
+    def test_vector_memory_recent_context(self):
+        memory = VectorMemory(async_embedding=False, cache=EmbeddingCache(), retrieval_budget_ms=1000)
+        memory.add("the gpu temperature is 80 degrees")
+        memory.add("remember to buy milk")
+        memory.add("schedule a meeting with tony")
+
+        context = memory.get_recent_context(limit=1, query="gpu temperature", max_chars=200)
+        assert context == "- the gpu temperature is 80 degrees"
+        assert len(memory.get_recent_context(limit=3, max_chars=40)) <= 40
+
+
+class TestTieredMemory:
+    """Test hot/cold tiering, eviction policies and consolidation"""
+
+    def test_lru_eviction_moves_items_to_cold_tier(self, tmp_path):
+        hot = {}
+        store = TieredStore(hot, cold_path=tmp_path / "cold.db", max_hot_items=2)
+        for key in ("a", "b", "c"):
+            hot[key] = f"item {key}"
+            store.admit(key, hot[key])
+            if key == "b":
+                store.touch("a")
+
+        assert set(hot) == {"a", "c"}
+        assert "b" in store.cold
+        assert store.get("b", promote=False) == "item b"
+        assert store.get_metrics()["evictions"] == 1
+
+    def test_lfu_and_age_policies(self, tmp_path):
+        hot = {}
+        lfu = TieredStore(hot, cold_path=tmp_path / "lfu.db", max_hot_items=2, eviction_policy="lfu")
+        for key in ("a", "b"):
+            hot[key] = key
+            lfu.admit(key, key)
+        lfu.touch("a")
+        lfu.touch("a")
+        hot["c"] = "c"
+        lfu.admit("c", "c")
+        assert set(hot) == {"a", "c"}
+
+        hot = {}
+        age = TieredStore(hot, cold_path=tmp_path / "age.db", max_hot_items=2, eviction_policy="age")
+        for key in ("a", "b", "c"):
+            hot[key] = key
+            age.admit(key, key)
+            age.touch("a")
+        assert set(hot) == {"b", "c"}
+
+        with pytest.raises(ValueError):
+            TieredStore({}, cold_path=tmp_path / "x.db", eviction_policy="random")
+
+    def test_byte_ceiling(self, tmp_path):
+        hot = {}
+        store = TieredStore(hot, cold_path=tmp_path / "cold.db", max_hot_items=None, max_hot_bytes=500)
+        for i in range(10):
+            hot[str(i)] = "x" * 100
+            store.admit(str(i), hot[str(i)])
+        assert store.hot_bytes <= 500
+        assert len(hot) + len(store.cold) == 10
+
+    def test_promotion_on_access(self, tmp_path):
+        hot = {}
+        store = TieredStore(hot, cold_path=tmp_path / "cold.db", max_hot_items=1)
+        hot["a"] = "first"
+        store.admit("a", "first")
+        hot["b"] = "second"
+        store.admit("b", "second")
+
+        assert store.get("a") == "first"
+        assert "a" in hot and "b" not in hot
+        assert store.stats["promotions"] == 1
+
+    def test_consolidation_summarises_stale_clusters(self, tmp_path):
+        hot = {}
+        store = TieredStore(hot, cold_path=tmp_path / "cold.db", max_hot_items=1)
+        texts = [
+            "cpu usage is high on the main server",
+            "cpu usage is high on the main server again",
+            "the main server cpu usage is high",
+            "buy groceries tomorrow",
+            "latest message",
+        ]
+        for i, text in enumerate(texts):
+            hot[str(i)] = text
+            store.admit(str(i), text)
+
+        report = store.consolidate(stale_after=0, now=time.time() + 1)
+        assert report == {"scanned": 4, "clusters": 1, "items_consolidated": 3}
+        assert len(store.cold) == 2
+        summary_key = store.cold.keyword_search("cpu server")[0][0]
+        summary = store.cold.get(summary_key)
+        assert summary["kind"] == "summary"
+        assert summary["value"]["count"] == 3
+        assert "cpu" in summary["value"]["keywords"]
+
+    def test_vector_memory_searches_cold_tier_when_hot_is_poor(self, tmp_path):
+        memory = VectorMemory(
+            async_embedding=False, cache=EmbeddingCache(), max_hot_items=2, cold_path=str(tmp_path / "cold.db")
+        )
+        memory.add("the gpu temperature is 80 degrees")
+        memory.add("remember to buy milk")
+        memory.add("schedule a meeting with tony")
+
+        assert len(memory.long_term_memory) == 2
+        assert memory.search("gpu temperature", top_k=1) == ["the gpu temperature is 80 degrees"]
+        assert memory.tiers.stats["cold_queries"] == 1
+
+    def test_async_embeddings_count_against_byte_ceiling(self, tmp_path):
+        memory = VectorMemory(cache=EmbeddingCache(), max_hot_items=None, max_hot_bytes=20_000,
+                              cold_path=str(tmp_path / "cold.db"))
+        for i in range(40):
+            memory.add(f"sensor reading {i} is nominal")
+        assert memory.flush(timeout=5)
+
+        tiers = memory.tiers
+        assert tiers.hot_bytes <= 20_000
+        assert tiers.stats["evictions"] > 0
+        assert all(info["embedding"] is not None for info in memory.long_term_memory.values())
+        memory.close()
+
+    def test_late_embedding_of_evicted_item_reaches_cold_tier(self, tmp_path):
+        release = threading.Event()
+        memory = VectorMemory(cache=EmbeddingCache(), max_hot_items=2, cold_path=str(tmp_path / "cold.db"))
+        encode = memory.worker.encode_batch
+
+        def slow_batch(texts):
+            release.wait(timeout=5)
+            return encode(texts)
+
+        memory.worker.encode_batch = slow_batch
+        for text in ("the gpu temperature is 80 degrees", "remember to buy milk", "schedule a meeting with tony"):
+            memory.add(text)
+        release.set()
+        assert memory.flush(timeout=5)
+
+        cold = memory.tiers.cold
+        embedded = cold._db.execute("SELECT COUNT(*) FROM items WHERE embedding IS NOT NULL").fetchone()[0]
+        assert embedded == len(cold) == 1
+        assert cold.vector_search(memory._embed("gpu temperature"), 1)[0][0] == "1"
+        memory.close()
+
+    def test_core_memory_tiering(self, tmp_path):
+        from memory import Memory
+
+        memory = Memory(long_term_file=str(tmp_path / "ltm.json"))
+        attach_tiered_store(memory, cold_path=tmp_path / "cold.db", max_hot_items=1)
+        memory.add_to_long_term("the reactor core is stable")
+        memory.add_to_long_term("hello there")
+
+        assert list(memory.long_term_memory.values()) == ["hello there"]
+        assert memory.search_memory("reactor") == ["the reactor core is stable"]
+
+
+class TestQuantizedEmbeddings:
+    def _vectors(self, n=200, dim=32):
+        import random
+
+        rng = random.Random(7)
+        return [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(n)]
+
+    @pytest.mark.parametrize("mode", ["float16", "int8"])
+    def test_rescored_search_matches_exact(self, mode):
+        vectors = self._vectors()
+        index = QuantizedVectorIndex(32, mode=mode)
+        for i, vec in enumerate(vectors):
+            index.add(i, vec)
+
+        assert index.search(vectors[5], top_k=1)[0][0] == 5
+        recall = index.evaluate_recall(vectors[:20], top_k=5)
+        assert recall["recall@5_rescored"] >= 0.95
+        assert recall["recall@5_rescored"] >= recall["recall@5_quantised_only"]
+
+    def test_memory_report_and_remove(self, tmp_path):
+        index = QuantizedVectorIndex(32, mode="int8", full_precision_path=tmp_path / "full.f32")
+        for i, vec in enumerate(self._vectors(10)):
+            index.add(i, vec)
+        vector = index.remove(3)
+
+        assert len(vector) == 32 and 3 not in index
+        report = index.memory_report()
+        assert report["vectors"] == 9
+        assert report["full_precision_bytes_in_ram"] == 0
+        assert report["compression_ratio"] > 8
+        index.close()
+
+    def test_vector_memory_int8_storage(self, tmp_path):
+        memory = VectorMemory(
+            async_embedding=False, cache=EmbeddingCache(), embedding_storage="int8",
+            max_hot_items=2, cold_path=str(tmp_path / "cold.db"),
+        )
+        memory.add("the gpu temperature is 80 degrees")
+        memory.add("remember to buy milk")
+        memory.add("schedule a meeting with tony")
+
+        assert all(info["embedding"] is None for info in memory.long_term_memory.values())
+        assert len(memory.vector_index) == 2
+        assert memory.search("buy milk", top_k=1) == ["remember to buy milk"]
+        assert memory.vector_search("gpu temperature", top_k=1)[0][0] == "1"
+        assert memory.memory_report()["saved_bytes"] > 0
+        assert memory.evaluate_recall(["buy milk"], top_k=1)["recall@1_rescored"] == 1.0
+        assert memory.memory_report()["full_precision_bytes_in_ram"] == 0
+        memory.close()
+
+    @pytest.mark.parametrize("on_disk", [False, True])
+    def test_churn_compacts_dead_rows(self, on_disk, monkeypatch):
+        # Windows has no positional file I/O
+        monkeypatch.delattr(os, "pread", raising=False)
+        monkeypatch.delattr(os, "pwrite", raising=False)
+        vectors = self._vectors(100)
+        index = QuantizedVectorIndex(32, mode="int8", full_precision_on_disk=on_disk)
+        for _ in range(10):
+            for i, vec in enumerate(vectors):
+                index.add(i, vec)
+            for i in range(0, 100, 2):
+                index.remove(i)
+
+        assert index.compactions > 0
+        assert len(index._keys) < 2 * len(vectors)
+        assert len(index) == 50
+        assert index.search(vectors[7], top_k=1)[0][0] == 7
+        assert index.exact_search(vectors[9], top_k=1)[0][0] == 9
+        norm = sum(x * x for x in vectors[11]) ** 0.5
+        assert index.remove(11) == pytest.approx([x / norm for x in vectors[11]], abs=1e-6)
+        index.close()
+
+    def test_query_dimension_mismatch(self):
+        vectors = self._vectors(10)
+        index = QuantizedVectorIndex(32, mode="int8")
+        for i, vec in enumerate(vectors):
+            index.add(i, vec)
+
+        assert index.search([1.0] * 16) == []
+        assert index.exact_search([1.0] * 16) == []
+        assert index.evaluate_recall([[1.0] * 16, vectors[0]], top_k=1)["recall@1_rescored"] == 0.5
+        index.close()
+
+    def test_unknown_storage_mode_rejected(self):
+        with pytest.raises(ValueError):
+            VectorMemory(async_embedding=False, embedding_storage="int4")
+
+
+class TestNearDuplicateDetection:
+    LONG_TEXT = (
+        "the user asked ultron to summarise the quarterly report and email the summary to the finance "
+        "team before the friday meeting so that everyone can review the numbers in advance"
+    )
+
+    def test_short_text_simhash(self):
+        detector = NearDuplicateDetector()
+        detector.add("a", "System status: all systems nominal")
+
+        assert detector.find_duplicate("system status - all systems nominal.") == "a"
+        assert detector.find_duplicate("remember to buy milk") is None
+
+    def test_long_text_minhash(self):
+        detector = NearDuplicateDetector()
+        detector.add("a", self.LONG_TEXT)
+
+        assert detector.find_duplicate(self.LONG_TEXT + " please") == "a"
+        assert detector.find_duplicate(
+            "play the workout playlist on spotify at high volume while the living room lights dim slowly "
+            "over ten minutes and the thermostat drops two degrees before bedtime tonight"
+        ) is None
+
+    def test_stale_candidates_are_dropped(self):
+        detector = NearDuplicateDetector()
+        detector.add("a", "turn on the lights")
+
+        assert detector.find_duplicate("turn on the lights", exists=lambda key: False) is None
+        assert len(detector) == 0
+
+    def test_core_memory_reference_counts_duplicates(self, tmp_path):
+        from memory import Memory
+
+        memory = Memory(long_term_file=str(tmp_path / "ltm.json"))
+        detector = attach_deduplicator(memory)
+        first = memory.add_to_long_term("CPU usage is at 45 percent")
+        assert memory.add_to_long_term("cpu usage is at 45 percent") == first
+        memory.add_to_long_term("remember to buy milk")
+
+        assert len(memory.long_term_memory) == 2
+        assert detector.refcounts[first] == 2
+        report = detector.report()
+        assert report["suppressed"] == 1
+        assert report["reclaimed_bytes"] == len("cpu usage is at 45 percent")
+
+    def test_vector_memory_merges_duplicates(self):
+        memory = VectorMemory(async_embedding=False, cache=EmbeddingCache(), dedup=NearDuplicateDetector())
+        key = memory.add("the gpu temperature is 80 degrees")
+        assert memory.add("The GPU temperature is 80 degrees") == key
+
+        assert len(memory.long_term_memory) == 1
+        assert memory.long_term_memory[key]["count"] == 2
+        assert len(memory.short_term_memory) == 2
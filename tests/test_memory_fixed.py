@@ -241,3 +241,24 @@ class TestMemory:
             
             assert len(memory.short_term_memory) == 0
             assert len(memory.long_term_memory) == 0
+
+    def test_get_recent_context_prefers_query_matches(self):
+        """Test prompt context puts query matches before recent items"""
+        with patch('memory.Memory.load_long_term_memory', return_value={}):
+            memory = Memory()
+            memory.add_to_long_term("the reactor core is stable")
+            memory.add_to_short_term("hello there")
+
+            context = memory.get_recent_context(limit=2, query="reactor")
+            assert context.splitlines() == ["- the reactor core is stable", "- hello there"]
+
+    def test_get_recent_context_is_bounded(self):
+        """Test prompt context never exceeds the character budget"""
+        with patch('memory.Memory.load_long_term_memory', return_value={}):
+            memory = Memory()
+            for i in range(5):
+                memory.add_to_short_term("x" * 100 + str(i))
+
+            context = memory.get_recent_context(limit=5, max_chars=150)
+            assert len(context) <= 150
+            assert context.endswith("...")
@@ -0,0 +1,372 @@
+"""
+Tests for the task scheduler
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from utils import task_scheduler
+from utils.task_scheduler import TaskScheduler
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.json"))
+    scheduler.executed = []
+
+    async def handler(command):
+        scheduler.executed.append(command)
+        return "ok"
+
+    scheduler.register_command_handler(handler)
+    return scheduler
+
+
+def _interval(**kwargs):
+    return {"type": "interval", "interval": kwargs}
+
+
+class TestTimerQueue:
+    """Test heap ordering, lazy deletion, wakeups and sub-second precision"""
+
+    @pytest.mark.asyncio
+    async def test_sub_second_intervals(self, scheduler):
+        scheduler.schedule_task("fast", "ping", _interval(milliseconds=20))
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 1)
+
+        assert 3 <= scheduler.executed.count("ping") <= 8
+
+    @pytest.mark.asyncio
+    async def test_idle_scheduler_sleeps_until_next_task(self, scheduler):
+        scheduler.max_sleep = 7200
+        for i in range(300):
+            scheduler.schedule_task(f"task{i}", "later", _interval(hours=1, seconds=i))
+        calls = []
+        pop_due = scheduler._pop_due
+        scheduler._pop_due = lambda now: calls.append(now) or pop_due(now)
+
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(0.2)
+
+        assert len(calls) == 1
+        assert 3590 < scheduler._next_delay(calls[0]) <= 3600
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 1)
+        assert scheduler.executed == []
+
+    @pytest.mark.asyncio
+    async def test_new_task_wakes_sleeping_loop(self, scheduler):
+        scheduler.schedule_task("hourly", "later", _interval(hours=1))
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(0.05)
+
+        scheduler.schedule_task("soon", "now", _interval(milliseconds=10))
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 1)
+
+        assert "now" in scheduler.executed
+        assert "later" not in scheduler.executed
+
+    def test_lazy_deletion(self, scheduler):
+        scheduler.schedule_task("a", "a", _interval(seconds=1))
+        scheduler.schedule_task("b", "b", _interval(seconds=2))
+        scheduler.schedule_task("c", "c", _interval(seconds=3))
+        scheduler.disable_task("a")
+        scheduler.delete_task("b")
+        scheduler.update_task("c", {"schedule": _interval(milliseconds=1)})
+
+        assert len(scheduler._timers) == 4
+        assert scheduler._pop_due(scheduler.tasks["c"]["next_run"].timestamp() + 5) == ["c"]
+        assert scheduler._next_delay(0) is None
+
+    @pytest.mark.asyncio
+    async def test_failed_task_moves_to_next_slot(self, scheduler):
+        async def failing(command):
+            raise RuntimeError("boom")
+
+        scheduler.register_command_handler(failing)
+        scheduler.schedule_task("flaky", "x", _interval(minutes=5))
+        before = scheduler.tasks["flaky"]["next_run"]
+        await scheduler._execute_task("flaky")
+
+        task = scheduler.tasks["flaky"]
+        assert task["failures"] == 1
+        assert task["next_run"] >= before
+        assert scheduler._next_delay(before.timestamp() - 300) > 0
+
+
+class TestWorkerPool:
+    """Test concurrent runs, overlap protection, timeouts, cancellation and metrics"""
+
+    @staticmethod
+    def _pool(tmp_path, durations, **kwargs):
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.json"), **kwargs)
+        scheduler.executed = []
+
+        async def handler(command):
+            await asyncio.sleep(durations.get(command, 0))
+            scheduler.executed.append(command)
+            return command
+
+        scheduler.register_command_handler(handler)
+        return scheduler
+
+    async def _run(self, scheduler, seconds):
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(seconds)
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 2)
+
+    @pytest.mark.asyncio
+    async def test_slow_task_does_not_block_others(self, tmp_path):
+        scheduler = self._pool(tmp_path, {"slow": 0.5}, max_concurrency=2)
+        scheduler.schedule_task("maverick_analysis", "slow", _interval(milliseconds=1))
+        scheduler.schedule_task("health_check", "fast", _interval(milliseconds=20))
+        await self._run(scheduler, 0.2)
+
+        assert scheduler.executed.count("fast") >= 4
+        # The slow task never overlapped itself and finished during stop()
+        assert scheduler.executed.count("slow") == 1
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_overlap(self, tmp_path):
+        scheduler = self._pool(tmp_path, {"hang": 5}, default_timeout=1)
+        scheduler.schedule_task("hung", "hang", _interval(milliseconds=1), timeout=0.05)
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(0.02)
+
+        assert scheduler.get_scheduler_metrics()["running"] == ["hung"]
+        assert not scheduler.trigger_task("hung")
+        await asyncio.sleep(0.08)
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 2)
+
+        task = scheduler.tasks["hung"]
+        assert task["last_error"] == "Timed out after 0.05s"
+        metrics = scheduler.get_scheduler_metrics()
+        assert metrics["timeouts"] >= 1 and metrics["skipped_overlap"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancel_run(self, tmp_path):
+        scheduler = self._pool(tmp_path, {"long": 5})
+        scheduler.schedule_task("scan", "long", _interval(hours=1))
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(0.01)
+        assert scheduler.trigger_task("scan")
+        await asyncio.sleep(0.02)
+
+        assert scheduler.cancel_run("scan")
+        await asyncio.sleep(0.02)
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 2)
+
+        task = scheduler.tasks["scan"]
+        assert task["last_error"] == "Cancelled" and task["failures"] == 1
+        assert scheduler.get_scheduler_metrics()["cancelled"] == 1
+        assert scheduler._next_delay(0) is not None
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_is_measured_separately(self, tmp_path):
+        scheduler = self._pool(tmp_path, {"a": 0.05, "b": 0.05}, max_concurrency=1)
+        scheduler.schedule_task("a", "a", _interval(hours=1))
+        scheduler.schedule_task("b", "b", _interval(hours=1))
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(0.01)
+        scheduler.trigger_task("a")
+        scheduler.trigger_task("b")
+        await asyncio.sleep(0.15)
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 2)
+
+        metrics = scheduler.get_scheduler_metrics()
+        assert metrics["completed"] == 2
+        assert metrics["queue_wait"]["max_ms"] >= 40
+        assert metrics["execution"]["p50_ms"] >= 40
+        assert scheduler.tasks["b"]["execution_history"][-1]["queue_wait"] >= 0.04
+
+
+class TestPersistence:
+    """Test the SQLite task store, dirty tracking and legacy JSON import"""
+
+    @pytest.mark.asyncio
+    async def test_run_writes_only_its_own_row(self, scheduler, tmp_path):
+        for i in range(50):
+            scheduler.schedule_task(f"task{i}", f"cmd{i}", _interval(minutes=5))
+        store = scheduler.store
+        before = dict(store.stats)
+
+        await scheduler._execute_task("task7")
+
+        assert store.stats["transactions"] - before["transactions"] == 1
+        assert store.stats["task_rows_written"] - before["task_rows_written"] == 1
+        assert store.stats["history_rows_written"] - before["history_rows_written"] == 1
+
+    @pytest.mark.asyncio
+    async def test_state_and_bounded_history_survive_restart(self, scheduler, tmp_path):
+        scheduler.schedule_task("health_check", "diagnose", _interval(minutes=15), timeout=30)
+        scheduler.schedule_task("gone", "x", _interval(minutes=15))
+        for _ in range(12):
+            await scheduler._execute_task("health_check")
+        scheduler.delete_task("gone")
+        scheduler.store.close()
+
+        reopened = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        task = reopened.tasks["health_check"]
+        assert list(reopened.tasks) == ["health_check"]
+        assert task["runs"] == 12 and task["timeout"] == 30
+        assert task["next_run"] == scheduler.tasks["health_check"]["next_run"]
+        assert len(task["execution_history"]) == 10
+        rows = reopened.store._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        assert rows == 10
+        assert reopened._next_delay(0) is not None
+
+    def test_legacy_json_is_imported_once(self, tmp_path):
+        legacy = {
+            "system_health_check": {
+                "command": "run diagnostics",
+                "schedule": {"type": "interval", "interval": {"minutes": 15}},
+                "next_run": "2030-01-01T00:00:00",
+                "enabled": True, "runs": 3, "failures": 1, "last_error": None,
+                "error_history": [{"timestamp": "2025-01-01T00:00:00", "error": "boom", "command": "run diagnostics"}],
+            }
+        }
+        (tmp_path / "scheduled_tasks.json").write_text(json.dumps(legacy))
+
+        scheduler = TaskScheduler(save_file=str(tmp_path / "scheduled_tasks.db"))
+        task = scheduler.tasks["system_health_check"]
+        assert task["runs"] == 3 and task["error_history"][0]["error"] == "boom"
+        scheduler.delete_task("system_health_check")
+        scheduler.store.close()
+
+        assert TaskScheduler(save_file=str(tmp_path / "scheduled_tasks.db")).tasks == {}
+
+
+class TestExecutionModes:
+    """Test thread and process execution, limits and crash isolation"""
+
+    @staticmethod
+    def _process_task(scheduler, task_id, target, *args, **options):
+        assert scheduler.schedule_task(task_id, task_id, _interval(hours=1), mode="process",
+                                       target=target, args=list(args), **options)
+
+    def test_mode_validation(self, scheduler):
+        assert not scheduler.schedule_task("a", "x", _interval(hours=1), mode="fork")
+        assert not scheduler.schedule_task("b", "x", _interval(hours=1), mode="process")
+        assert not scheduler.schedule_task("c", "x", _interval(hours=1), mode="process", target="math:no_such")
+        assert not scheduler.schedule_task("d", "x", _interval(hours=1), mode="process", target="math:factorial",
+                                           args=[object()])
+        assert scheduler.schedule_task("e", "x", _interval(hours=1))
+        assert not scheduler.update_task("e", {"mode": "process"})
+        assert scheduler.update_task("e", {"mode": "thread"})
+        assert list(scheduler.tasks) == ["e"]
+
+    def test_memory_limit_needs_rlimits(self, scheduler, monkeypatch):
+        monkeypatch.setattr(task_scheduler, "resource", None)
+
+        assert not scheduler.schedule_task("a", "x", _interval(hours=1), mode="process", target="math:factorial",
+                                           args=[5], memory_limit_mb=256)
+        assert scheduler.schedule_task("b", "x", _interval(hours=1), mode="process", target="math:factorial",
+                                       args=[5])
+        assert not scheduler.update_task("b", {"memory_limit_mb": 256})
+
+    @pytest.mark.asyncio
+    async def test_thread_mode_keeps_loop_responsive(self, tmp_path):
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        scheduler.schedule_task("blocking", "sleep", _interval(hours=1), mode="thread", target="time:sleep", args=[0.2])
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick = asyncio.ensure_future(ticker())
+        await scheduler._execute_task("blocking")
+        tick.cancel()
+        scheduler._close_executors()
+
+        assert scheduler.tasks["blocking"]["runs"] == 1
+        assert ticks >= 10
+
+    @pytest.mark.asyncio
+    async def test_timed_out_thread_blocks_overlap(self, tmp_path):
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        scheduler.schedule_task("sleepy", "sleep", _interval(milliseconds=1), mode="thread", target="time:sleep",
+                                args=[0.3], timeout=0.05)
+        runner = asyncio.ensure_future(scheduler.start())
+        await asyncio.sleep(0.2)
+
+        # The run timed out but its thread still sleeps, so no second run started
+        assert len(scheduler.tasks["sleepy"]["execution_history"]) == 1
+        assert scheduler.get_scheduler_metrics()["running"] == ["sleepy"]
+        assert not scheduler.trigger_task("sleepy")
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        await asyncio.wait_for(runner, 2)
+
+        # Once the thread returned the task was re-armed and ran again
+        assert len(scheduler.tasks["sleepy"]["execution_history"]) == 2
+        assert scheduler.metrics["timeouts"] == 2 and scheduler.metrics["skipped_overlap"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_process_mode_result_and_limits(self, tmp_path):
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        self._process_task(scheduler, "factorial", "math:factorial", 20)
+        self._process_task(scheduler, "huge", "builtins:bytes", 2_000_000)
+        self._process_task(scheduler, "hog", "builtins:bytearray", 1 << 30, memory_limit_mb=256)
+        try:
+            for task_id in ("factorial", "huge", "hog"):
+                await scheduler._execute_task(task_id)
+        finally:
+            scheduler._close_executors()
+
+        assert scheduler.tasks["factorial"]["last_result"] == "2432902008176640000"
+        assert "exceeds the 1048576 byte limit" in scheduler.tasks["huge"]["last_error"]
+        assert scheduler.tasks["hog"]["failures"] == 1
+        assert scheduler.metrics["process_crashes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_process_crash_and_timeout_are_isolated(self, tmp_path):
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        self._process_task(scheduler, "crash", "os:_exit", 3)
+        self._process_task(scheduler, "hang", "time:sleep", 30, timeout=1)
+        self._process_task(scheduler, "after", "math:factorial", 5)
+        try:
+            await scheduler._execute_task("crash")
+            started = time.perf_counter()
+            await scheduler._execute_task("hang")
+            elapsed = time.perf_counter() - started
+            await scheduler._execute_task("after")
+        finally:
+            scheduler._close_executors()
+
+        assert scheduler.tasks["crash"]["last_error"] == "Worker process crashed"
+        assert scheduler.tasks["hang"]["last_error"] == "Timed out after 1s"
+        assert elapsed < 10
+        # The next run got a working pool after both the crash and the kill
+        assert scheduler.tasks["after"]["last_result"] == "120"
+        metrics = scheduler.get_scheduler_metrics()
+        # The timed-out run had its own worker; only the crash restarted the shared pool
+        assert metrics["process_crashes"] == 1 and metrics["process_pool_restarts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_only_its_own_worker(self, tmp_path):
+        scheduler = TaskScheduler(save_file=str(tmp_path / "tasks.db"))
+        self._process_task(scheduler, "slow", "time:sleep", 1.5)
+        self._process_task(scheduler, "hang", "time:sleep", 30, timeout=1)
+        try:
+            await asyncio.gather(scheduler._execute_task("slow"), scheduler._execute_task("hang"))
+        finally:
+            scheduler._close_executors()
+
+        assert scheduler.tasks["hang"]["last_error"] == "Timed out after 1s"
+        # The untimed run in the shared pool was not killed along with it
+        assert scheduler.tasks["slow"]["last_error"] is None and scheduler.tasks["slow"]["runs"] == 1
+        assert scheduler.metrics["process_pool_restarts"] == 0
@@ -0,0 +1,119 @@
+"""
+Tests for in-process span tracing
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+import utils.tracing as tracing
+from utils.tracing import Tracer, current_span, init_tracer, span, traced
+
+
+@pytest.fixture
+def tracer():
+    previous = tracing._tracer
+    tracer = init_tracer(max_traces=3)
+    yield tracer
+    tracing._tracer = previous
+
+
+class TestTracer:
+    """Test span nesting, propagation, buffering and export"""
+
+    def test_nested_spans_share_trace(self, tracer):
+        with span("voice.command") as root:
+            with span("voice.stt", engine="google"):
+                time.sleep(0.01)
+            with span("brain.plan_and_act"):
+                assert current_span().parent_id == root.span_id
+        assert current_span() is None
+
+        spans = {s["name"]: s for s in tracer.get_trace(root.trace_id)}
+        assert set(spans) == {"voice.command", "voice.stt", "brain.plan_and_act"}
+        assert spans["voice.stt"]["parent_id"] == root.span_id
+        assert spans["voice.stt"]["attributes"] == {"engine": "google"}
+        assert spans["voice.command"]["duration_ms"] >= spans["voice.stt"]["duration_ms"] >= 10
+
+    def test_context_propagates_across_async_tasks(self, tracer):
+        @traced("llm.chat")
+        async def llm_call(model):
+            await asyncio.sleep(0.001)
+            current_span().set_attribute("model", model)
+
+        @traced("brain.plan_and_act")
+        async def plan():
+            await asyncio.gather(llm_call("a"), llm_call("b"))
+            return current_span().span_id
+
+        parent_id = asyncio.run(plan())
+        [summary] = tracer.recent_traces()
+        children = [s for s in tracer.get_trace(summary["trace_id"]) if s["name"] == "llm.chat"]
+        assert summary["root"] == "brain.plan_and_act"
+        assert sorted(s["attributes"]["model"] for s in children) == ["a", "b"]
+        assert all(s["parent_id"] == parent_id for s in children)
+
+    def test_errors_are_recorded(self, tracer):
+        with pytest.raises(ValueError):
+            with span("tool.file"):
+                raise ValueError("bad path")
+
+        [summary] = tracer.recent_traces()
+        assert summary["errors"] == 1
+        assert tracer.get_trace(summary["trace_id"])[0]["error"] == "ValueError: bad path"
+
+    def test_ring_buffer_keeps_recent_traces(self, tracer):
+        for i in range(5):
+            with span(f"request{i}"):
+                pass
+
+        assert [t["root"] for t in tracer.recent_traces()] == ["request4", "request3", "request2"]
+        assert tracer.stats["traces_evicted"] == 2
+
+    def test_latency_breakdown_self_time(self, tracer):
+        for _ in range(2):
+            with span("voice.command"):
+                with span("llm.chat"):
+                    time.sleep(0.02)
+        with span("other"):
+            pass
+
+        breakdown = tracer.latency_breakdown(root="voice.command")
+        assert set(breakdown) == {"voice.command", "llm.chat"}
+        assert breakdown["llm.chat"]["count"] == 2
+        assert breakdown["llm.chat"]["mean_self_ms"] >= 20
+        assert breakdown["voice.command"]["mean_self_ms"] < breakdown["llm.chat"]["mean_self_ms"]
+        assert list(breakdown)[0] == "llm.chat"
+
+    def test_chrome_trace_export(self, tracer, tmp_path):
+        with span("voice.command") as root:
+            with span("voice.tts", engine="pyttsx3"):
+                pass
+
+        path = tracer.write_chrome_trace(tmp_path / "trace.json")
+        events = json.loads(path.read_text())["traceEvents"]
+        complete = {e["name"]: e for e in events if e["ph"] == "X"}
+        assert set(complete) == {"voice.command", "voice.tts"}
+        assert complete["voice.tts"]["cat"] == "voice"
+        assert complete["voice.tts"]["args"]["parent_id"] == root.span_id
+        assert complete["voice.command"]["ts"] <= complete["voice.tts"]["ts"]
+        assert complete["voice.tts"]["tid"] == complete["voice.command"]["tid"]
+
+    def test_tools_are_traced(self, tracer):
+        from tools.base import Tool
+
+        class EchoTool(Tool):
+            name = "echo"
+
+            def execute(self, command: str = "") -> str:
+                return command
+
+        assert EchoTool().execute(command="hi") == "hi"
+        assert tracer.recent_traces()[0]["root"] == "tool.echo"
+
+    def test_independent_tracers(self):
+        tracer = Tracer()
+        with tracer.span("solo"):
+            pass
+        assert tracer.recent_traces()[0]["root"] == "solo"
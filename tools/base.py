@@ -1,8 +1,17 @@
+from utils.tracing import traced
+
+
 class Tool:
     name = "BaseTool"
     description = "Base class for all tools."
     parameters = {}
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every tool run shows up as a "tool.<name>" span in traces
+        if "execute" in cls.__dict__:
+            cls.execute = traced(f"tool.{cls.__dict__.get('name', cls.__name__)}")(cls.__dict__["execute"])
+
     def __init__(self):
         pass
 
@@ -0,0 +1,287 @@
+"""
+dedup.py
+========
+
+Near-duplicate suppression for memory writes.  Voice transcripts and
+repeated status messages tend to arrive many times with tiny variations;
+`NearDuplicateDetector` spots them on the write path so the memory can bump
+a reference count on the existing entry instead of storing another copy.
+
+Two sketches are used depending on the length of the text:
+
+* short text (fewer than ``long_text_words`` words) gets a 64-bit SimHash
+  over words, word bigrams and character trigrams.  Candidates are found
+  with the pigeonhole trick: the fingerprint is split into
+  ``max_distance + 1`` blocks, and any fingerprint within that Hamming
+  distance shares at least one block exactly;
+* longer text gets a MinHash signature over word shingles, bucketed with
+  LSH banding.  Candidates are confirmed by the estimated Jaccard
+  similarity.
+
+Exact repeats (after whitespace and case normalisation) are caught by a
+digest lookup before either sketch is computed.  `report` shows how many
+writes were suppressed and how many bytes that saved.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+_WORD_RE = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _text_of(item: Any) -> str:
+    if isinstance(item, dict) and "item" in item:
+        item = item["item"]
+    return item if isinstance(item, str) else json.dumps(item, sort_keys=True, default=str)
+
+
+def _normalise(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """SimHash fingerprint over words, word bigrams and character trigrams."""
+    words = _WORD_RE.findall(text.lower())
+    features: Dict[str, int] = {}
+    for word in words:
+        features[word] = features.get(word, 0) + 2
+    for first, second in zip(words, words[1:], strict=False):
+        key = f"{first} {second}"
+        features[key] = features.get(key, 0) + 1
+    joined = " ".join(words)
+    for i in range(len(joined) - 2):
+        key = "#" + joined[i:i + 3]
+        features[key] = features.get(key, 0) + 1
+    totals = [0] * bits
+    for feature, weight in features.items():
+        h = _hash64(feature)
+        for bit in range(bits):
+            totals[bit] += weight if (h >> bit) & 1 else -weight
+    return sum(1 << bit for bit, total in enumerate(totals) if total > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class MinHasher:
+    """MinHash signatures over word shingles using ``(a * x + b) mod p`` permutations."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1) -> None:
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        params = hashlib.blake2b(f"minhash-{seed}".encode(), digest_size=64).digest()
+        self._params: List[Tuple[int, int]] = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(params + i.to_bytes(4, "little"), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "little") % (_MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], "little") % _MERSENNE_PRIME
+            self._params.append((a, b))
+
+    def shingles(self, text: str) -> Set[str]:
+        words = _WORD_RE.findall(text.lower())
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = [_hash64(s) & _MAX_HASH for s in self.shingles(text)]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in self._params
+        )
+
+    @staticmethod
+    def jaccard(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+        if not sig_a or len(sig_a) != len(sig_b):
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b, strict=True) if x == y) / len(sig_a)
+
+
+class NearDuplicateDetector:
+    """SimHash/MinHash-LSH index of stored texts used to suppress near-duplicate writes."""
+
+    def __init__(
+        self,
+        simhash_max_distance: int = 6,
+        minhash_threshold: float = 0.8,
+        long_text_words: int = 24,
+        num_perm: int = 64,
+        bands: int = 16,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.simhash_max_distance = simhash_max_distance
+        self.minhash_threshold = minhash_threshold
+        self.long_text_words = long_text_words
+        self.bands = bands
+        self.minhasher = MinHasher(num_perm=num_perm)
+        self._lock = threading.Lock()
+        self._exact: Dict[str, Hashable] = {}
+        self._digests: Dict[Hashable, str] = {}
+        self._simhashes: Dict[Hashable, int] = {}
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[str, int, Any], Set[Hashable]] = {}
+        self.refcounts: Dict[Hashable, int] = {}
+        self.stats: Dict[str, int] = {"checked": 0, "exact": 0, "near": 0, "reclaimed_bytes": 0}
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+    def _blocks(self, fingerprint: int) -> List[Tuple[str, int, int]]:
+        n_blocks = self.simhash_max_distance + 1
+        width = -(-64 // n_blocks)
+        mask = (1 << width) - 1
+        return [("s", i, (fingerprint >> (i * width)) & mask) for i in range(n_blocks)]
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple[str, int, Tuple[int, ...]]]:
+        rows = len(signature) // self.bands
+        return [("m", i, signature[i * rows:(i + 1) * rows]) for i in range(self.bands)]
+
+    def _sketch(self, text: str) -> Tuple[Optional[int], Optional[Tuple[int, ...]]]:
+        if len(text.split()) < self.long_text_words:
+            return simhash(text), None
+        return None, self.minhasher.signature(text)
+
+    def find_duplicate(self, item: Any, exists: Optional[Callable[[Hashable], bool]] = None) -> Optional[Hashable]:
+        """Return the key of a stored near-duplicate of ``item``, or ``None``.
+
+        ``exists`` lets the owner confirm that a candidate is still stored;
+        keys it rejects are dropped from the index.
+        """
+        text = _normalise(_text_of(item))
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        fingerprint, signature = self._sketch(text)
+        with self._lock:
+            self.stats["checked"] += 1
+            candidates: List[Tuple[float, Hashable]] = []
+            key = self._exact.get(digest)
+            if key is not None:
+                candidates.append((2.0, key))
+            elif fingerprint is not None:
+                seen: Set[Hashable] = set()
+                for block in self._blocks(fingerprint):
+                    for key in self._buckets.get(block, ()):
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        distance = hamming_distance(fingerprint, self._simhashes[key])
+                        if distance <= self.simhash_max_distance:
+                            candidates.append((1.0 - distance / 64, key))
+            else:
+                seen = set()
+                for band in self._bands(signature):
+                    for key in self._buckets.get(band, ()):
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        similarity = MinHasher.jaccard(signature, self._signatures[key])
+                        if similarity >= self.minhash_threshold:
+                            candidates.append((similarity, key))
+        for _, key in sorted(candidates, key=lambda c: c[0], reverse=True):
+            if exists is None or exists(key):
+                return key
+            self.remove(key)
+        return None
+
+    def add(self, key: Hashable, item: Any) -> None:
+        """Index a newly stored item under ``key``."""
+        text = _normalise(_text_of(item))
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        fingerprint, signature = self._sketch(text)
+        with self._lock:
+            self._remove_locked(key)
+            self._exact[digest] = key
+            self._digests[key] = digest
+            self.refcounts[key] = 1
+            if fingerprint is not None:
+                self._simhashes[key] = fingerprint
+                buckets = self._blocks(fingerprint)
+            else:
+                self._signatures[key] = signature
+                buckets = self._bands(signature)
+            for bucket in buckets:
+                self._buckets.setdefault(bucket, set()).add(key)
+
+    def record_duplicate(self, key: Hashable, item: Any) -> int:
+        """Count a suppressed write of ``item`` against ``key`` and return the new refcount."""
+        text = _text_of(item)
+        with self._lock:
+            exact = self._exact.get(hashlib.blake2b(_normalise(text).encode("utf-8"), digest_size=16).hexdigest())
+            self.stats["exact" if exact == key else "near"] += 1
+            self.stats["reclaimed_bytes"] += len(text.encode("utf-8"))
+            self.refcounts[key] = self.refcounts.get(key, 1) + 1
+            return self.refcounts[key]
+
+    def remove(self, key: Hashable) -> None:
+        """Forget ``key`` (e.g. when its memory is deleted)."""
+        with self._lock:
+            self._remove_locked(key)
+
+    def _remove_locked(self, key: Hashable) -> None:
+        digest = self._digests.pop(key, None)
+        if digest is None:
+            return
+        if self._exact.get(digest) == key:
+            del self._exact[digest]
+        self.refcounts.pop(key, None)
+        fingerprint = self._simhashes.pop(key, None)
+        signature = self._signatures.pop(key, None)
+        buckets = self._blocks(fingerprint) if fingerprint is not None else self._bands(signature or ())
+        for bucket in buckets:
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._exact.clear()
+            self._digests.clear()
+            self._simhashes.clear()
+            self._signatures.clear()
+            self._buckets.clear()
+            self.refcounts.clear()
+
+    def report(self) -> Dict[str, Any]:
+        """Summary of suppressed writes and the space they would have used."""
+        with self._lock:
+            suppressed = self.stats["exact"] + self.stats["near"]
+            top = sorted(self.refcounts.items(), key=lambda x: x[1], reverse=True)[:5]
+            return {
+                "indexed": len(self._digests),
+                "checked": self.stats["checked"],
+                "suppressed": suppressed,
+                "exact_duplicates": self.stats["exact"],
+                "near_duplicates": self.stats["near"],
+                "reclaimed_bytes": self.stats["reclaimed_bytes"],
+                "suppression_rate": round(suppressed / self.stats["checked"], 4) if self.stats["checked"] else 0.0,
+                "most_repeated": [(key, count) for key, count in top if count > 1],
+            }
+
+
+def attach_deduplicator(memory: Any, **kwargs: Any) -> NearDuplicateDetector:
+    """Enable near-duplicate suppression on a core `Memory` instance.
+
+    Existing long-term items are indexed; ``kwargs`` are passed to
+    `NearDuplicateDetector` (e.g. ``simhash_max_distance``).
+    """
+    detector = NearDuplicateDetector(**kwargs)
+    for key, item in list(memory.long_term_memory.items()):
+        detector.add(key, item)
+    memory.dedup = detector
+    logging.info(f"[NearDuplicateDetector] Indexed {len(detector)} existing memories")
+    return detector
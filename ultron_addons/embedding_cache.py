@@ -0,0 +1,171 @@
+"""
+embedding_cache.py
+==================
+
+Content-addressed cache for text embeddings.  Tool descriptions, system
+prompts and repeated user phrases are embedded over and over again, so every
+component that embeds text should go through an `EmbeddingCache` instead of
+calling the model directly.
+
+Entries are keyed by ``(model_name, sha256(text))``.  The first tier is a
+bounded in-memory LRU; an optional second tier stores vectors in a SQLite
+file so they survive restarts.  A process-wide instance is available via
+`get_embedding_cache`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+CacheKey = Tuple[str, str]
+
+
+def text_digest(text: str) -> str:
+    """Return the sha256 hex digest used as the cache key for ``text``."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + optional SQLite) embedding cache with metrics."""
+
+    def __init__(self, max_entries: int = 10000, disk_path: Optional[Union[str, Path]] = None) -> None:
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[CacheKey, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.stats: Dict[str, int] = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if disk_path is not None:
+            self._open_disk(Path(disk_path))
+
+    def _open_disk(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, digest TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, digest))"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error(f"[EmbeddingCache] Disk tier disabled, cannot open {path}: {e}")
+            self._db = None
+
+    def _remember(self, key: CacheKey, vector: List[float]) -> None:
+        """Insert into the LRU tier; caller must hold the lock."""
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        """Return the cached vector for ``text`` or ``None`` on a miss."""
+        key = (model_name, text_digest(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND digest = ?", key
+                ).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                    return vector
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, model_name: str, text: str, vector: Sequence[float]) -> None:
+        """Store ``vector`` as the embedding of ``text`` under ``model_name``."""
+        key = (model_name, text_digest(text))
+        values = [float(v) for v in vector]
+        with self._lock:
+            self._remember(key, values)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)",
+                        (key[0], key[1], array("f", values).tobytes()),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.error(f"[EmbeddingCache] Failed to persist embedding: {e}")
+
+    def get_or_compute(
+        self,
+        model_name: str,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], Sequence[Sequence[float]]],
+    ) -> List[List[float]]:
+        """Return embeddings for ``texts``, calling ``compute`` once for all misses."""
+        results: List[Optional[List[float]]] = [self.get(model_name, text) for text in texts]
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing:
+            # Duplicates inside one request are only computed once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            computed = dict(zip(unique, compute(unique), strict=True))
+            for text, vector in computed.items():
+                self.put(model_name, text, vector)
+            for i in missing:
+                results[i] = [float(v) for v in computed[texts[i]]]
+        return results  # type: ignore[return-value]
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from either tier."""
+        hits = self.stats["hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size of the memory tier."""
+        with self._lock:
+            size = len(self._entries)
+        return {**self.stats, "entries": size, "hit_rate": round(self.hit_rate(), 4)}
+
+    def clear(self) -> None:
+        """Drop every cached entry, including the disk tier."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the disk tier, if any."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Global cache instance shared by all embedding components
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache instance."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+def init_embedding_cache(max_entries: int = 10000, disk_path: Optional[Union[str, Path]] = None) -> EmbeddingCache:
+    """Replace the process-wide embedding cache, e.g. to enable the disk tier."""
+    global _embedding_cache
+    if _embedding_cache is not None:
+        _embedding_cache.close()
+    _embedding_cache = EmbeddingCache(max_entries=max_entries, disk_path=disk_path)
+    return _embedding_cache
@@ -0,0 +1,131 @@
+"""
+embedding_worker.py
+===================
+
+Background embedding pipeline for memory backends.  Encoding a single text
+with a transformer model carries a large fixed overhead, so instead of
+embedding every stored item on the caller's thread, an `EmbeddingWorker`
+queues items and encodes them in micro-batches on a daemon thread.  A batch
+is closed either when it reaches ``max_batch_size`` items or when the oldest
+queued item has waited ``max_wait`` seconds, whichever comes first.  Results
+are delivered through a per-item callback.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+EncodeBatchFn = Callable[[List[str]], Sequence[Any]]
+ResultCallback = Callable[[Any, Any], None]
+
+
+class EmbeddingWorker:
+    """Encode queued texts in size/time bounded micro-batches."""
+
+    def __init__(
+        self,
+        encode_batch: EncodeBatchFn,
+        max_batch_size: int = 32,
+        max_wait: float = 0.05,
+        max_queue: int = 10000,
+        name: str = "embedding-worker",
+    ) -> None:
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self._queue: "queue.Queue[Tuple[Any, str, ResultCallback]]" = queue.Queue(maxsize=max_queue)
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"items": 0, "batches": 0, "errors": 0}
+
+    def start(self) -> None:
+        """Start the worker thread if it is not already running."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Any, text: str, callback: ResultCallback) -> None:
+        """Queue ``text`` for embedding; ``callback(key, vector)`` receives the result."""
+        self.start()
+        with self._idle:
+            self._pending += 1
+        self._queue.put((key, text, callback))
+
+    @property
+    def pending(self) -> int:
+        """Number of submitted items that have not been delivered yet."""
+        with self._idle:
+            return self._pending
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued item has been embedded.
+
+        Returns ``False`` if the timeout expired before the queue drained.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Awaitable variant of `flush` that does not block the event loop."""
+        return await asyncio.to_thread(self.flush, timeout)
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Drain outstanding work and stop the worker thread."""
+        if not self._thread:
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _next_batch(self) -> List[Tuple[Any, str, ResultCallback]]:
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            texts = [text for _, text, _ in batch]
+            try:
+                vectors = list(self.encode_batch(texts))
+            except Exception as e:
+                logging.error(f"[EmbeddingWorker] Batch of {len(batch)} failed: {e}")
+                self.stats["errors"] += 1
+                vectors = [None] * len(batch)
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            for (key, _, callback), vector in zip(batch, vectors, strict=True):
+                try:
+                    callback(key, vector)
+                except Exception as e:
+                    logging.error(f"[EmbeddingWorker] Result callback failed for {key}: {e}")
+            with self._idle:
+                self._pending -= len(batch)
+                if self._pending == 0:
+                    self._idle.notify_all()
@@ -0,0 +1,181 @@
+"""
+hashing_embedder.py
+===================
+
+Offline text embedder for machines without ``sentence_transformers``/torch.
+`HashingEmbedder` maps word unigrams and character trigrams into a fixed
+number of buckets with a signed feature hash, weights them with ``log1p``
+TF and (optionally fitted) IDF, and L2-normalises the result, so cosine
+similarity between two vectors reflects shared vocabulary and shared
+sub-word fragments.
+
+Texts are first turned into sparse ``{bucket: weight}`` maps and only then
+scattered into a dense matrix for the whole batch.  NumPy is used for the
+dense batch when it is installed; otherwise plain lists are returned.  The
+``encode`` method mirrors ``SentenceTransformer.encode`` so the embedder can
+be used anywhere a model is expected.
+
+`evaluate_embedder` scores any such embedder on the small retrieval set
+bundled in ``data/embedding_eval.json``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+EVAL_SET_PATH = Path(__file__).parent / "data" / "embedding_eval.json"
+
+_WORD_RE = re.compile(r"\w+")
+
+SparseVector = Dict[int, float]
+
+
+class HashingEmbedder:
+    """Hashed word + char n-gram TF-IDF embedder with a fixed dimensionality."""
+
+    def __init__(self, dim: int = 512, char_ngram: int = 3, word_weight: float = 1.0, char_weight: float = 0.5) -> None:
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.word_weight = word_weight
+        self.char_weight = char_weight
+        self.idf: Optional[List[float]] = None
+
+    @property
+    def model_id(self) -> str:
+        """Stable identifier of this configuration, used as an embedding cache key."""
+        ident = f"hashing-{self.dim}-w{self.word_weight}-c{self.char_ngram}x{self.char_weight}"
+        if self.idf is not None:
+            digest = hashlib.sha256(json.dumps(self.idf).encode("utf-8")).hexdigest()[:12]
+            ident += f"-idf{digest}"
+        return ident
+
+    def _bucket(self, feature: str) -> int:
+        """Signed bucket index: the top bit of the hash selects the sign."""
+        h = zlib.crc32(feature.encode("utf-8"))
+        index = h % self.dim
+        return index if h & 0x80000000 == 0 else -index - 1
+
+    def _features(self, text: str) -> Dict[str, float]:
+        counts: Dict[str, float] = {}
+        words = _WORD_RE.findall(text.lower())
+        for word in words:
+            counts["w:" + word] = counts.get("w:" + word, 0.0) + self.word_weight
+            padded = f" {word} "
+            for i in range(max(len(padded) - self.char_ngram + 1, 1)):
+                gram = "c:" + padded[i:i + self.char_ngram]
+                counts[gram] = counts.get(gram, 0.0) + self.char_weight
+        return counts
+
+    def transform_sparse(self, text: str) -> SparseVector:
+        """Return the L2-normalised sparse ``{bucket: weight}`` vector for ``text``."""
+        vec: SparseVector = {}
+        for feature, count in self._features(text).items():
+            bucket = self._bucket(feature)
+            sign = 1.0
+            if bucket < 0:
+                bucket, sign = -bucket - 1, -1.0
+            vec[bucket] = vec.get(bucket, 0.0) + sign * math.log1p(count)
+        if self.idf is not None:
+            vec = {b: w * self.idf[b] for b, w in vec.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        if norm > 0:
+            vec = {b: w / norm for b, w in vec.items() if w != 0.0}
+        return vec
+
+    def fit(self, corpus: Iterable[str]) -> "HashingEmbedder":
+        """Fit per-bucket IDF weights on ``corpus``.
+
+        Fitting changes `model_id`, so embeddings computed before and after
+        fitting are never mixed in a cache.
+        """
+        df = [0] * self.dim
+        n_docs = 0
+        for text in corpus:
+            n_docs += 1
+            for feature in self._features(text):
+                bucket = self._bucket(feature)
+                df[bucket if bucket >= 0 else -bucket - 1] += 1
+        self.idf = [math.log((1 + n_docs) / (1 + d)) + 1.0 for d in df] if n_docs else None
+        return self
+
+    def encode(self, texts: Union[str, Sequence[str]], **_: Any) -> Any:
+        """Embed ``texts`` into a dense ``(len(texts), dim)`` batch.
+
+        Returns a float32 NumPy array when NumPy is available, otherwise a
+        list of lists.  A single string yields a single vector.
+        """
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        sparse = [self.transform_sparse(text) for text in batch]
+        if np is not None:
+            dense = np.zeros((len(batch), self.dim), dtype=np.float32)
+            for row, vec in enumerate(sparse):
+                if vec:
+                    dense[row, list(vec.keys())] = list(vec.values())
+        else:
+            dense = []
+            for vec in sparse:
+                values = [0.0] * self.dim
+                for bucket, weight in vec.items():
+                    values[bucket] = weight
+                dense.append(values)
+        return dense[0] if single else dense
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    """Cosine similarity of two equal-length vectors."""
+    if np is not None:
+        va = np.asarray(a, dtype=np.float32)
+        vb = np.asarray(b, dtype=np.float32)
+        return float(va.dot(vb) / (np.linalg.norm(va) * np.linalg.norm(vb) + 1e-8))
+    dot = sum(x * y for x, y in zip(a, b, strict=True))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / (norm + 1e-8)
+
+
+def load_eval_set(path: Optional[Union[str, Path]] = None) -> Dict[str, Any]:
+    """Load a retrieval eval set of ``documents`` and ``queries``."""
+    with open(path or EVAL_SET_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def evaluate_embedder(embedder: Any, eval_set: Optional[Dict[str, Any]] = None, k: int = 3) -> Dict[str, float]:
+    """Score ``embedder`` on a retrieval eval set.
+
+    Every query lists the id of its relevant document; documents are ranked
+    by cosine similarity.  Returns recall@1, recall@k and mean reciprocal rank.
+    """
+    data = eval_set or load_eval_set()
+    doc_ids = list(data["documents"].keys())
+    doc_vecs = [_as_list(v) for v in embedder.encode([data["documents"][d] for d in doc_ids])]
+    hits_1 = hits_k = 0
+    rr_total = 0.0
+    queries = data["queries"]
+    query_vecs = [_as_list(v) for v in embedder.encode([q["query"] for q in queries])]
+    for q, q_vec in zip(queries, query_vecs, strict=True):
+        scores = sorted(
+            ((cosine_similarity(q_vec, d_vec), doc_id) for doc_id, d_vec in zip(doc_ids, doc_vecs, strict=True)),
+            reverse=True,
+        )
+        ranking = [doc_id for _, doc_id in scores]
+        rank = ranking.index(q["relevant"]) + 1
+        hits_1 += rank == 1
+        hits_k += rank <= k
+        rr_total += 1.0 / rank
+    n = max(len(queries), 1)
+    return {"recall@1": hits_1 / n, f"recall@{k}": hits_k / n, "mrr": rr_total / n}
+
+
+def _as_list(vec: Any) -> List[float]:
+    return vec.tolist() if hasattr(vec, "tolist") else list(vec)
@@ -6,76 +6,373 @@ Extended memory implementations for the Ultron Agent.  These classes build
 upon the basic Memory class provided in the core repository (see
 `memory.py`) and add features such as vector embeddings and persistent
 storage via external databases.
+
+By default `VectorMemory` embeds new items on a background
+`EmbeddingWorker`, so `add` returns immediately.  Items that are still
+waiting for their embedding are matched by keyword overlap in `search`;
+call `flush` (or await `wait_for_embeddings`) to wait for the queue to
+drain.
+
+Without ``sentence_transformers`` the memory embeds text with the
+NumPy-only `HashingEmbedder`, so vector search stays meaningful on
+machines without torch.
+
+`get_recent_context` assembles a bounded prompt context block from a
+`HybridRetriever` that fuses BM25 and vector search within a latency
+budget.
+
+Setting ``max_hot_items`` or ``max_hot_bytes`` bounds the RAM used by
+``long_term_memory``: items beyond the ceiling are evicted into an on-disk
+cold tier (see `TieredStore`) that is searched only when hot results are
+poor.
+
+``embedding_storage`` selects how embeddings are kept: ``'list'`` stores
+plain float lists on each item, while ``'float16'`` or ``'int8'`` moves them
+into a `QuantizedVectorIndex` that searches the compact codes and rescores
+the best candidates at full precision.  The full-precision copies are kept
+on disk (``full_precision_path``, or an anonymous temporary file) unless
+``full_precision_in_ram`` is set.  `memory_report` and `evaluate_recall`
+show the memory saved and the recall impact.
+
+Passing a `NearDuplicateDetector` as ``dedup`` suppresses near-duplicate
+writes: the existing record's ``count`` is incremented instead of storing
+and embedding the item again.
 """
 
 from __future__ import annotations
 
+import itertools
 import logging
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional
 
 try:
-    # Optional import for embedding; if unavailable, we will use simple text
-    # hashing instead.
+    # Optional import for embedding; if unavailable, we will use the offline
+    # hashing embedder instead.
     from sentence_transformers import SentenceTransformer
-    import numpy as np
 except ImportError: # pragma: no cover
     SentenceTransformer = None  # type: ignore
-    np = None  # type: ignore
 
 from collections import deque
 
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .dedup import NearDuplicateDetector
+from .embedding_worker import EmbeddingWorker
+from .hashing_embedder import HashingEmbedder, cosine_similarity
+from .quantization import PYTHON_LIST_BYTES_PER_DIM, STORAGE_MODES, QuantizedVectorIndex
+from .retrieval import BM25Index, HybridRetriever, format_context_block
+from .tiered_memory import TieredStore
+
+
+def _to_list(vec: Any) -> List[float]:
+    """Convert a NumPy row or plain sequence to a list of floats."""
+    return vec.tolist() if hasattr(vec, 'tolist') else list(vec)
+
 
 class VectorMemory:
     """An enhanced memory that stores both raw items and vector embeddings."""
 
-    def __init__(self, short_term_limit: int = 10, model_name: str = 'all-MiniLM-L6-v2') -> None:
+    def __init__(
+        self,
+        short_term_limit: int = 10,
+        model_name: str = 'all-MiniLM-L6-v2',
+        async_embedding: bool = True,
+        batch_size: int = 32,
+        batch_wait: float = 0.05,
+        cache: Optional[EmbeddingCache] = None,
+        retrieval_budget_ms: float = 20.0,
+        max_hot_items: Optional[int] = None,
+        max_hot_bytes: Optional[int] = None,
+        eviction_policy: str = 'lru',
+        cold_path: str = 'memory_cold.db',
+        embedding_storage: str = 'list',
+        rescore_factor: int = 4,
+        full_precision_path: Optional[str] = None,
+        full_precision_in_ram: bool = False,
+        dedup: Optional[NearDuplicateDetector] = None,
+    ) -> None:
+        if embedding_storage != 'list' and embedding_storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown embedding_storage {embedding_storage!r}")
         self.short_term_memory: deque[Any] = deque(maxlen=short_term_limit)
         self.long_term_memory: Dict[str, Dict[str, Any]] = {}
         self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+        self._lock = threading.Lock()
+        self._keys = itertools.count(1)
+        self.keyword_index = BM25Index()
+        self.embedding_storage = embedding_storage
+        self.rescore_factor = rescore_factor
+        self.full_precision_path = full_precision_path
+        self.full_precision_in_ram = full_precision_in_ram
+        self.vector_index: Optional[QuantizedVectorIndex] = None
+        self.dedup = dedup
+        self.tiers: Optional[TieredStore] = None
+        if max_hot_items is not None or max_hot_bytes is not None:
+            self.tiers = TieredStore(
+                self.long_term_memory,
+                cold_path=cold_path,
+                max_hot_items=max_hot_items,
+                max_hot_bytes=max_hot_bytes,
+                eviction_policy=eviction_policy,
+                on_evict=self._on_evict,
+            )
+        self.retriever = HybridRetriever(self, budget_ms=retrieval_budget_ms)
+        self.worker: Optional[EmbeddingWorker] = None
+        if async_embedding:
+            self.worker = EmbeddingWorker(self._embed_batch, max_batch_size=batch_size, max_wait=batch_wait)
+        self.fallback_embedder = HashingEmbedder()
+        self.embedder: Any = self.fallback_embedder
         if SentenceTransformer:
             try:
                 self.embedder = SentenceTransformer(model_name)
                 logging.info(f"[VectorMemory] Loaded embedding model: {model_name} - memory_enhanced.py:38")
             except Exception as e:
                 logging.error(f"[VectorMemory] Failed to load embedding model: {e} - memory_enhanced.py:40")
-                self.embedder = None
-        else:
-            self.embedder = None
+
+    @property
+    def embedding_model_id(self) -> str:
+        """Identifier of the model that actually produces this memory's vectors."""
+        return getattr(self.embedder, 'model_id', self.model_name)
+
+    def _encode_texts(self, texts: List[str]) -> List[List[float]]:
+        """Run the embedding model on a batch of texts."""
+        return [_to_list(vec) for vec in self.embedder.encode(texts)]
 
     def _embed(self, text: str) -> List[float]:
         """Compute a vector representation for the given text."""
-        if self.embedder:
-            try:
-                vec = self.embedder.encode([text])[0]
-                return vec.tolist()  # type: ignore[no-any-return]
-            except Exception as e:
-                logging.error(f"[VectorMemory] Embedding error: {e}. Falling back to hashing. - memory_enhanced.py:52")
-        # Simple fallback: map characters to floats
-        return [float(ord(c)) / 255.0 for c in text][:128]
+        return self._embed_batch([text])[0]
+
+    def _encode_fallback(self, texts: List[str]) -> List[List[float]]:
+        return [_to_list(vec) for vec in self.fallback_embedder.encode(texts)]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Compute embeddings for several texts, serving repeats from the cache."""
+        try:
+            return self.cache.get_or_compute(self.embedding_model_id, texts, self._encode_texts)
+        except Exception as e:
+            logging.error(f"[VectorMemory] Embedding error: {e}. Falling back to hashing. - memory_enhanced.py:52")
+        # Cached under the fallback's own model id, so they never shadow real model vectors
+        try:
+            return self.cache.get_or_compute(self.fallback_embedder.model_id, texts, self._encode_fallback)
+        except Exception as e:
+            logging.error(f"[VectorMemory] Embedding cache error: {e} - memory_enhanced.py:52")
+        return self._encode_fallback(texts)
+
+    def _store_embedding(self, key: str, embedding: Optional[List[float]]) -> None:
+        """Write a background-computed embedding back to its item."""
+        if embedding is None:
+            return
+        with self._lock:
+            info = self.long_term_memory.get(key)
+            if info is None:
+                # Evicted before the worker got to it: keep the vector for cold search
+                if self.tiers:
+                    self.tiers.set_cold_embedding(key, embedding)
+                return
+            if self.embedding_storage != 'list':
+                self._index_embedding(key, embedding)
+                return
+            info['embedding'] = embedding
+        # The record just grew by a whole vector; re-check the byte ceiling
+        if self.tiers:
+            self.tiers.resize(key)
+
+    def _index_embedding(self, key: str, embedding: List[float]) -> None:
+        if self.vector_index is None:
+            self.vector_index = QuantizedVectorIndex(
+                len(embedding),
+                mode=self.embedding_storage,
+                rescore_factor=self.rescore_factor,
+                full_precision_path=self.full_precision_path,
+                full_precision_on_disk=not self.full_precision_in_ram,
+            )
+        try:
+            self.vector_index.add(key, embedding)
+        except ValueError as e:
+            logging.error(f"[VectorMemory] Cannot index embedding for {key}: {e}")
+
+    def _on_evict(self, key: str) -> None:
+        """Drop an evicted key from the in-RAM indexes, keeping its vector in the cold tier."""
+        self.keyword_index.remove(key)
+        if self.vector_index is not None and self.tiers:
+            vector = self.vector_index.remove(key)
+            if vector is not None:
+                self.tiers.cold.set_embedding(key, vector)
 
-    def add(self, item: Any) -> None:
-        """Add an item to both short-term and long-term memory with embedding."""
+    def add(self, item: Any) -> str:
+        """Add an item to both short-term and long-term memory with embedding.
+
+        With a background worker the embedding is computed asynchronously;
+        until then the item is only searchable by keyword.  Returns the
+        item's key, which is the existing key when a near-duplicate was
+        suppressed.
+        """
         self.short_term_memory.append(item)
-        key = str(len(self.long_term_memory) + 1)
-        embedding = self._embed(str(item))
-        self.long_term_memory[key] = {'item': item, 'embedding': embedding}
+        if self.dedup is not None:
+            duplicate = self.dedup.find_duplicate(str(item), exists=self._has_key)
+            if duplicate is not None:
+                self._merge_duplicate(duplicate, item)
+                return duplicate
+        with self._lock:
+            key = str(next(self._keys))
+            record = {'item': item, 'embedding': None}
+            self.long_term_memory[key] = record
+        self.keyword_index.add(key, str(item))
+        if self.tiers:
+            self.tiers.admit(key, record)
+        if self.dedup is not None:
+            self.dedup.add(key, str(item))
+        if self.worker:
+            self.worker.submit(key, str(item), self._store_embedding)
+        else:
+            self._store_embedding(key, self._embed(str(item)))
         logging.debug(f"[VectorMemory] Added item {key}: {item} - memory_enhanced.py:62")
+        return key
+
+    def _has_key(self, key: str) -> bool:
+        return key in self.long_term_memory or bool(self.tiers and key in self.tiers.cold)
+
+    def _merge_duplicate(self, key: str, item: Any) -> None:
+        """Count a suppressed write against the stored record ``key``."""
+        count = self.dedup.record_duplicate(key, str(item))
+        with self._lock:
+            record = self.long_term_memory.get(key)
+            if record is not None:
+                record['count'] = count
+        if record is not None and self.tiers:
+            self.tiers.touch(key)
+        logging.debug(f"[VectorMemory] Merged duplicate into item {key} (x{count})")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued items have been embedded."""
+        if not self.worker:
+            return True
+        return self.worker.flush(timeout)
+
+    async def wait_for_embeddings(self, timeout: Optional[float] = None) -> bool:
+        """Await until all queued items have been embedded."""
+        if not self.worker:
+            return True
+        return await self.worker.wait_idle(timeout)
+
+    def close(self) -> None:
+        """Embed any outstanding items and stop the background worker."""
+        if self.worker:
+            self.worker.stop()
+        if self.vector_index is not None:
+            self.vector_index.close()
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Report how much RAM the embedding storage uses compared with float lists."""
+        if self.vector_index is not None:
+            return self.vector_index.memory_report()
+        with self._lock:
+            vectors = [info['embedding'] for info in self.long_term_memory.values() if info['embedding'] is not None]
+        dim = len(vectors[0]) if vectors else 0
+        used = sum(len(vec) for vec in vectors) * PYTHON_LIST_BYTES_PER_DIM
+        return {
+            "vectors": len(vectors),
+            "dim": dim,
+            "mode": self.embedding_storage,
+            "quantised_bytes": 0,
+            "full_precision_bytes_in_ram": used,
+            "python_list_bytes": used,
+            "saved_bytes": 0,
+            "compression_ratio": 1.0 if used else 0.0,
+        }
+
+    def evaluate_recall(self, queries: List[str], top_k: int = 5) -> Dict[str, float]:
+        """Measure quantised-search recall@k against exact search for text queries."""
+        if self.vector_index is None:
+            return {"queries": 0}
+        return self.vector_index.evaluate_recall(self._embed_batch(list(queries)), top_k)
 
     def get_recent(self, limit: int = 5) -> List[Any]:
         """Return the most recent items from memory."""
         return list(self.short_term_memory)[-limit:]
 
+    def get_item(self, key: str) -> Any:
+        """Return the stored item for ``key`` or ``None``.
+
+        Cold-tier items are promoted back into the hot tier on access.
+        """
+        info = self.long_term_memory.get(key)
+        if info is None and self.tiers:
+            info = self.tiers.get(key)
+            if info is not None and key in self.long_term_memory:
+                self.keyword_index.add(key, str(info['item']))
+                if self.embedding_storage != 'list' or info.get('embedding') is None:
+                    # The vector stayed in the cold tier; re-embed (cache hit) to re-index it
+                    self._store_embedding(key, self._embed(str(info['item'])))
+        elif info is not None and self.tiers:
+            self.tiers.touch(key)
+        return info['item'] if info is not None else None
+
+    def keyword_search(self, query: str, top_k: int = 10) -> List[tuple[str, float]]:
+        """Rank items by BM25 keyword relevance.
+
+        The cold tier is consulted only when nothing in the hot tier matches.
+        """
+        results = self.keyword_index.search(query, top_k)
+        if self.tiers and self.tiers.needs_cold([score for _, score in results], threshold=0.0):
+            results += self.tiers.cold.keyword_search(query, top_k)
+        return results
+
+    def vector_search(self, query: str, top_k: int = 10) -> List[tuple[str, float]]:
+        """Rank already-embedded items by cosine similarity to the query."""
+        if self.vector_index is not None:
+            query_vec = self._embed(query)
+            scored = self.vector_index.search(query_vec, top_k)
+            if self.tiers and self.tiers.needs_cold([score for _, score in scored]):
+                scored = sorted(scored + self.tiers.cold.vector_search(query_vec, top_k), key=lambda x: x[1], reverse=True)
+            return scored[:top_k]
+        with self._lock:
+            entries = [(key, info['embedding']) for key, info in self.long_term_memory.items()
+                       if info['embedding'] is not None]
+        if not entries and not self.tiers:
+            return []
+        query_vec = self._embed(query)
+        scored = [(key, cosine_similarity(query_vec, vec)) for key, vec in entries if len(vec) == len(query_vec)]
+        scored.sort(key=lambda x: x[1], reverse=True)
+        if self.tiers and self.tiers.needs_cold([score for _, score in scored[:top_k]]):
+            scored = sorted(scored + self.tiers.cold.vector_search(query_vec, top_k), key=lambda x: x[1], reverse=True)
+        return scored[:top_k]
+
+    def get_recent_context(self, limit: int = 3, query: Optional[str] = None, max_chars: int = 1500) -> str:
+        """Return a bounded context block for prompt assembly.
+
+        With a query, the most relevant items are retrieved by the hybrid
+        retriever; otherwise the most recent short-term items are used.
+        """
+        if query:
+            return self.retriever.build_context(query, top_k=limit, max_chars=max_chars)
+        return format_context_block(self.get_recent(limit), max_chars)
+
     def search(self, query: str, top_k: int = 3) -> List[Any]:
         """Return up to `top_k` items whose embeddings are closest to the query."""
-        if not self.long_term_memory:
+        if not self.long_term_memory and not self.tiers:
             return []
         query_vec = self._embed(query)
+        query_terms = set(query.lower().split())
+        indexed: Dict[str, float] = {}
+        if self.vector_index is not None:
+            indexed = dict(self.vector_index.search(query_vec, top_k))
+        with self._lock:
+            entries = list(self.long_term_memory.items())
         scored: List[tuple[float, Dict[str, Any]]] = []
-        for info in self.long_term_memory.values():
+        for key, info in entries:
             item_vec = info['embedding']
-            if np is not None and len(query_vec) == len(item_vec):
+            if self.vector_index is not None and key in self.vector_index:
+                if key not in indexed:
+                    continue
+                sim = indexed[key]
+            elif item_vec is None:
+                # Not embedded yet: fall back to keyword overlap
+                words = set(str(info['item']).lower().split())
+                sim = len(words & query_terms) / max(len(query_terms), 1)
+            elif len(query_vec) == len(item_vec):
                 try:
-                    sim = float(np.dot(query_vec, item_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(item_vec) + 1e-8))
+                    sim = cosine_similarity(query_vec, item_vec)
                 except Exception as e:
                     logging.error(f"[VectorMemory] Similarity error: {e} - memory_enhanced.py:80")
                     sim = 0.0
@@ -83,4 +380,7 @@ class VectorMemory:
                 sim = len(set(str(info['item'])) & set(query)) / max(len(set(query)), 1)
             scored.append((sim, info))
         scored.sort(key=lambda x: x[0], reverse=True)
+        if self.tiers and self.tiers.needs_cold([sim for sim, _ in scored[:top_k]]):
+            cold = self.tiers.search_cold(query, query_vec=query_vec, top_k=top_k)
+            scored = sorted(scored + [(score, value) for _, value, score in cold], key=lambda x: x[0], reverse=True)
         return [info['item'] for sim, info in scored[:top_k]]
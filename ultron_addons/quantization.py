@@ -0,0 +1,304 @@
+"""
+quantization.py
+===============
+
+Compact storage for embedding vectors.  `QuantizedVectorIndex` keeps every
+vector in one of three modes:
+
+* ``float32`` - unquantised, the reference for recall measurements;
+* ``float16`` - half precision, 2 bytes per dimension;
+* ``int8``    - per-vector scaled int8 (``code = round(v / scale)`` with
+  ``scale = max|v| / 127``), 1 byte per dimension plus one float scale.
+
+Vectors are L2-normalised on insert so the dot product is the cosine
+similarity.  A search first scans the quantised codes, then rescores the
+best ``top_k * rescore_factor`` candidates against full-precision float32
+copies.  The full-precision copies live in RAM as ``array('f')`` by default
+or, with ``full_precision_path`` (or ``full_precision_on_disk`` for an
+anonymous temporary file), in a file on disk from which only the
+candidates are read.
+
+Removed vectors leave dead rows behind; once they make up more than
+``compact_ratio`` of the index the rows are compacted in place, so churn
+(e.g. tier evictions) does not grow the index without bound.
+
+The scan is vectorised with NumPy when it is installed; otherwise a slower
+pure-Python path is used.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import struct
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+STORAGE_MODES = ("float32", "float16", "int8")
+
+# A float stored in a Python list costs an 8 byte pointer plus a 24 byte
+# float object; this is what ``vec.tolist()`` storage used per dimension.
+PYTHON_LIST_BYTES_PER_DIM = 32
+
+# Never compact for fewer dead rows than this; small indexes are cheap to scan
+_COMPACT_MIN_DEAD = 64
+
+
+def _normalise(vec: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(float(x) * float(x) for x in vec))
+    return [float(x) / norm for x in vec] if norm > 0 else [0.0 for _ in vec]
+
+
+class QuantizedVectorIndex:
+    """Quantised embedding matrix with full-precision rescoring."""
+
+    def __init__(
+        self,
+        dim: int,
+        mode: str = "int8",
+        rescore_factor: int = 4,
+        full_precision_path: Optional[Union[str, Path]] = None,
+        full_precision_on_disk: bool = False,
+        compact_ratio: float = 0.25,
+    ) -> None:
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode {mode!r}; expected one of {STORAGE_MODES}")
+        self.dim = dim
+        self.mode = mode
+        self.rescore_factor = max(1, rescore_factor)
+        self.compact_ratio = compact_ratio
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._keys: List[Optional[Hashable]] = []
+        self._rows: Dict[Hashable, int] = {}
+        self._scales: List[float] = []
+        self._codes: Any = None
+        self._py_codes: List[Any] = []
+        if np is not None:
+            self._codes = np.zeros((16, dim), dtype=self._np_dtype())
+            self._np_scales = np.zeros(16, dtype=np.float32)
+            self._alive = np.zeros(16, dtype=bool)
+        self._full: List[Optional[array]] = []
+        self._full_file = None
+        if full_precision_path is not None:
+            path = Path(full_precision_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Scratch file owned by this index; rows are fixed-size records
+            self._full_file = open(path, "w+b")
+        elif full_precision_on_disk:
+            self._full_file = tempfile.TemporaryFile(prefix="ultron_vectors_")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._rows
+
+    def _np_dtype(self) -> Any:
+        return {"float32": np.float32, "float16": np.float16, "int8": np.int8}[self.mode]
+
+    def _quantise(self, unit: List[float]) -> Tuple[Any, float]:
+        if self.mode == "int8":
+            peak = max((abs(x) for x in unit), default=0.0)
+            scale = peak / 127.0 if peak > 0 else 1.0
+            return [max(-127, min(127, round(x / scale))) for x in unit], scale
+        return unit, 1.0
+
+    def add(self, key: Hashable, vector: Sequence[float]) -> None:
+        """Store ``vector`` under ``key`` (replacing an older vector)."""
+        if len(vector) != self.dim:
+            raise ValueError(f"Expected a {self.dim}-dimensional vector, got {len(vector)}")
+        unit = _normalise(vector)
+        codes, scale = self._quantise(unit)
+        with self._lock:
+            if key in self._rows:
+                self.remove(key)
+            row = len(self._keys)
+            self._keys.append(key)
+            self._rows[key] = row
+            self._scales.append(scale)
+            if np is not None:
+                if row >= len(self._codes):
+                    grow = len(self._codes)
+                    self._codes = np.concatenate([self._codes, np.zeros((grow, self.dim), dtype=self._codes.dtype)])
+                    self._np_scales = np.concatenate([self._np_scales, np.zeros(grow, dtype=np.float32)])
+                    self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+                self._codes[row] = codes
+                self._np_scales[row] = scale
+                self._alive[row] = True
+            elif self.mode == "int8":
+                self._py_codes.append(array("b", codes))
+            elif self.mode == "float16":
+                self._py_codes.append(struct.pack(f"<{self.dim}e", *codes))
+            else:
+                self._py_codes.append(array("f", codes))
+            full = array("f", unit)
+            if self._full_file is not None:
+                self._full_file.seek(row * self.dim * 4)
+                self._full_file.write(full.tobytes())
+                self._full.append(None)
+            else:
+                self._full.append(full)
+
+    def remove(self, key: Hashable) -> Optional[List[float]]:
+        """Drop ``key`` and return its full-precision (unit) vector."""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return None
+            vector = self._full_vector(row)
+            self._keys[row] = None
+            self._full[row] = None
+            if np is not None:
+                self._alive[row] = False
+            else:
+                self._py_codes[row] = None
+            dead = len(self._keys) - len(self._rows)
+            if dead >= _COMPACT_MIN_DEAD and dead > self.compact_ratio * len(self._keys):
+                self._compact()
+            return vector.tolist()
+
+    def _compact(self) -> None:
+        """Drop dead rows, moving the live ones down in order."""
+        live = [row for row, key in enumerate(self._keys) if key is not None]
+        if self._full_file is not None:
+            size = self.dim * 4
+            # Rows only move towards the start, so each is read before it is overwritten
+            for new, old in enumerate(live):
+                if new != old:
+                    self._full_file.seek(old * size)
+                    data = self._full_file.read(size)
+                    self._full_file.seek(new * size)
+                    self._full_file.write(data)
+            self._full_file.truncate(len(live) * size)
+        self._keys = [self._keys[row] for row in live]
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        self._scales = [self._scales[row] for row in live]
+        self._full = [self._full[row] for row in live]
+        if np is not None:
+            capacity = max(16, 2 * len(live))
+            index = np.asarray(live, dtype=np.intp)
+            codes = np.zeros((capacity, self.dim), dtype=self._codes.dtype)
+            codes[:len(live)] = self._codes[index]
+            scales = np.zeros(capacity, dtype=np.float32)
+            scales[:len(live)] = self._np_scales[index]
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:len(live)] = True
+            self._codes, self._np_scales, self._alive = codes, scales, alive
+        else:
+            self._py_codes = [self._py_codes[row] for row in live]
+        self.compactions += 1
+
+    def _full_vector(self, row: int) -> array:
+        if self._full_file is None:
+            return self._full[row]  # type: ignore[return-value]
+        with self._lock:
+            self._full_file.seek(row * self.dim * 4)
+            data = self._full_file.read(self.dim * 4)
+        return array("f", data)
+
+    def _candidate_rows(self, query: List[float], n_candidates: int) -> List[Tuple[float, int]]:
+        """Score every live row on its quantised codes and keep the best ``n_candidates``."""
+        if np is not None:
+            n = len(self._keys)
+            q = np.asarray(query, dtype=np.float32)
+            scores = (self._codes[:n].astype(np.float32) @ q) * self._np_scales[:n]
+            scores[~self._alive[:n]] = -np.inf
+            n_candidates = min(n_candidates, int(self._alive[:n].sum()))
+            if n_candidates < n:
+                rows = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            else:
+                rows = np.arange(n)
+            return [(float(scores[row]), int(row)) for row in rows if self._alive[row]]
+        results = []
+        for row, codes in enumerate(self._py_codes):
+            if codes is None:
+                continue
+            values = struct.unpack(f"<{self.dim}e", codes) if self.mode == "float16" else codes
+            results.append((self._scales[row] * sum(c * q for c, q in zip(values, query, strict=True)), row))
+        results.sort(reverse=True)
+        return results[:n_candidates]
+
+    def search(self, query: Sequence[float], top_k: int = 5, rescore: bool = True) -> List[Tuple[Hashable, float]]:
+        """Return the ``top_k`` most similar ``(key, cosine)`` pairs."""
+        if len(query) != self.dim:
+            return []
+        unit = _normalise(query)
+        with self._lock:
+            if not self._rows:
+                return []
+            n_candidates = top_k * self.rescore_factor if rescore else top_k
+            candidates = self._candidate_rows(unit, n_candidates)
+            if rescore:
+                candidates = [
+                    (sum(a * b for a, b in zip(self._full_vector(row), unit, strict=True)), row) for _, row in candidates
+                ]
+            candidates.sort(reverse=True)
+            return [(self._keys[row], score) for score, row in candidates[:top_k]]
+
+    def exact_search(self, query: Sequence[float], top_k: int = 5) -> List[Tuple[Hashable, float]]:
+        """Brute-force search over the full-precision vectors (the recall reference)."""
+        if len(query) != self.dim:
+            return []
+        unit = _normalise(query)
+        with self._lock:
+            scored = [
+                (sum(a * b for a, b in zip(self._full_vector(row), unit, strict=True)), row)
+                for key, row in self._rows.items()
+            ]
+        scored.sort(reverse=True)
+        return [(self._keys[row], score) for score, row in scored[:top_k]]
+
+    def evaluate_recall(self, queries: Sequence[Sequence[float]], top_k: int = 5) -> Dict[str, float]:
+        """Measure recall@k of quantised search (with and without rescoring) against exact search."""
+        if not queries:
+            return {"queries": 0}
+        totals = {"rescored": 0.0, "quantised_only": 0.0}
+        for query in queries:
+            exact = {key for key, _ in self.exact_search(query, top_k)}
+            if not exact:
+                continue
+            rescored = {key for key, _ in self.search(query, top_k, rescore=True)}
+            raw = {key for key, _ in self.search(query, top_k, rescore=False)}
+            totals["rescored"] += len(exact & rescored) / len(exact)
+            totals["quantised_only"] += len(exact & raw) / len(exact)
+        return {
+            "queries": len(queries),
+            f"recall@{top_k}_rescored": round(totals["rescored"] / len(queries), 4),
+            f"recall@{top_k}_quantised_only": round(totals["quantised_only"] / len(queries), 4),
+        }
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Compare the index's RAM footprint with plain Python float lists."""
+        n = len(self._rows)
+        bytes_per_dim = {"float32": 4, "float16": 2, "int8": 1}[self.mode]
+        quantised = n * (self.dim * bytes_per_dim + (4 if self.mode == "int8" else 0))
+        full_in_ram = 0 if self._full_file is not None else n * self.dim * 4
+        baseline = n * self.dim * PYTHON_LIST_BYTES_PER_DIM
+        used = quantised + full_in_ram
+        return {
+            "vectors": n,
+            "dim": self.dim,
+            "mode": self.mode,
+            "quantised_bytes": quantised,
+            "full_precision_bytes_in_ram": full_in_ram,
+            "python_list_bytes": baseline,
+            "saved_bytes": baseline - used,
+            "compression_ratio": round(baseline / used, 2) if used else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._full_file is not None:
+            try:
+                self._full_file.close()
+            except OSError as e:
+                logging.error(f"[QuantizedVectorIndex] Failed to close full-precision file: {e}")
+            self._full_file = None
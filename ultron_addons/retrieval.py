@@ -0,0 +1,192 @@
+"""
+retrieval.py
+============
+
+Hybrid memory retrieval for prompt context assembly.  A `HybridRetriever`
+runs keyword (BM25) and vector search over a memory backend in parallel
+and fuses the two rankings with reciprocal rank fusion (RRF).  Retrieval is
+bounded by a latency budget: whatever sources have finished when the budget
+expires are fused and returned, so a slow embedding model never delays the
+prompt by more than the budget.
+
+The memory backend must provide ``keyword_search(query, top_k)`` and/or
+``vector_search(query, top_k)`` returning ``[(key, score), ...]`` lists, and
+``get_item(key)`` to resolve keys.  `VectorMemory` implements this protocol.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+Ranking = List[Tuple[Hashable, float]]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens used by the keyword index."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Incrementally built in-memory BM25 inverted index."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self._doc_terms: Dict[Hashable, Tuple[str, ...]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """Index ``text`` under ``doc_id``, replacing any previous version."""
+        tokens = tokenize(text)
+        with self._lock:
+            if doc_id in self.doc_lengths:
+                self._remove_locked(doc_id)
+            for token in tokens:
+                self.postings.setdefault(token, {})
+                self.postings[token][doc_id] = self.postings[token].get(doc_id, 0) + 1
+            self.doc_lengths[doc_id] = len(tokens)
+            self._doc_terms[doc_id] = tuple(set(tokens))
+            self._total_length += len(tokens)
+
+    def remove(self, doc_id: Hashable) -> None:
+        """Drop ``doc_id`` from the index."""
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: Hashable) -> None:
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for token in self._doc_terms.pop(doc_id, ()):
+            docs = self.postings.get(token, {})
+            docs.pop(doc_id, None)
+            if not docs:
+                self.postings.pop(token, None)
+
+    def search(self, query: str, top_k: int = 10) -> Ranking:
+        """Return the ``top_k`` best matching ``(doc_id, score)`` pairs."""
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[Hashable, float] = {}
+            for token in set(tokenize(query)):
+                docs = self.postings.get(token)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: List[Ranking], k: int = 60) -> Ranking:
+    """Fuse several rankings: ``score(d) = sum(1 / (k + rank_i(d)))``."""
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, (doc_id, _) in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
+
+
+class HybridRetriever:
+    """Parallel BM25 + vector retrieval with RRF fusion and a latency budget."""
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, memory: Any, budget_ms: float = 20.0, rrf_k: int = 60, candidates: int = 10) -> None:
+        self.memory = memory
+        self.budget_ms = budget_ms
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.sources: Dict[str, Callable[[str, int], Ranking]] = {}
+        for name in ("keyword", "vector"):
+            search = getattr(memory, f"{name}_search", None)
+            if callable(search):
+                self.sources[name] = search
+        # A source that is still running from an earlier query is skipped
+        # instead of piling up more work behind it.
+        self._inflight: Dict[str, Future] = {}
+        self.stats: Dict[str, Any] = {
+            "queries": 0,
+            "late": {name: 0 for name in self.sources},
+            "skipped": {name: 0 for name in self.sources},
+            "errors": {name: 0 for name in self.sources},
+        }
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ultron-retrieval")
+            return cls._executor
+
+    def retrieve(self, query: str, top_k: int = 5, budget_ms: Optional[float] = None) -> Ranking:
+        """Return up to ``top_k`` fused ``(key, score)`` results within the budget."""
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000.0
+        self.stats["queries"] += 1
+        executor = self._get_executor()
+        futures: Dict[Future, str] = {}
+        for name, search in self.sources.items():
+            previous = self._inflight.get(name)
+            if previous is not None and not previous.done():
+                self.stats["skipped"][name] += 1
+                continue
+            future = executor.submit(search, query, self.candidates)
+            self._inflight[name] = future
+            futures[future] = name
+
+        done, not_done = wait(futures, timeout=budget)
+        rankings: List[Ranking] = []
+        for future in done:
+            try:
+                rankings.append(future.result())
+            except Exception as e:
+                self.stats["errors"][futures[future]] += 1
+                logging.error(f"[HybridRetriever] {futures[future]} search failed: {e}")
+        for future in not_done:
+            self.stats["late"][futures[future]] += 1
+        return reciprocal_rank_fusion(rankings, k=self.rrf_k)[:top_k]
+
+    def build_context(self, query: str, top_k: int = 5, max_chars: int = 1500, budget_ms: Optional[float] = None) -> str:
+        """Render the retrieved items as a bullet list of at most ``max_chars``."""
+        start = time.perf_counter()
+        items = [self.memory.get_item(key) for key, _ in self.retrieve(query, top_k, budget_ms)]
+        block = format_context_block([item for item in items if item is not None], max_chars)
+        logging.debug(f"[HybridRetriever] Built {len(block)} char context in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return block
+
+
+def format_context_block(items: List[Any], max_chars: int = 1500) -> str:
+    """Format items as ``- item`` lines, truncating so the block fits ``max_chars``."""
+    lines: List[str] = []
+    used = 0
+    for item in items:
+        line = "- " + " ".join(str(item).split())
+        remaining = max_chars - used
+        if remaining <= 4:
+            break
+        if len(line) > remaining:
+            line = line[:remaining - 3].rstrip() + "..."
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
@@ -0,0 +1,516 @@
+"""
+tiered_memory.py
+================
+
+Hot/cold tiering for long-term memory.  A `TieredStore` watches a memory
+backend's in-RAM ``long_term_memory`` dict (the hot tier) and keeps it under
+configurable ceilings on item count and estimated bytes.  When a ceiling is
+exceeded, victims chosen by the eviction policy (``lru``, ``lfu`` or
+``age``) are moved into a `ColdStore`, a SQLite file with an FTS5 keyword
+index and the items' embeddings.  The cold tier is only queried when the
+hot results score poorly.
+
+`TieredStore.consolidate` clusters stale cold items and replaces every
+cluster with one compact summary record; `start_consolidation` runs it
+periodically on a daemon thread.
+
+The store is duck-typed against its owner: it only needs the hot dict and
+an optional ``on_evict(key)`` callback so the owner can drop the key from
+its own indexes.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .hashing_embedder import cosine_similarity
+
+EVICTION_POLICIES = ("lru", "lfu", "age")
+
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it its of on or that the this to was were will with you".split()
+)
+
+
+def _item_text(value: Any) -> str:
+    """Return the searchable text of a stored value."""
+    if isinstance(value, dict) and "item" in value:
+        value = value["item"]
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+def _item_embedding(value: Any) -> Optional[Sequence[float]]:
+    if isinstance(value, dict):
+        return value.get("embedding")
+    return None
+
+
+def estimate_size(value: Any) -> int:
+    """Rough in-RAM footprint of a memory record in bytes."""
+    size = len(_item_text(value)) + 100
+    embedding = _item_embedding(value)
+    if embedding is not None:
+        # A Python list of floats costs a pointer plus a float object per entry
+        size += 32 * len(embedding)
+    return size
+
+
+class ColdStore:
+    """SQLite-backed cold tier with FTS5 keyword search and stored embeddings."""
+
+    def __init__(self, path: Union[str, Path] = "memory_cold.db") -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                text TEXT NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                kind TEXT NOT NULL DEFAULT 'item'
+            );
+            CREATE INDEX IF NOT EXISTS items_last_access ON items (last_access);
+            """
+        )
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(key UNINDEXED, text)")
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM items WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key: str, value: Any, created: float, last_access: float, hits: int = 0, kind: str = "item") -> None:
+        """Insert or replace a record."""
+        text = _item_text(value)
+        embedding = _item_embedding(value)
+        blob = array("f", embedding).tobytes() if embedding is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO items (key, value, text, embedding, created, last_access, hits, kind) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), text, blob, created, last_access, hits, kind),
+            )
+            if self.has_fts:
+                self._db.execute("DELETE FROM items_fts WHERE key = ?", (key,))
+                self._db.execute("INSERT INTO items_fts (key, text) VALUES (?, ?)", (key, text))
+            self._db.commit()
+
+    def set_embedding(self, key: str, embedding: Sequence[float]) -> None:
+        """Attach an embedding to a stored record (used when the owner keeps vectors outside the record)."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE items SET embedding = ? WHERE key = ?", (array("f", embedding).tobytes(), key)
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return ``{value, created, last_access, hits, kind}`` for ``key``."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created, last_access, hits, kind FROM items WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"value": json.loads(row[0]), "created": row[1], "last_access": row[2], "hits": row[3], "kind": row[4]}
+
+    def delete(self, keys: Sequence[str]) -> None:
+        """Remove records."""
+        with self._lock:
+            self._db.executemany("DELETE FROM items WHERE key = ?", [(k,) for k in keys])
+            if self.has_fts:
+                self._db.executemany("DELETE FROM items_fts WHERE key = ?", [(k,) for k in keys])
+            self._db.commit()
+
+    def keyword_search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Rank cold records by keyword relevance (FTS5 bm25 when available)."""
+        terms = [t for t in _WORD_RE.findall(query.lower()) if t not in _STOPWORDS]
+        if not terms:
+            return []
+        with self._lock:
+            if self.has_fts:
+                match = " OR ".join(f'"{t}"' for t in terms)
+                rows = self._db.execute(
+                    "SELECT key, -bm25(items_fts) FROM items_fts WHERE items_fts MATCH ? "
+                    "ORDER BY bm25(items_fts) LIMIT ?",
+                    (match, top_k),
+                ).fetchall()
+            else:
+                clause = " OR ".join("text LIKE ?" for _ in terms)
+                rows = self._db.execute(
+                    f"SELECT key, 1.0 FROM items WHERE {clause} LIMIT ?", [f"%{t}%" for t in terms] + [top_k]
+                ).fetchall()
+        return [(key, float(score)) for key, score in rows]
+
+    def vector_search(self, query_vec: Sequence[float], top_k: int = 5) -> List[Tuple[str, float]]:
+        """Stream stored embeddings from disk and keep the ``top_k`` most similar."""
+        best: List[Tuple[float, str]] = []
+        with self._lock:
+            for key, blob in self._db.execute("SELECT key, embedding FROM items WHERE embedding IS NOT NULL"):
+                vec = array("f", blob)
+                if len(vec) != len(query_vec):
+                    continue
+                score = cosine_similarity(query_vec, vec)
+                if len(best) < top_k:
+                    heapq.heappush(best, (score, key))
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, (score, key))
+        return [(key, score) for score, key in sorted(best, reverse=True)]
+
+    def iter_stale(self, before: float, kind: str = "item") -> Iterator[Tuple[str, Any, float, float]]:
+        """Yield ``(key, value, created, last_access)`` for records not accessed since ``before``."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value, created, last_access FROM items WHERE last_access < ? AND kind = ? "
+                "ORDER BY created",
+                (before, kind),
+            ).fetchall()
+        for key, value, created, last_access in rows:
+            yield key, json.loads(value), created, last_access
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class TieredStore:
+    """Keep a hot dict under RAM ceilings by evicting into a `ColdStore`."""
+
+    def __init__(
+        self,
+        hot: Dict[str, Any],
+        cold: Optional[ColdStore] = None,
+        cold_path: Union[str, Path] = "memory_cold.db",
+        max_hot_items: Optional[int] = 1000,
+        max_hot_bytes: Optional[int] = None,
+        eviction_policy: str = "lru",
+        cold_score_threshold: float = 0.35,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {eviction_policy!r}; expected one of {EVICTION_POLICIES}")
+        self.hot = hot
+        self.cold = cold if cold is not None else ColdStore(cold_path)
+        self.max_hot_items = max_hot_items
+        self.max_hot_bytes = max_hot_bytes
+        self.eviction_policy = eviction_policy
+        self.cold_score_threshold = cold_score_threshold
+        self.on_evict = on_evict
+        # key -> [created, last_access, hits, size]; insertion order doubles
+        # as LRU order (moved to the end on access) or age order (never moved).
+        self._meta: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lfu_heap: List[Tuple[float, float, str]] = []
+        self._hot_bytes = 0
+        self._lock = threading.RLock()
+        self._consolidation_stop: Optional[threading.Event] = None
+        self.stats: Dict[str, int] = {"evictions": 0, "cold_queries": 0, "cold_hits": 0, "promotions": 0}
+        for key, value in list(hot.items()):
+            self.admit(key, value)
+
+    @property
+    def hot_bytes(self) -> int:
+        """Estimated RAM used by the hot tier."""
+        return self._hot_bytes
+
+    def admit(self, key: str, value: Any, created: Optional[float] = None, hits: int = 0) -> None:
+        """Register a key that was just written to the hot dict and enforce ceilings."""
+        now = time.time()
+        size = estimate_size(value)
+        with self._lock:
+            old = self._meta.pop(key, None)
+            if old is not None:
+                self._hot_bytes -= int(old[3])
+            self._meta[key] = [created if created is not None else now, now, hits, size]
+            self._hot_bytes += size
+            if self.eviction_policy == "lfu":
+                heapq.heappush(self._lfu_heap, (hits, now, key))
+            self._enforce_ceilings(protect=key)
+
+    def touch(self, key: str) -> None:
+        """Record an access to a hot key."""
+        with self._lock:
+            meta = self._meta.get(key)
+            if meta is None:
+                return
+            meta[1] = time.time()
+            meta[2] += 1
+            if self.eviction_policy == "lru":
+                self._meta.move_to_end(key)
+            elif self.eviction_policy == "lfu":
+                heapq.heappush(self._lfu_heap, (meta[2], meta[1], key))
+                if len(self._lfu_heap) > 4 * len(self._meta) + 64:
+                    self._lfu_heap = [(m[2], m[1], k) for k, m in self._meta.items()]
+                    heapq.heapify(self._lfu_heap)
+
+    def resize(self, key: str) -> None:
+        """Re-estimate a hot key after its value grew in place (e.g. its embedding landed)."""
+        with self._lock:
+            meta = self._meta.get(key)
+            value = self.hot.get(key)
+            if meta is None or value is None:
+                return
+            size = estimate_size(value)
+            self._hot_bytes += size - int(meta[3])
+            meta[3] = size
+            self._enforce_ceilings(protect=key)
+
+    def set_cold_embedding(self, key: str, embedding: Sequence[float]) -> bool:
+        """Store a late-arriving embedding for a key that was already evicted; False if it is not cold."""
+        # Under the lock, so a key in the middle of `evict` is seen once it has landed in cold
+        with self._lock:
+            if key in self.hot or key not in self.cold:
+                return False
+            self.cold.set_embedding(key, embedding)
+            return True
+
+    def forget(self, key: str) -> None:
+        """Stop tracking a key the owner removed from the hot dict."""
+        with self._lock:
+            meta = self._meta.pop(key, None)
+            if meta is not None:
+                self._hot_bytes -= int(meta[3])
+
+    def _over_ceiling(self) -> bool:
+        if self.max_hot_items is not None and len(self._meta) > self.max_hot_items:
+            return True
+        return self.max_hot_bytes is not None and self._hot_bytes > self.max_hot_bytes
+
+    def _pick_victim(self, protect: str) -> Optional[str]:
+        if self.eviction_policy in ("lru", "age"):
+            for key in self._meta:
+                if key != protect:
+                    return key
+            return None
+        skipped = []
+        victim = None
+        while self._lfu_heap:
+            hits, last_access, key = heapq.heappop(self._lfu_heap)
+            meta = self._meta.get(key)
+            if meta is None or meta[2] != hits or meta[1] != last_access:
+                continue  # stale heap entry
+            if key == protect:
+                skipped.append((hits, last_access, key))
+                continue
+            victim = key
+            break
+        for entry in skipped:
+            heapq.heappush(self._lfu_heap, entry)
+        return victim
+
+    def _enforce_ceilings(self, protect: str) -> None:
+        while self._over_ceiling():
+            victim = self._pick_victim(protect)
+            if victim is None:
+                break
+            self.evict(victim)
+
+    def evict(self, key: str) -> None:
+        """Move one key from the hot dict into the cold tier."""
+        with self._lock:
+            meta = self._meta.pop(key, None)
+            value = self.hot.pop(key, None)
+            if meta is None or value is None:
+                return
+            self._hot_bytes -= int(meta[3])
+            self.cold.put(key, value, created=meta[0], last_access=meta[1], hits=int(meta[2]))
+            self.stats["evictions"] += 1
+        if self.on_evict:
+            try:
+                self.on_evict(key)
+            except Exception as e:
+                logging.error(f"[TieredStore] on_evict callback failed for {key}: {e}")
+
+    def get(self, key: str, promote: bool = True) -> Any:
+        """Return a value from the hot tier, falling back to the cold tier.
+
+        Cold hits are promoted back into the hot dict unless ``promote`` is
+        false; the owner is responsible for re-indexing promoted keys.
+        """
+        with self._lock:
+            if key in self.hot:
+                self.touch(key)
+                return self.hot[key]
+        record = self.cold.get(key)
+        if record is None:
+            return None
+        if promote and record["kind"] == "item":
+            with self._lock:
+                self.cold.delete([key])
+                self.hot[key] = record["value"]
+                self.admit(key, record["value"], created=record["created"], hits=record["hits"] + 1)
+                self.stats["promotions"] += 1
+        return record["value"]
+
+    def needs_cold(self, hot_scores: Sequence[float], threshold: Optional[float] = None) -> bool:
+        """True when the best hot score is below the threshold (or there is none)."""
+        limit = self.cold_score_threshold if threshold is None else threshold
+        return not hot_scores or max(hot_scores) <= limit
+
+    def search_cold(
+        self, query: str, query_vec: Optional[Sequence[float]] = None, top_k: int = 5
+    ) -> List[Tuple[str, Any, float]]:
+        """Search the cold tier; returns ``(key, value, score)`` without promoting."""
+        self.stats["cold_queries"] += 1
+        if query_vec is not None:
+            ranked = self.cold.vector_search(query_vec, top_k)
+        else:
+            ranked = self.cold.keyword_search(query, top_k)
+        results = []
+        for key, score in ranked:
+            record = self.cold.get(key)
+            if record is not None:
+                results.append((key, record["value"], score))
+        self.stats["cold_hits"] += len(results)
+        return results
+
+    def consolidate(
+        self,
+        stale_after: float = 7 * 24 * 3600,
+        similarity_threshold: float = 0.5,
+        min_cluster_size: int = 2,
+        now: Optional[float] = None,
+    ) -> Dict[str, int]:
+        """Cluster stale cold items and replace each cluster with a summary record.
+
+        Items are grouped greedily: each item joins the first cluster whose
+        leader is at least ``similarity_threshold`` similar (cosine on
+        embeddings when both have one, word Jaccard otherwise).
+        """
+        cutoff = (now if now is not None else time.time()) - stale_after
+        clusters: List[Dict[str, Any]] = []
+        scanned = 0
+        for key, value, created, last_access in self.cold.iter_stale(cutoff):
+            scanned += 1
+            text = _item_text(value)
+            words = set(_WORD_RE.findall(text.lower())) - _STOPWORDS
+            embedding = _item_embedding(value)
+            for cluster in clusters:
+                if _similarity(words, embedding, cluster["words"], cluster["embedding"]) >= similarity_threshold:
+                    cluster["members"].append((key, text, created, last_access, embedding))
+                    break
+            else:
+                clusters.append({
+                    "words": words,
+                    "embedding": embedding,
+                    "members": [(key, text, created, last_access, embedding)],
+                })
+
+        consolidated = written = 0
+        for cluster in clusters:
+            members = cluster["members"]
+            if len(members) < min_cluster_size:
+                continue
+            summary = _summarise(members)
+            summary_key = f"summary:{members[0][0]}"
+            self.cold.put(
+                summary_key,
+                summary,
+                created=min(m[2] for m in members),
+                last_access=max(m[3] for m in members),
+                kind="summary",
+            )
+            self.cold.delete([m[0] for m in members])
+            consolidated += len(members)
+            written += 1
+
+        report = {"scanned": scanned, "clusters": written, "items_consolidated": consolidated}
+        logging.info(f"[TieredStore] Consolidation complete: {report}")
+        return report
+
+    def start_consolidation(self, interval_seconds: float = 3600.0, **kwargs: Any) -> None:
+        """Run `consolidate` every ``interval_seconds`` on a daemon thread."""
+        if self._consolidation_stop is not None:
+            return
+        stop = threading.Event()
+        self._consolidation_stop = stop
+
+        def loop() -> None:
+            while not stop.wait(interval_seconds):
+                try:
+                    self.consolidate(**kwargs)
+                except Exception as e:
+                    logging.error(f"[TieredStore] Consolidation failed: {e}")
+
+        threading.Thread(target=loop, name="memory-consolidation", daemon=True).start()
+
+    def stop_consolidation(self) -> None:
+        if self._consolidation_stop is not None:
+            self._consolidation_stop.set()
+            self._consolidation_stop = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return tier sizes and eviction/cold-query counters."""
+        return {
+            **self.stats,
+            "hot_items": len(self._meta),
+            "hot_bytes": self._hot_bytes,
+            "cold_items": len(self.cold),
+            "eviction_policy": self.eviction_policy,
+        }
+
+
+def _similarity(
+    words: set, embedding: Optional[Sequence[float]], other_words: set, other_embedding: Optional[Sequence[float]]
+) -> float:
+    if embedding is not None and other_embedding is not None and len(embedding) == len(other_embedding):
+        return cosine_similarity(embedding, other_embedding)
+    if not words or not other_words:
+        return 0.0
+    return len(words & other_words) / len(words | other_words)
+
+
+def _summarise(members: List[Tuple[str, str, float, float, Optional[Sequence[float]]]]) -> Dict[str, Any]:
+    """Build a compact extractive summary of a cluster of memory items."""
+    texts = [m[1] for m in members]
+    counts = Counter(w for text in texts for w in set(_WORD_RE.findall(text.lower())) if w not in _STOPWORDS)
+    # The representative is the member that shares the most vocabulary with the cluster
+    representative = max(
+        texts, key=lambda t: sum(counts[w] for w in set(_WORD_RE.findall(t.lower())) if w not in _STOPWORDS)
+    )
+    embeddings = [m[4] for m in members if m[4] is not None]
+    centroid = None
+    if embeddings and all(len(e) == len(embeddings[0]) for e in embeddings):
+        centroid = [sum(values) / len(embeddings) for values in zip(*embeddings, strict=True)]
+    return {
+        "item": f"[{len(members)} similar memories] {representative}",
+        "embedding": centroid,
+        "count": len(members),
+        "keywords": [w for w, _ in counts.most_common(5)],
+        "first_seen": min(m[2] for m in members),
+        "last_seen": max(m[3] for m in members),
+    }
+
+
+def attach_tiered_store(memory: Any, **kwargs: Any) -> TieredStore:
+    """Enable hot/cold tiering on a core `Memory` instance.
+
+    The store wraps ``memory.long_term_memory``; ``kwargs`` are passed to
+    `TieredStore` (e.g. ``max_hot_items``, ``eviction_policy``).
+    """
+    store = TieredStore(memory.long_term_memory, **kwargs)
+    memory.tiers = store
+    return store
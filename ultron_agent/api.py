@@ -4,7 +4,9 @@ from __future__ import annotations
 import asyncio
 import logging
 import time
+from datetime import timedelta
 from contextlib import asynccontextmanager
+from pathlib import Path
 from typing import Dict, Any, Optional
 from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,6 +17,8 @@ import uvicorn
 from ultron_agent.config import get_config, UltronConfig
 from ultron_agent.health import get_health_checker, HealthChecker
 from ultron_agent.logging_config import get_logger, LogContext
+from utils.action_index import get_action_index, init_action_index
+from utils.tracing import get_tracer
 
 logger = get_logger("ultron.api", source="api")
 
@@ -301,6 +305,109 @@ async def trigger_maverick_analysis():
         }
 
 
+# Action log endpoints
+def _require_action_index():
+    index = get_action_index()
+    if index is None:
+        # Written by the process that owns the ActionLogger (e.g. the GUI) under the shared log directory
+        path = Path(get_config().log_directory) / "actions.db"
+        if path.exists():
+            index = init_action_index(path)
+    if index is None:
+        raise HTTPException(status_code=503, detail="Action index not enabled")
+    return index
+
+
+def _since(minutes: Optional[float]):
+    return timedelta(minutes=minutes) if minutes is not None else None
+
+
+@app.get("/actions", tags=["Actions"])
+async def query_actions(
+    action_type: Optional[str] = None,
+    success: Optional[bool] = None,
+    model: Optional[str] = None,
+    session_id: Optional[str] = None,
+    since_minutes: Optional[float] = None,
+    limit: int = 100,
+):
+    """Filter logged actions, e.g. ``?action_type=VOICE_ACTIVITY&success=false&since_minutes=60``."""
+    index = _require_action_index()
+    actions = await asyncio.to_thread(
+        index.query, action_type=action_type, since=_since(since_minutes), success=success,
+        model=model, session_id=session_id, limit=min(limit, 1000),
+    )
+    return {"actions": actions, "count": len(actions)}
+
+
+@app.get("/actions/search", tags=["Actions"])
+async def search_actions(
+    q: str,
+    action_type: Optional[str] = None,
+    since_minutes: Optional[float] = None,
+    limit: int = 20,
+):
+    """Full-text search over action descriptions and full user input / AI response text."""
+    index = _require_action_index()
+    results = await asyncio.to_thread(
+        index.search, q, action_type=action_type, since=_since(since_minutes), limit=min(limit, 200)
+    )
+    return {"query": q, "results": results}
+
+
+@app.get("/actions/stats", tags=["Actions"])
+async def action_stats(
+    field: Optional[str] = None,
+    p: float = 0.95,
+    action_type: Optional[str] = None,
+    group_by: Optional[str] = None,
+    since_minutes: Optional[float] = None,
+):
+    """Action counts, or a percentile of a numeric detail field, e.g.
+    ``?field=processing_time_seconds&p=0.95&action_type=AI_RESPONSE&group_by=model``."""
+    index = _require_action_index()
+    try:
+        if field is None:
+            result = await asyncio.to_thread(
+                index.counts, group_by=group_by or "action_type", action_type=action_type, since=_since(since_minutes)
+            )
+        else:
+            result = await asyncio.to_thread(
+                index.percentile, field, p, group_by=group_by, action_type=action_type, since=_since(since_minutes)
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return {"field": field, "p": p if field else None, "group_by": group_by, "result": result}
+
+
+# Tracing endpoints
+@app.get("/traces", tags=["Tracing"])
+async def recent_traces(limit: int = 20):
+    """Most recent traces (e.g. one per voice command) with their total duration."""
+    return {"traces": get_tracer().recent_traces(limit=min(limit, 200)), "stats": get_tracer().stats}
+
+
+@app.get("/traces/latency", tags=["Tracing"])
+async def trace_latency(root: Optional[str] = None):
+    """Per-span-name latency breakdown, e.g. ``?root=voice.command`` for voice round trips only."""
+    return {"root": root, "spans": get_tracer().latency_breakdown(root=root)}
+
+
+@app.get("/traces/chrome", tags=["Tracing"])
+async def chrome_trace(trace_id: Optional[str] = None):
+    """Chrome trace-event JSON; load it in chrome://tracing or ui.perfetto.dev."""
+    return get_tracer().chrome_trace([trace_id] if trace_id else None)
+
+
+@app.get("/traces/{trace_id}", tags=["Tracing"])
+async def get_trace(trace_id: str):
+    """All spans of one trace."""
+    spans = get_tracer().get_trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+
 @app.get("/info", tags=["Information"])
 async def get_info():
     """Get general service information."""
@@ -315,7 +422,9 @@ async def get_info():
             "docs": "/docs",
             "status": "/status (legacy)",
             "command": "/command",
-            "config": "/config"
+            "config": "/config",
+            "actions": "/actions, /actions/search, /actions/stats",
+            "traces": "/traces, /traces/latency, /traces/chrome"
         }
     }
 
@@ -96,6 +96,18 @@ class UltronConfig(BaseModel):
     maverick_analysis_interval: int = Field(default=30, ge=5, le=600, description="Maverick analysis interval (minutes)")
     maverick_auto_apply: bool = Field(default=False, description="Auto-apply Maverick suggestions")
 
+    # Cross-process event bus
+    event_bus_enabled: bool = Field(default=False, description="Share events with other processes over the local event bus")
+    event_bus_address: Optional[str] = Field(
+        default=None, description="Event bus socket path or host:port (default: per-user socket)"
+    )
+    event_bus_allow_remote: bool = Field(
+        default=False, description="Allow a non-loopback event bus host (the token is the only protection)"
+    )
+    event_log_enabled: bool = Field(
+        default=False, description="Persist dispatched events to a replayable log under log_directory/events"
+    )
+
     # POCHI integration settings
     use_pochi: bool = Field(default=False, description="Enable POCHI integration")
 
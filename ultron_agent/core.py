@@ -16,6 +16,7 @@ from queue import Queue
 from . import get_config, get_logger
 from .health import HealthChecker
 from .errors import UltronError, ErrorSeverity, handle_error
+from utils.tracing import span
 
 
 class AgentStatus:
@@ -58,6 +59,8 @@ class IntegratedUltronAgent:
 
         # System components
         self.event_system = None
+        self.event_bus_server = None
+        self.event_bus = None
         self.performance_monitor = None
         self.task_scheduler = None
 
@@ -108,12 +111,21 @@ class IntegratedUltronAgent:
         try:
             # Import and initialize event system
             from utils.event_system import EventSystem
-            self.event_system = EventSystem()
+            event_log = None
+            if self.config.event_log_enabled:
+                from utils.event_log import EventLog
+                event_log = EventLog(Path(self.config.log_directory) / "events")
+            self.event_system = EventSystem(event_log=event_log)
             self.logger.info("Event system initialized")
+            if self.config.event_bus_enabled:
+                try:
+                    await self._start_event_bus()
+                except Exception as e:
+                    self.logger.error(f"Event bus unavailable: {e}")
 
             # Import and initialize performance monitor
             from utils.performance_monitor import PerformanceMonitor
-            self.performance_monitor = PerformanceMonitor()
+            self.performance_monitor = PerformanceMonitor(event_system=self.event_system)
             self.logger.info("Performance monitor initialized")
 
             # Import and initialize task scheduler
@@ -129,6 +141,28 @@ class IntegratedUltronAgent:
             self.performance_monitor = self._create_minimal_performance_monitor()
             self.task_scheduler = self._create_minimal_task_scheduler()
 
+    async def _start_event_bus(self) -> None:
+        """Host the cross-process event bus (unless another process already does) and join it."""
+        from utils.event_bus import EventBusBridge, EventBusServer, parse_address
+
+        allow_remote = self.config.event_bus_allow_remote
+        address = parse_address(self.config.event_bus_address, allow_remote)
+        try:
+            if isinstance(address, tuple):
+                _, writer = await asyncio.open_connection(*address)
+            else:
+                _, writer = await asyncio.open_unix_connection(address)
+            writer.close()
+            self.logger.info(f"Joining existing event bus at {address}")
+        except OSError:
+            self.event_bus_server = EventBusServer(address, allow_remote=allow_remote)
+            await self.event_bus_server.start()
+        # An unset address is re-resolved by the bridge, picking up the port the server chose
+        self.event_bus = EventBusBridge(
+            self.event_system, self.config.event_bus_address, name="agent_core", allow_remote=allow_remote
+        )
+        await self.event_bus.start()
+
     async def _initialize_ai_components(self) -> None:
         """Initialize AI and brain components."""
         self.logger.info("Initializing AI components...")
@@ -338,9 +372,10 @@ class IntegratedUltronAgent:
             self.status = AgentStatus.READY
             self.logger.info(f"Command completed: {str(result_data)[:100]}")
 
-        self.event_system.subscribe("error", on_error)
-        self.event_system.subscribe("command_start", on_command)
-        self.event_system.subscribe("command_complete", on_command_complete)
+        # Status updates must apply in emit order, so run them on the loop
+        self.event_system.subscribe("error", on_error, inline=True)
+        self.event_system.subscribe("command_start", on_command, inline=True)
+        self.event_system.subscribe("command_complete", on_command_complete, inline=True)
 
     def _setup_default_tasks(self) -> None:
         """Setup default scheduled tasks."""
@@ -400,31 +435,35 @@ class IntegratedUltronAgent:
 
         self.logger.info(f"Processing user input: {text[:100]}...")
 
-        try:
-            if text.strip().lower() in ["list tools", "show tools", "tools"]:
-                return self._list_tools()
-
-            # Use brain for text processing
-            if self.brain:
-                # Run async brain function
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(
-                        self.brain.plan_and_act(text, progress_callback=progress_callback)
-                    )
-                    return result
-                finally:
-                    loop.close()
-            else:
-                return "AI Brain not available"
+        with span("agent.handle_text", chars=len(text)) as text_span:
+            try:
+                if text.strip().lower() in ["list tools", "show tools", "tools"]:
+                    text_span.set_attribute("route", "list_tools")
+                    return self._list_tools()
+
+                # Use brain for text processing
+                if self.brain:
+                    text_span.set_attribute("route", "brain")
+                    # Run async brain function
+                    loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(loop)
+                    try:
+                        result = loop.run_until_complete(
+                            self.brain.plan_and_act(text, progress_callback=progress_callback)
+                        )
+                        return result
+                    finally:
+                        loop.close()
+                else:
+                    return "AI Brain not available"
 
-        except Exception as e:
-            error_msg = f"Error processing command: {str(e)}"
-            self.logger.error(error_msg)
-            if progress_callback:
-                progress_callback(0, error_msg, error=True)
-            return error_msg
+            except Exception as e:
+                error_msg = f"Error processing command: {str(e)}"
+                self.logger.error(error_msg)
+                text_span.set_error(e)
+                if progress_callback:
+                    progress_callback(0, error_msg, error=True)
+                return error_msg
 
     def _list_tools(self) -> str:
         """List available tools."""
@@ -499,7 +538,7 @@ class IntegratedUltronAgent:
     def _create_minimal_event_system(self):
         """Create minimal event system fallback."""
         class MinimalEventSystem:
-            def subscribe(self, event, handler): pass
+            def subscribe(self, event, handler, **kwargs): pass
             def publish(self, event, data): pass
         return MinimalEventSystem()
 
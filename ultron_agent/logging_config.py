@@ -1,17 +1,38 @@
-"""Centralized logging configuration for Ultron Agent."""
+"""Centralized logging configuration for Ultron Agent.
+
+All handlers sit behind a `BoundedQueueHandler`: the calling thread only
+copies the record onto a bounded queue and a `QueueListener` thread does
+the formatting and file I/O.  When the queue is full the overflow policy
+(``drop_oldest``, ``drop_new`` or ``block``) decides what is lost, and
+`get_logging_stats` reports how many records were dropped.
+`shutdown_logging` (also registered with ``atexit``) drains the queues.
+
+A `RateLimitFilter` in front of the queue samples DEBUG/INFO records and
+rate-limits each call site (logger + file + line) with a token bucket, so
+per-event log statements on hot paths cannot flood the pipeline; it
+periodically logs how many similar messages it suppressed.
+"""
 from __future__ import annotations
 
+import atexit
+import copy
 import os
+import queue
+import random
 import sys
+import time
 import logging
 import logging.handlers
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Callable
 import json
 import uuid
 from datetime import datetime
 from pythonjsonlogger import jsonlogger
 
+from utils.tracing import current_span
+
 
 class UltronJsonFormatter(jsonlogger.JsonFormatter):
     """Custom JSON formatter with Ultron-specific fields."""
@@ -27,6 +48,10 @@ class UltronJsonFormatter(jsonlogger.JsonFormatter):
         correlation_id = getattr(record, 'correlation_id', None)
         if correlation_id:
             log_record['correlation_id'] = correlation_id
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            log_record['trace_id'] = trace_id
+            log_record['span_id'] = record.span_id
 
         # Add source component
         source = getattr(record, 'source', None)
@@ -53,7 +78,7 @@ class UltronJsonFormatter(jsonlogger.JsonFormatter):
 
 
 class CorrelationFilter(logging.Filter):
-    """Filter to add correlation ID to all log records."""
+    """Filter to add correlation ID and the active trace/span ids to all log records."""
 
     def __init__(self):
         super().__init__()
@@ -63,15 +88,312 @@ class CorrelationFilter(logging.Filter):
         """Add correlation ID if not present."""
         if not hasattr(record, 'correlation_id'):
             record.correlation_id = self.correlation_id
+        _stamp_trace(record)
         return True
 
 
+def _stamp_trace(record: logging.LogRecord) -> None:
+    """Attach the caller's active trace and span ids (the span lives in a context variable)."""
+    if not hasattr(record, 'trace_id'):
+        active = current_span()
+        record.trace_id = active.trace_id if active is not None else None
+        record.span_id = active.span_id if active is not None else None
+
+
+class RateLimitFilter(logging.Filter):
+    """Per-call-site token bucket and per-level sampling for noisy log statements.
+
+    Records at ``exempt_level`` or above always pass.  Every
+    ``summary_interval`` seconds a "suppressed N similar messages" record is
+    logged for each call site that lost records.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = 20.0,
+        burst: int = 50,
+        sample_rates: Optional[Dict[Any, float]] = None,
+        exempt_level: int = logging.WARNING,
+        summary_interval: float = 60.0,
+        summary_logger: str = "ultron.logging.ratelimit",
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample_rates = {
+            (logging.getLevelName(level) if isinstance(level, str) else level): value
+            for level, value in (sample_rates or {}).items()
+        }
+        self.exempt_level = exempt_level
+        self.summary_interval = summary_interval
+        self.summary_logger = summary_logger
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str, int], List[float]] = {}
+        self._suppressed: Dict[Tuple[str, str, int], int] = {}
+        self._last_summary = clock()
+        self.stats = {"passed": 0, "sampled_out": 0, "rate_limited": 0, "summaries": 0}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.exempt_level or getattr(record, "rate_limit_summary", False):
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = self._clock()
+        pending = None
+        with self._lock:
+            allowed = True
+            sample_rate = self.sample_rates.get(record.levelno)
+            if sample_rate is not None and self._rng.random() >= sample_rate:
+                allowed = False
+                self.stats["sampled_out"] += 1
+            elif self.rate is not None:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [float(self.burst), now]
+                bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] >= 1.0:
+                    bucket[0] -= 1.0
+                else:
+                    allowed = False
+                    self.stats["rate_limited"] += 1
+            if allowed:
+                self.stats["passed"] += 1
+            else:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            if self._suppressed and now - self._last_summary >= self.summary_interval:
+                pending, self._suppressed = self._suppressed, {}
+                elapsed, self._last_summary = now - self._last_summary, now
+        if pending:
+            self._emit_summaries(pending, elapsed)
+        return allowed
+
+    def flush_summaries(self) -> None:
+        """Log the pending suppression summaries now."""
+        with self._lock:
+            pending, self._suppressed = self._suppressed, {}
+            now = self._clock()
+            elapsed, self._last_summary = now - self._last_summary, now
+        if pending:
+            self._emit_summaries(pending, elapsed)
+
+    def _emit_summaries(self, pending: Dict[Tuple[str, str, int], int], elapsed: float) -> None:
+        logger = logging.getLogger(self.summary_logger)
+        for (name, pathname, lineno), count in pending.items():
+            self.stats["summaries"] += 1
+            logger.info(
+                f"Suppressed {count} similar messages from {name} "
+                f"({os.path.basename(pathname)}:{lineno}) in the last {elapsed:.0f}s",
+                extra={"rate_limit_summary": True, "suppressed_count": count},
+            )
+
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_new", "block")
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop waits (bounded) for a full queue to drain instead of raising."""
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=timeout)
+        except queue.Full:
+            pass  # listener is stuck; do not hang interpreter shutdown
+        self._thread.join(timeout)
+        self._thread = None
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler with a bounded queue, an overflow policy and drop counters."""
+
+    def __init__(
+        self,
+        handlers: List[logging.Handler],
+        queue_size: int = 10000,
+        overflow_policy: str = "drop_oldest",
+        block_timeout: float = 0.05,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}")
+        super().__init__(queue.Queue(maxsize=queue_size))
+        # An explicit formatter keeps logging.basicConfig from installing its
+        # format here as well as on the target handlers
+        self.setFormatter(logging.Formatter("%(message)s"))
+        self.handlers = list(handlers)
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.stats: Dict[str, Any] = {"enqueued": 0, "dropped": 0, "dropped_by_level": {}}
+        self._stats_lock = threading.Lock()
+        self.listener: Optional[logging.handlers.QueueListener] = _DrainingQueueListener(
+            self.queue, *self.handlers, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Filters on the target handlers run on the listener thread, where the
+        # caller's span context is not visible
+        _stamp_trace(record)
+        # Unlike the base class, only msg and args are merged: folding the
+        # traceback into msg and clearing exc_info would leave the JSON
+        # formatter without its exc_info/stack_info fields.  The traceback is
+        # rendered now, while the frames still hold the values it refers to.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.listener is None:
+            # Pipeline stopped (e.g. during interpreter shutdown): write synchronously
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if not self._handle_overflow(record):
+                return
+        with self._stats_lock:
+            self.stats["enqueued"] += 1
+
+    def _handle_overflow(self, record: logging.LogRecord) -> bool:
+        dropped = record
+        try:
+            if self.overflow_policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+                return True
+            if self.overflow_policy == "drop_oldest":
+                try:
+                    dropped = self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self.queue.put_nowait(record)
+                if dropped is record:
+                    return True
+                self._count_drop(dropped)
+                return True
+        except queue.Full:
+            pass
+        self._count_drop(dropped)
+        return False
+
+    def _count_drop(self, record: logging.LogRecord) -> None:
+        with self._stats_lock:
+            self.stats["dropped"] += 1
+            by_level = self.stats["dropped_by_level"]
+            by_level[record.levelname] = by_level.get(record.levelname, 0) + 1
+
+    def stop(self) -> None:
+        """Drain the queue, stop the listener and flush the target handlers."""
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.stop()
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        self.stop()
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                **self.stats,
+                "dropped_by_level": dict(self.stats["dropped_by_level"]),
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "overflow_policy": self.overflow_policy,
+                "running": self.listener is not None,
+            }
+
+
+_queue_handlers: List[BoundedQueueHandler] = []
+_atexit_registered = False
+
+
+def queue_handlers(
+    *handlers: logging.Handler, queue_size: int = 10000, overflow_policy: str = "drop_oldest"
+) -> BoundedQueueHandler:
+    """
+    Put ``handlers`` behind a bounded queue drained by a background listener.
+
+    Args:
+        *handlers: Handlers that do the actual formatting and I/O
+        queue_size: Maximum number of queued records
+        overflow_policy: What to do when the queue is full
+            (drop_oldest, drop_new or block briefly)
+
+    Returns:
+        The handler to attach to loggers instead of ``handlers``
+    """
+    global _atexit_registered
+    handler = BoundedQueueHandler(list(handlers), queue_size=queue_size, overflow_policy=overflow_policy)
+    _queue_handlers.append(handler)
+    if not _atexit_registered:
+        atexit.register(shutdown_logging)
+        _atexit_registered = True
+    return handler
+
+
+def queue_root_handlers(
+    queue_size: int = 10000, overflow_policy: str = "drop_oldest", rate_limit: bool = True
+) -> Optional[BoundedQueueHandler]:
+    """
+    Move the root logger's current handlers (e.g. from ``logging.basicConfig``) behind a queue.
+
+    With ``rate_limit`` the queue handler also gets a `RateLimitFilter`, so
+    records propagated from unfiltered loggers are limited per call site too.
+    """
+    root_logger = logging.getLogger()
+    targets = [h for h in root_logger.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+    if not targets:
+        return None
+    for handler in targets:
+        root_logger.removeHandler(handler)
+    handler = queue_handlers(*targets, queue_size=queue_size, overflow_policy=overflow_policy)
+    if rate_limit:
+        handler.addFilter(RateLimitFilter())
+    root_logger.addHandler(handler)
+    return handler
+
+
+def shutdown_logging() -> None:
+    """Flush every queued logging pipeline; later records are written synchronously."""
+    for handler in list(_queue_handlers):
+        handler.stop()
+
+
+def get_logging_stats() -> List[Dict[str, Any]]:
+    """Queue depth, enqueued and dropped counters for each logging pipeline."""
+    return [handler.get_stats() for handler in _queue_handlers]
+
+
 def setup_logging(
     log_level: str = "INFO",
     log_directory: Optional[Path] = None,
     enable_json: bool = True,
     enable_console: bool = True,
-    correlation_id: Optional[str] = None
+    correlation_id: Optional[str] = None,
+    use_queue: bool = True,
+    queue_size: int = 10000,
+    overflow_policy: str = "drop_oldest",
+    rate_limit_per_second: Optional[float] = 20.0,
+    rate_limit_burst: int = 50,
+    sample_rates: Optional[Dict[str, float]] = None,
 ) -> logging.Logger:
     """
     Configure centralized logging for Ultron Agent.
@@ -82,6 +404,12 @@ def setup_logging(
         enable_json: Enable structured JSON logging
         enable_console: Enable console logging
         correlation_id: Correlation ID for this session
+        use_queue: Write logs from a background listener thread
+        queue_size: Maximum number of records waiting to be written
+        overflow_policy: drop_oldest, drop_new or block (briefly) when full
+        rate_limit_per_second: Sustained DEBUG/INFO records per call site (None disables)
+        rate_limit_burst: Records a call site may log in a burst before limiting
+        sample_rates: Fraction of records kept per level, e.g. {"DEBUG": 0.1}
 
     Returns:
         Configured root logger
@@ -90,6 +418,10 @@ def setup_logging(
     root_logger = logging.getLogger()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+        if isinstance(handler, BoundedQueueHandler):
+            handler.stop()
+            if handler in _queue_handlers:
+                _queue_handlers.remove(handler)
 
     # Set log level
     log_level_obj = getattr(logging, log_level.upper(), logging.INFO)
@@ -160,10 +492,22 @@ def setup_logging(
     error_handler.addFilter(correlation_filter)
     handlers.append(error_handler)
 
-    # Add all handlers to root logger
+    # Add all handlers to root logger, behind a queue so I/O happens off the calling thread
+    if use_queue:
+        handlers = [queue_handlers(*handlers, queue_size=queue_size, overflow_policy=overflow_policy)]
     for handler in handlers:
         root_logger.addHandler(handler)
 
+    # Drop noisy records before they are formatted or queued
+    if rate_limit_per_second is not None or sample_rates:
+        rate_filter = RateLimitFilter(
+            rate=rate_limit_per_second,
+            burst=rate_limit_burst,
+            sample_rates=sample_rates,
+        )
+        for handler in handlers:
+            handler.addFilter(rate_filter)
+
     # Set up specific loggers
     _configure_component_loggers(log_level_obj)
 
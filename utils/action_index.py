@@ -0,0 +1,341 @@
+"""
+Queryable index of ActionLogger actions.
+
+`ActionIndex` stores every logged action as a row in a SQLite database with
+an FTS5 table over the description and the long free-text fields
+(``full_text``, ``full_response``, ``full_message``, ``error_message``).
+Queries run in SQLite, so nothing is loaded into RAM beyond the rows that
+are returned:
+
+* ``query(action_type="VOICE_ACTIVITY", success=False, since=timedelta(hours=1))``
+* ``percentile("processing_time_seconds", 0.95, action_type="AI_RESPONSE", group_by="model")``
+* ``search("weather forecast")`` - ranked full-text search
+
+The index is fed by `ActionLogger` (``index_path=...``) from its background
+writer thread and is served over HTTP by ``ultron_agent.api``.
+
+Rows older than ``retention_seconds`` (the `SegmentedLog` default, one
+week) and the oldest rows beyond ``max_rows`` are pruned every
+``prune_interval`` seconds while actions are added.  `ActionLogger` also
+prunes up to the oldest segment it still keeps whenever segment retention
+drops files.
+"""
+
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+TimeBound = Union[None, float, datetime, timedelta]
+
+_FIELD_RE = re.compile(r"^\w+$")
+_TEXT_FIELDS = ("full_text", "full_response", "full_message", "error_message")
+_GROUP_COLUMNS = ("action_type", "session_id", "model")
+
+
+def _to_ts(value: TimeBound) -> Optional[float]:
+    """Convert a bound to a UNIX timestamp; a timedelta means "that long ago"."""
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return time.time() - value.total_seconds()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _success_of(entry: Dict[str, Any]) -> Optional[int]:
+    details = entry.get("details") or {}
+    if isinstance(details.get("success"), bool):
+        return int(details["success"])
+    if entry.get("action_type") == "ERROR":
+        return 0
+    description = entry.get("description", "")
+    if description.endswith(": FAILED") or description.endswith(" - FAILED"):
+        return 0
+    if description.endswith(": SUCCESS") or description.endswith(" - SUCCESS"):
+        return 1
+    return None
+
+
+class ActionIndex:
+    """SQLite/FTS5 store of actions with filtered, aggregate and full-text queries."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = "logs/actions.db",
+        retention_seconds: Optional[float] = 7 * 24 * 3600.0,
+        max_rows: Optional[int] = None,
+        prune_interval: float = 300.0,
+    ):
+        self.path = Path(path)
+        self.retention_seconds = retention_seconds
+        self.max_rows = max_rows
+        self.prune_interval = prune_interval
+        self.stats = {"pruned": 0}
+        self._last_prune = 0.0
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS actions (
+                    id INTEGER PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    timestamp TEXT,
+                    session_id TEXT,
+                    action_type TEXT,
+                    description TEXT,
+                    success INTEGER,
+                    model TEXT,
+                    body TEXT,
+                    details TEXT
+                )
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_actions_type_ts ON actions (action_type, ts)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_actions_ts ON actions (ts)")
+            try:
+                self._db.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS actions_fts USING fts5("
+                    "description, body, content='actions', content_rowid='id')"
+                )
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                logging.warning("SQLite FTS5 unavailable; action search falls back to LIKE")
+                self.has_fts = False
+            self._db.commit()
+        self.prune()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM actions").fetchone()[0]
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        self.add_many([entry])
+
+    def add_many(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Index a batch of action entries in one transaction."""
+        rows = []
+        for entry in entries:
+            details = entry.get("details") or {}
+            try:
+                ts = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                ts = time.time()
+            body = "\n".join(str(details[f]) for f in _TEXT_FIELDS if details.get(f))
+            rows.append((
+                ts, entry.get("timestamp"), entry.get("session_id"), entry.get("action_type"),
+                entry.get("description", ""), _success_of(entry), details.get("model"), body,
+                json.dumps(details, ensure_ascii=False, default=str),
+            ))
+        if not rows:
+            return 0
+        with self._lock:
+            for row in rows:
+                cursor = self._db.execute(
+                    "INSERT INTO actions (ts, timestamp, session_id, action_type, description, success, model, body, details) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                if self.has_fts:
+                    self._db.execute(
+                        "INSERT INTO actions_fts (rowid, description, body) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, row[4], row[7]),
+                    )
+            self._db.commit()
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self.prune()
+        return len(rows)
+
+    def prune(self, before: Optional[float] = None, now: Optional[float] = None) -> int:
+        """Delete rows past the retention window, older than ``before`` or beyond ``max_rows``.
+
+        Returns the number of rows deleted.
+        """
+        now = time.time() if now is None else now
+        cutoffs = [ts for ts in (before, None if self.retention_seconds is None else now - self.retention_seconds)
+                   if ts is not None]
+        with self._lock:
+            self._last_prune = time.monotonic()
+            clauses, params = [], []
+            if cutoffs:
+                clauses.append("ts < ?")
+                params.append(max(cutoffs))
+            if self.max_rows is not None:
+                clauses.append("id <= (SELECT id FROM actions ORDER BY id DESC LIMIT 1 OFFSET ?)")
+                params.append(self.max_rows)
+            if not clauses:
+                return 0
+            where = " OR ".join(clauses)
+            if self.has_fts:
+                # External-content FTS tables need the old values to delete their terms
+                self._db.execute(
+                    "INSERT INTO actions_fts (actions_fts, rowid, description, body) "
+                    f"SELECT 'delete', id, description, body FROM actions WHERE {where}",
+                    params,
+                )
+            deleted = self._db.execute(f"DELETE FROM actions WHERE {where}", params).rowcount
+            self._db.commit()
+            self.stats["pruned"] += deleted
+        if deleted:
+            logging.debug(f"Pruned {deleted} actions from {self.path}")
+        return deleted
+
+    def _where(self, action_type=None, since=None, until=None, success=None, model=None, session_id=None):
+        clauses, params = [], []
+        for column, value in (("action_type", action_type), ("model", model), ("session_id", session_id)):
+            if value is not None:
+                clauses.append(f"a.{column} = ?")
+                params.append(value)
+        if success is not None:
+            clauses.append("a.success = ?")
+            params.append(int(success))
+        since_ts, until_ts = _to_ts(since), _to_ts(until)
+        if since_ts is not None:
+            clauses.append("a.ts >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("a.ts <= ?")
+            params.append(until_ts)
+        return (" AND ".join(clauses) or "1"), params
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        return {
+            "timestamp": row[0], "session_id": row[1], "action_type": row[2], "description": row[3],
+            "success": None if row[4] is None else bool(row[4]), "model": row[5], "details": json.loads(row[6]),
+        }
+
+    def query(
+        self,
+        action_type: Optional[str] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        success: Optional[bool] = None,
+        model: Optional[str] = None,
+        session_id: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Return matching actions, newest first."""
+        where, params = self._where(action_type, since, until, success, model, session_id)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT a.timestamp, a.session_id, a.action_type, a.description, a.success, a.model, a.details "
+                f"FROM actions a WHERE {where} ORDER BY a.ts DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def search(
+        self, text: str, action_type: Optional[str] = None, since: TimeBound = None, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Full-text search over descriptions and full text/response fields, best match first."""
+        where, params = self._where(action_type, since)
+        columns = "a.timestamp, a.session_id, a.action_type, a.description, a.success, a.model, a.details"
+        with self._lock:
+            if self.has_fts:
+                terms = " ".join('"' + t.replace('"', '""') + '"' for t in text.split())
+                if not terms:
+                    return []
+                try:
+                    rows = self._db.execute(
+                        f"SELECT {columns}, bm25(actions_fts) FROM actions_fts JOIN actions a ON a.id = actions_fts.rowid "
+                        f"WHERE actions_fts MATCH ? AND {where} ORDER BY bm25(actions_fts) LIMIT ?",
+                        [terms] + params + [limit],
+                    ).fetchall()
+                except sqlite3.OperationalError as e:
+                    logging.error(f"Action search failed: {e}")
+                    return []
+            else:
+                like = f"%{text}%"
+                rows = self._db.execute(
+                    f"SELECT {columns}, 0 FROM actions a WHERE (a.description LIKE ? OR a.body LIKE ?) AND {where} "
+                    "ORDER BY a.ts DESC LIMIT ?",
+                    [like, like] + params + [limit],
+                ).fetchall()
+        results = []
+        for row in rows:
+            result = self._row(row[:7])
+            result["score"] = -row[7]
+            results.append(result)
+        return results
+
+    def counts(self, group_by: str = "action_type", **filters: Any) -> Dict[str, int]:
+        """Number of actions per ``group_by`` column."""
+        if group_by not in _GROUP_COLUMNS:
+            raise ValueError(f"group_by must be one of {_GROUP_COLUMNS}")
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT a.{group_by}, COUNT(*) FROM actions a WHERE {where} GROUP BY a.{group_by}", params
+            ).fetchall()
+        return {str(key): count for key, count in rows}
+
+    def percentile(
+        self,
+        field: str,
+        p: float = 0.95,
+        group_by: Optional[str] = None,
+        **filters: Any,
+    ) -> Dict[str, Optional[float]]:
+        """Nearest-rank percentile of a numeric ``details`` field, optionally per group.
+
+        Each group's value is read with one ``ORDER BY ... LIMIT 1 OFFSET``
+        query, so only a single row per group is materialised.
+        """
+        if not _FIELD_RE.match(field):
+            raise ValueError(f"Invalid field name {field!r}")
+        if group_by is not None and group_by not in _GROUP_COLUMNS:
+            raise ValueError(f"group_by must be one of {_GROUP_COLUMNS}")
+        if not 0 <= p <= 1:
+            raise ValueError("p must be between 0 and 1")
+        where, params = self._where(**filters)
+        value = f"CAST(json_extract(a.details, '$.{field}') AS REAL)"
+        where = f"{where} AND json_extract(a.details, '$.{field}') IS NOT NULL"
+        group = f"a.{group_by}" if group_by else "'all'"
+        results: Dict[str, Optional[float]] = {}
+        with self._lock:
+            groups = self._db.execute(
+                f"SELECT {group}, COUNT(*) FROM actions a WHERE {where} GROUP BY {group}", params
+            ).fetchall()
+            for key, count in groups:
+                rank = max(1, math.ceil(round(p * count, 9)))
+                group_clause = f" AND {group} IS ?" if group_by else ""
+                row = self._db.execute(
+                    f"SELECT {value} FROM actions a WHERE {where}{group_clause} ORDER BY {value} LIMIT 1 OFFSET ?",
+                    params + ([key] if group_by else []) + [rank - 1],
+                ).fetchone()
+                results[str(key)] = row[0] if row else None
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# Global index instance
+_action_index: Optional[ActionIndex] = None
+
+
+def get_action_index() -> Optional[ActionIndex]:
+    """Return the global action index, if one was initialised."""
+    return _action_index
+
+
+def init_action_index(path: Union[str, Path] = "logs/actions.db", **kwargs: Any) -> ActionIndex:
+    """Initialise the global action index (``kwargs`` go to `ActionIndex`), closing the previous one"""
+    global _action_index
+    if _action_index is not None:
+        _action_index.close()
+    _action_index = ActionIndex(path, **kwargs)
+    return _action_index
@@ -0,0 +1,296 @@
+"""
+Cron expressions compiled to bitsets.
+
+`CronExpression` parses standard 5-field expressions (``minute hour
+day-of-month month day-of-week``) and 6-field ones with a leading seconds
+field (``second minute hour ...``, as in Quartz).  Fields accept ``*``,
+``?``, values, ranges (``1-5``), steps (``*/15``, ``10-50/10``, ``5/20``),
+lists (``1,15,30``) and month/weekday names (``JAN``, ``MON-FRI``); day of
+week runs 0-7 with both 0 and 7 meaning Sunday.  The macros ``@yearly``,
+``@annually``, ``@monthly``, ``@weekly``, ``@daily``, ``@midnight`` and
+``@hourly`` are supported.  As in Vixie cron, when both day fields are
+restricted a day matches if either does; when either starts with ``*`` a
+day must match both.
+
+Each field compiles to an integer bitmask, and `CronExpression.next_after`
+finds the next fire time by jumping field by field (month, day, hour,
+minute, second) to the next set bit instead of stepping minute by minute.
+
+With a ``tz`` the expression is evaluated in that zone's wall-clock time:
+
+* a wall time skipped by a DST jump (02:30 on spring-forward day) fires
+  once, shifted forward by the size of the jump (03:30);
+* a wall time that occurs twice when clocks go back fires once, at its
+  first occurrence, for fixed-time jobs.  As in Vixie cron, a job whose
+  second, minute or hour field starts with ``*`` follows elapsed time
+  instead and fires in both passes of the repeated hour (``*/15`` fires
+  at 02:00, ..., 02:45 CEST and again at 02:00, ..., 02:45 CET).
+
+    CronExpression("*/15 9-17 * * MON-FRI").next_after(datetime.now())
+    CronExpression("0 30 2 * * *", tz="Europe/Berlin").next_after(now)
+"""
+
+import calendar
+import functools
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Iterator, Optional, Union
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+_MONTHS = {name: i for i, name in enumerate(
+    ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"), start=1)}
+_WEEKDAYS = {name: i for i, name in enumerate(("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"))}
+
+# (name, low, high, value names) per field, seconds first
+_FIELDS = (
+    ("second", 0, 59, None),
+    ("minute", 0, 59, None),
+    ("hour", 0, 23, None),
+    ("day of month", 1, 31, None),
+    ("month", 1, 12, _MONTHS),
+    ("day of week", 0, 7, _WEEKDAYS),
+)
+
+# Give up on expressions that never fire (e.g. 30 February) after this many years
+_SEARCH_YEARS = 28
+
+
+def _value(token: str, name: str, low: int, high: int, names) -> int:
+    if names and token.upper() in names:
+        return names[token.upper()]
+    try:
+        value = int(token)
+    except ValueError:
+        raise ValueError(f"Invalid {name} value {token!r}") from None
+    if not low <= value <= high:
+        raise ValueError(f"{name} value {value} out of range {low}-{high}")
+    return value
+
+
+def _parse_field(field: str, name: str, low: int, high: int, names) -> int:
+    """Compile one cron field into a bitmask with bit ``n`` set for each allowed value."""
+    mask = 0
+    for part in field.split(","):
+        if not part:
+            raise ValueError(f"Empty entry in {name} field {field!r}")
+        base, _, step_text = part.partition("/")
+        step = 1
+        if step_text:
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ValueError(f"Invalid step {step_text!r} in {name} field")
+            step = int(step_text)
+        if base in ("*", "?"):
+            start, end = low, high
+        elif "-" in base:
+            first, _, last = base.partition("-")
+            start, end = _value(first, name, low, high, names), _value(last, name, low, high, names)
+            if start > end:
+                raise ValueError(f"Range {base!r} in {name} field runs backwards")
+        else:
+            start = _value(base, name, low, high, names)
+            # "5/20" means from 5 to the end of the range in steps of 20
+            end = high if step_text else start
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    return mask
+
+
+def _next_bit(mask: int, start: int, end: int) -> Optional[int]:
+    """Lowest set bit of ``mask`` in ``[start, end]``, or None."""
+    if start > end:
+        return None
+    rest = mask >> start
+    if not rest:
+        return None
+    bit = start + (rest & -rest).bit_length() - 1
+    return bit if bit <= end else None
+
+
+@functools.lru_cache(maxsize=512)
+def _day_mask(days: int, dom_any: bool, weekdays: int, dow_any: bool, year: int, month: int) -> int:
+    """Bitmask of the days of ``year``/``month`` matching the day-of-month/day-of-week fields."""
+    month_days = calendar.monthrange(year, month)[1]
+    valid = (1 << (month_days + 1)) - 2
+    if weekdays == 0x7F:
+        # Every weekday: AND-ed it changes nothing, OR-ed it matches every day
+        return days & valid if dom_any or dow_any else valid
+    # Cron weekday of the 1st, Sunday = 0
+    first = (date(year, month, 1).weekday() + 1) % 7
+    by_weekday = 0
+    for day in range(1, month_days + 1):
+        if weekdays >> ((first + day - 1) % 7) & 1:
+            by_weekday |= 1 << day
+    if dom_any or dow_any:
+        return days & by_weekday
+    return (days & valid) | by_weekday
+
+
+class CronExpression:
+    """A parsed cron expression with bitset fields and fast next-fire search."""
+
+    def __init__(self, expression: str, tz: Optional[Union[str, tzinfo]] = None):
+        self.expression = expression
+        text = MACROS.get(expression.strip().lower(), expression)
+        fields = text.split()
+        if len(fields) == 5:
+            fields = ["0"] + fields
+            self.has_seconds = False
+        elif len(fields) == 6:
+            self.has_seconds = True
+        else:
+            raise ValueError(f"Cron expression must have 5 or 6 fields, got {len(fields)}: {expression!r}")
+        masks = [_parse_field(field, *spec) for field, spec in zip(fields, _FIELDS, strict=True)]
+        self.seconds, self.minutes, self.hours, self.days, self.months, weekdays = masks
+        # 7 is an alias for Sunday
+        self.weekdays = (weekdays | (weekdays >> 7)) & 0x7F
+        # Vixie cron: the day fields are OR-ed only when neither starts with "*"
+        self.dom_any = fields[3][0] in "*?"
+        self.dow_any = fields[5][0] in "*?"
+        # Vixie cron: wildcard second/minute/hour jobs also fire in a repeated hour
+        self.frequent = any(field[0] in "*?" for field in fields[:3])
+        if isinstance(tz, str):
+            if ZoneInfo is None:
+                raise ValueError("Time zones by name need Python 3.9+ (zoneinfo)")
+            tz = ZoneInfo(tz)
+        self.tz: Optional[tzinfo] = tz
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r}, tz={self.tz!r})"
+
+    def matches(self, moment: datetime) -> bool:
+        """Whether ``moment`` (wall-clock time, converted to ``tz`` if aware) is a fire time."""
+        if self.tz is not None and moment.tzinfo is not None:
+            moment = moment.astimezone(self.tz)
+        days = _day_mask(self.days, self.dom_any, self.weekdays, self.dow_any, moment.year, moment.month)
+        return bool(
+            self.months >> moment.month & 1 and days >> moment.day & 1 and self.hours >> moment.hour & 1
+            and self.minutes >> moment.minute & 1 and self.seconds >> moment.second & 1
+        )
+
+    def _advance(self, wall: datetime) -> datetime:
+        """First whole second (or minute, for 5-field expressions) strictly after ``wall``."""
+        wall = wall.replace(microsecond=0, tzinfo=None)
+        if self.has_seconds:
+            return wall + timedelta(seconds=1)
+        return wall.replace(second=0) + timedelta(minutes=1)
+
+    def _next_wall(self, start: datetime) -> Optional[datetime]:
+        """Earliest matching wall-clock time at or after ``start`` (naive)."""
+        year, month, day = start.year, start.month, start.day
+        hour, minute, second = start.hour, start.minute, start.second
+        last_year = year + _SEARCH_YEARS
+        while year <= last_year:
+            found = _next_bit(self.months, month, 12)
+            if found is None:
+                year, month, day, hour, minute, second = year + 1, 1, 1, 0, 0, 0
+                continue
+            if found != month:
+                month, day, hour, minute, second = found, 1, 0, 0, 0
+            days = _day_mask(self.days, self.dom_any, self.weekdays, self.dow_any, year, month)
+            found = _next_bit(days, day, 31)
+            if found is None:
+                month, day, hour, minute, second = month + 1, 1, 0, 0, 0
+                continue
+            if found != day:
+                day, hour, minute, second = found, 0, 0, 0
+            found = _next_bit(self.hours, hour, 23)
+            if found is None:
+                day, hour, minute, second = day + 1, 0, 0, 0
+                continue
+            if found != hour:
+                hour, minute, second = found, 0, 0
+            found = _next_bit(self.minutes, minute, 59)
+            if found is None:
+                hour, minute, second = hour + 1, 0, 0
+                continue
+            if found != minute:
+                minute, second = found, 0
+            found = _next_bit(self.seconds, second, 59)
+            if found is None:
+                minute, second = minute + 1, 0
+                continue
+            return datetime(year, month, day, hour, minute, found)
+        return None
+
+    def _resolve(self, wall: datetime) -> datetime:
+        """The instant a wall-clock time in ``tz`` denotes (see the module docstring for DST)."""
+        first = wall.replace(tzinfo=self.tz, fold=0)
+        # A skipped wall time round-trips to the time shifted by the DST jump
+        return first.astimezone(timezone.utc).astimezone(self.tz)
+
+    def _second_pass(self, wall: datetime) -> Optional[datetime]:
+        """The second occurrence of ``wall`` if clocks go back over it, else None."""
+        first, second = wall.replace(tzinfo=self.tz, fold=0), wall.replace(tzinfo=self.tz, fold=1)
+        # In a spring-forward gap the offsets differ the other way round
+        return second if first.utcoffset() > second.utcoffset() else None
+
+    def _next_repeated(self, after: datetime, before: datetime) -> Optional[datetime]:
+        """The first second-pass fire time in ``(after, before)``; clocks go back in between."""
+        # Second-pass instants after ``after`` have wall times after this
+        start = after.replace(tzinfo=None) - (after.utcoffset() - before.utcoffset())
+        end = before.replace(tzinfo=None)
+        wall = self._next_wall(self._advance(start))
+        while wall is not None and wall < end:
+            moment = self._second_pass(wall)
+            # Compared as instants: same-zone datetimes compare by wall time, ignoring fold
+            if moment is not None and after.timestamp() < moment.timestamp() < before.timestamp():
+                return moment
+            wall = self._next_wall(self._advance(wall))
+        return None
+
+    def next_after(self, after: datetime) -> Optional[datetime]:
+        """The first fire time strictly after ``after``, or None if there is none.
+
+        Without ``tz`` the search runs on naive wall-clock time (an aware
+        ``after`` is converted to local time first) and returns a naive
+        datetime.  With ``tz`` it returns an aware datetime in that zone; a
+        naive ``after`` is taken as local time.
+        """
+        if self.tz is None:
+            if after.tzinfo is not None:
+                after = after.astimezone().replace(tzinfo=None)
+            return self._next_wall(self._advance(after))
+        after = after.astimezone(self.tz)
+        start = self._advance(after)
+        while True:
+            wall = self._next_wall(start)
+            if wall is None:
+                return None
+            moment = self._resolve(wall)
+            # During a repeated hour the first occurrence may already have passed
+            if moment.timestamp() <= after.timestamp() and self.frequent:
+                moment = self._second_pass(wall) or moment
+            if moment.timestamp() > after.timestamp():
+                break
+            start = self._advance(wall)
+        if self.frequent and moment.utcoffset() < after.utcoffset():
+            # Clocks went back before ``moment``: the repeated wall times fire again first
+            return self._next_repeated(after, moment) or moment
+        return moment
+
+    def iter_after(self, after: datetime, count: int) -> Iterator[datetime]:
+        """The next ``count`` fire times after ``after``."""
+        for _ in range(count):
+            after = self.next_after(after)
+            if after is None:
+                return
+            yield after
+
+
+@functools.lru_cache(maxsize=256)
+def compile_cron(expression: str, tz: Optional[str] = None) -> CronExpression:
+    """Parse ``expression`` once and reuse the compiled form."""
+    return CronExpression(expression, tz)
@@ -0,0 +1,461 @@
+"""
+Cross-process event bus for `EventSystem`.
+
+One process (normally the agent core) runs an `EventBusServer` on a local
+Unix domain socket (TCP on localhost on Windows).  Every process that wants
+to share events - the Tk GUI, the web API, the agent core itself - attaches
+an `EventBusBridge` to its own `EventSystem`:
+
+    bridge = EventBusBridge(event_system, name="gui", subscribe=("maverick.#", "system.metrics"))
+    await bridge.start()
+
+Local events matching the bridge's ``publish`` patterns are forwarded to the
+broker, and remote events matching its ``subscribe`` patterns are emitted
+on the local bus.  Events received from the bus are never forwarded back.
+
+Frames are length-prefixed binary: ``!IBB`` (payload length, frame type,
+codec) followed by the payload.  Event payloads carry the topic and origin
+as raw bytes ahead of the encoded data, so the broker routes frames without
+decoding them.  Data is encoded with msgpack when it is installed, JSON
+otherwise.
+
+Filtering happens at the publisher: the broker tells each bridge the union
+of topic patterns the *other* processes subscribed to, and the bridge drops
+events nobody is listening for before they touch the socket.  Bridges
+reconnect with exponential backoff and buffer a bounded number of events
+while disconnected.
+
+A connection must open with a HELLO frame.  Over TCP the server only
+accepts it if it carries the server's random token.  The server picks a
+free port and writes the token to a per-user credentials file in the temp
+directory (`credentials_path`), which bridges read.  The Unix socket is
+only accessible to its owner.  Non-loopback TCP hosts are refused unless
+``allow_remote=True``.
+"""
+
+import asyncio
+import contextvars
+import getpass
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import secrets
+import struct
+import sys
+import tempfile
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from utils.event_system import TopicTrie
+
+Address = Union[str, Tuple[str, int]]
+
+_HEADER = struct.Struct("!IBB")
+_TOPIC = struct.Struct("!HB")
+MAX_FRAME = 16 * 1024 * 1024
+
+FRAME_HELLO = 1
+FRAME_SUBSCRIBE = 2
+FRAME_INTEREST = 3
+FRAME_EVENT = 4
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+
+HELLO_TIMEOUT = 5.0
+
+# Set while a bridge re-emits a remote event, so it is not forwarded back
+_remote_origin: contextvars.ContextVar = contextvars.ContextVar("ultron_event_bus_origin", default=None)
+
+
+def _user_id() -> str:
+    return str(os.getuid()) if hasattr(os, "getuid") else getpass.getuser()
+
+
+def credentials_path() -> str:
+    """Per-user file where a TCP server records its port and token."""
+    return os.path.join(tempfile.gettempdir(), f"ultron-event-bus-{_user_id()}.json")
+
+
+def read_credentials() -> Optional[Dict[str, Any]]:
+    """The running TCP server's ``{"host", "port", "token"}``, if there is one."""
+    try:
+        with open(credentials_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_credentials(credentials: Dict[str, Any]) -> None:
+    path = credentials_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(credentials, f)
+    os.replace(tmp, path)
+
+
+def default_address() -> Address:
+    """Per-user socket path on POSIX; on Windows the running server's localhost port (0: pick one)."""
+    if sys.platform == "win32":
+        credentials = read_credentials() or {}
+        return ("127.0.0.1", int(credentials.get("port", 0)))
+    return os.path.join(tempfile.gettempdir(), f"ultron-event-bus-{_user_id()}.sock")
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_address(address: Optional[Address], allow_remote: bool = False) -> Address:
+    """``None`` -> default, ``"host:port"`` -> TCP, anything else -> Unix socket path.
+
+    TCP hosts other than loopback raise ValueError unless ``allow_remote``.
+    """
+    if address is None:
+        return default_address()
+    if isinstance(address, str):
+        host, sep, port = address.rpartition(":")
+        if not (sep and port.isdigit() and "/" not in address and "\\" not in address):
+            return address
+        address = (host or "127.0.0.1", int(port))
+    if not allow_remote and not _is_loopback(address[0]):
+        raise ValueError(f"Event bus host {address[0]} is not loopback; pass allow_remote=True to expose it")
+    return address
+
+
+def _encode(data: Any, codec: int) -> bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(data, default=str, use_bin_type=True)
+    return json.dumps(data, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(payload: bytes, codec: int) -> Any:
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Received a msgpack frame but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload.decode("utf-8")) if payload else None
+
+
+def encode_frame(frame_type: int, payload: bytes, codec: int = CODEC_JSON) -> bytes:
+    return _HEADER.pack(len(payload), frame_type, codec) + payload
+
+
+def encode_event(topic: str, data: Any, origin: str, codec: int) -> bytes:
+    topic_bytes, origin_bytes = topic.encode("utf-8"), origin.encode("utf-8")[:255]
+    payload = _TOPIC.pack(len(topic_bytes), len(origin_bytes)) + topic_bytes + origin_bytes + _encode(data, codec)
+    return encode_frame(FRAME_EVENT, payload, codec)
+
+
+def event_topic(payload: bytes) -> str:
+    """Topic of an event payload, without decoding the data."""
+    topic_len, _ = _TOPIC.unpack_from(payload)
+    return payload[_TOPIC.size:_TOPIC.size + topic_len].decode("utf-8")
+
+
+def decode_event(payload: bytes, codec: int) -> Tuple[str, str, Any]:
+    topic_len, origin_len = _TOPIC.unpack_from(payload)
+    offset = _TOPIC.size
+    topic = payload[offset:offset + topic_len].decode("utf-8")
+    offset += topic_len
+    origin = payload[offset:offset + origin_len].decode("utf-8")
+    return topic, origin, _decode(payload[offset + origin_len:], codec)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, int, bytes]:
+    length, frame_type, codec = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"Event bus frame too large: {length} bytes")
+    return frame_type, codec, await reader.readexactly(length)
+
+
+def _patterns_trie(patterns: Iterable[str]) -> TopicTrie:
+    trie = TopicTrie()
+    for pattern in patterns:
+        trie.add(pattern)
+    return trie
+
+
+class _Peer:
+    __slots__ = ("name", "writer", "patterns", "trie", "interest", "dropped")
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.name = "?"
+        self.writer = writer
+        self.patterns: List[str] = []
+        self.trie = TopicTrie()
+        self.interest: Optional[List[str]] = None
+        self.dropped = 0
+
+
+class EventBusServer:
+    """Broker that routes event frames between connected processes by topic."""
+
+    def __init__(
+        self,
+        address: Optional[Address] = None,
+        max_client_buffer: int = 8 * 1024 * 1024,
+        token: Optional[str] = None,
+        allow_remote: bool = False,
+    ):
+        self.address = parse_address(address, allow_remote)
+        self.max_client_buffer = max_client_buffer
+        # TCP clients must present this token; a Unix socket is protected by its file mode
+        self.token = token or (secrets.token_urlsafe(32) if isinstance(self.address, tuple) else None)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Dict[asyncio.StreamWriter, _Peer] = {}
+        self.stats = {"connections": 0, "rejected": 0, "routed": 0, "dropped_slow_client": 0}
+
+    async def start(self) -> None:
+        if isinstance(self.address, tuple):
+            self._server = await asyncio.start_server(self._handle, *self.address)
+            # Port 0 means "any free port"; record the real one for the bridges
+            self.address = (self.address[0], self._server.sockets[0].getsockname()[1])
+            _write_credentials({"host": self.address[0], "port": self.address[1], "token": self.token})
+        else:
+            if os.path.exists(self.address):
+                os.unlink(self.address)  # stale socket from a previous run
+            self._server = await asyncio.start_unix_server(self._handle, self.address)
+            os.chmod(self.address, 0o600)
+        logging.info(f"Event bus listening on {self.address}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers.values()):
+                peer.writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        credentials = read_credentials()
+        if isinstance(self.address, tuple) and credentials and credentials.get("token") == self.token:
+            try:
+                os.unlink(credentials_path())
+            except OSError:
+                pass
+
+    @property
+    def clients(self) -> List[str]:
+        return [peer.name for peer in self._peers.values()]
+
+    async def _hello(self, reader: asyncio.StreamReader) -> Optional[str]:
+        """Read the HELLO frame and return the client's name, or None if it is not authorised."""
+        try:
+            frame_type, _, payload = await asyncio.wait_for(read_frame(reader), HELLO_TIMEOUT)
+            hello = _decode(payload, CODEC_JSON) if frame_type == FRAME_HELLO else None
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            return None
+        if not isinstance(hello, dict):
+            return None
+        if self.token is not None and not hmac.compare_digest(str(hello.get("token", "")), self.token):
+            return None
+        return str(hello.get("name", "?"))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        name = await self._hello(reader)
+        if name is None:
+            self.stats["rejected"] += 1
+            logging.warning(f"Event bus rejected a client without a valid HELLO: {writer.get_extra_info('peername')}")
+            writer.close()
+            return
+        peer = self._peers[writer] = _Peer(writer)
+        peer.name = name
+        self.stats["connections"] += 1
+        self._update_interest()
+        try:
+            while True:
+                frame_type, codec, payload = await read_frame(reader)
+                if frame_type == FRAME_EVENT:
+                    self._route(peer, payload, encode_frame(FRAME_EVENT, payload, codec))
+                elif frame_type == FRAME_SUBSCRIBE:
+                    peer.patterns = list(_decode(payload, CODEC_JSON))
+                    peer.trie = _patterns_trie(peer.patterns)
+                    self._update_interest()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logging.error(f"Event bus client {peer.name} failed: {e}")
+        finally:
+            del self._peers[writer]
+            writer.close()
+            self._update_interest()
+
+    def _route(self, sender: _Peer, payload: bytes, frame: bytes) -> None:
+        topic = event_topic(payload)
+        for peer in self._peers.values():
+            if peer is sender or not peer.trie.match(topic):
+                continue
+            transport = peer.writer.transport
+            if transport.get_write_buffer_size() > self.max_client_buffer:
+                # A stalled client must not stall the broker or grow memory without bound
+                peer.dropped += 1
+                self.stats["dropped_slow_client"] += 1
+                continue
+            peer.writer.write(frame)
+            self.stats["routed"] += 1
+
+    def _update_interest(self) -> None:
+        """Send each client the patterns the other clients subscribed to."""
+        for peer in self._peers.values():
+            interest = sorted({p for other in self._peers.values() if other is not peer for p in other.patterns})
+            if interest != peer.interest:
+                peer.interest = interest
+                peer.writer.write(encode_frame(FRAME_INTEREST, _encode(interest, CODEC_JSON)))
+
+
+class EventBusBridge:
+    """Connects a local `EventSystem` to an `EventBusServer`."""
+
+    def __init__(
+        self,
+        event_system,
+        address: Optional[Address] = None,
+        name: Optional[str] = None,
+        publish: Iterable[str] = ("#",),
+        subscribe: Iterable[str] = ("#",),
+        max_buffer: int = 1000,
+        max_write_buffer: int = 8 * 1024 * 1024,
+        reconnect_min: float = 0.1,
+        reconnect_max: float = 5.0,
+        codec: str = "auto",
+        token: Optional[str] = None,
+        allow_remote: bool = False,
+    ):
+        self.event_system = event_system
+        # Without an address the default is resolved on every connect, so a
+        # restarted server on a new port is found again
+        self._default_address = address is None
+        self.address = parse_address(address, allow_remote)
+        self.token = token
+        self.name = name or f"pid{os.getpid()}"
+        self.publish = list(publish)
+        self.subscribe = list(subscribe)
+        self.max_write_buffer = max_write_buffer
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        if codec == "auto":
+            codec = "msgpack" if msgpack is not None else "json"
+        if codec == "msgpack" and msgpack is None:
+            raise ValueError("codec='msgpack' requires the msgpack package")
+        self.codec = CODEC_MSGPACK if codec == "msgpack" else CODEC_JSON
+        self.connected = asyncio.Event()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._remote_interest: Optional[TopicTrie] = None
+        self._buffer: deque = deque(maxlen=max_buffer)
+        self._task: Optional[asyncio.Task] = None
+        self._unsubscribers: List[Any] = []
+        self.stats = {
+            "sent": 0, "received": 0, "filtered": 0, "buffered": 0, "dropped": 0,
+            "dropped_slow_server": 0, "reconnects": 0,
+        }
+
+    async def start(self) -> None:
+        for pattern in self.publish:
+            self._unsubscribers.append(
+                self.event_system.subscribe(pattern, self._on_local_event, inline=True, pass_event=True)
+            )
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        for unsubscribe in self._unsubscribers:
+            unsubscribe()
+        self._unsubscribers = []
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._disconnect()
+
+    def _on_local_event(self, event_name: str, data: Any) -> None:
+        if _remote_origin.get() is not None:
+            return
+        if self._writer is not None and self._remote_interest is not None and not self._remote_interest.match(event_name):
+            self.stats["filtered"] += 1
+            return
+        try:
+            frame = encode_event(event_name, data, self.name, self.codec)
+        except Exception as e:
+            logging.error(f"Event bus could not encode {event_name}: {e}")
+            return
+        if self._writer is None:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.stats["dropped"] += 1
+            self._buffer.append(frame)
+            self.stats["buffered"] += 1
+            return
+        if self._writer.transport.get_write_buffer_size() > self.max_write_buffer:
+            # Same bound as the server's max_client_buffer: a stalled broker must not grow memory
+            self.stats["dropped_slow_server"] += 1
+            return
+        self._writer.write(frame)
+        self.stats["sent"] += 1
+
+    async def _run(self) -> None:
+        delay = self.reconnect_min
+        while True:
+            if self._default_address:
+                self.address = default_address()
+            try:
+                if isinstance(self.address, tuple):
+                    reader, writer = await asyncio.open_connection(*self.address)
+                else:
+                    reader, writer = await asyncio.open_unix_connection(self.address)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_max)
+                continue
+            delay = self.reconnect_min
+            hello = {"name": self.name}
+            if isinstance(self.address, tuple):
+                hello["token"] = self.token or (read_credentials() or {}).get("token", "")
+            writer.write(encode_frame(FRAME_HELLO, _encode(hello, CODEC_JSON)))
+            writer.write(encode_frame(FRAME_SUBSCRIBE, _encode(self.subscribe, CODEC_JSON)))
+            while self._buffer:
+                writer.write(self._buffer.popleft())
+                self.stats["sent"] += 1
+            self._writer = writer
+            self.connected.set()
+            try:
+                await self._read_loop(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            except Exception as e:
+                logging.error(f"Event bus connection error: {e}")
+            self._disconnect()
+            self.stats["reconnects"] += 1
+            logging.warning(f"Event bus connection lost; reconnecting to {self.address}")
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            frame_type, codec, payload = await read_frame(reader)
+            if frame_type == FRAME_INTEREST:
+                self._remote_interest = _patterns_trie(_decode(payload, CODEC_JSON))
+            elif frame_type == FRAME_EVENT:
+                topic, origin, data = decode_event(payload, codec)
+                self.stats["received"] += 1
+                token = _remote_origin.set(origin)
+                try:
+                    self.event_system.emit_nowait(topic, data)
+                finally:
+                    _remote_origin.reset(token)
+
+    def _disconnect(self) -> None:
+        self.connected.clear()
+        self._remote_interest = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
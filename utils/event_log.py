@@ -0,0 +1,351 @@
+"""
+Durable, replayable event log for `EventSystem`.
+
+`EventLog` appends every dispatched event as one JSON line with a
+monotonically increasing sequence number to a `SegmentedLog` (rotated,
+gzip-compressed segments with retention), so a crashed Maverick cycle or
+scheduler run can be reconstructed after a restart.  Sequence numbers
+continue across restarts.  `append` only numbers the event and queues it;
+an `EventLogWriter` thread serializes, writes, rotates and compresses in
+batches, so the emitting event loop never waits on disk.  `read` streams
+events back from a sequence number (after waiting for the queued ones to
+be written), optionally filtered by topic pattern and time range; it finds the
+first segment to open by binary search over the segments' first sequence
+numbers instead of decompressing the whole log.
+
+    log = EventLog("logs/events")
+    events = EventSystem(event_log=log)
+    events.subscribe("maverick.#", on_event, pass_event=True, replay_from=0)
+
+Command line, safe to run while the agent is writing::
+
+    python -m utils.event_log logs/events --event "maverick.*" --since 2025-01-01T12:00
+    python -m utils.event_log logs/events --from-seq 1200 --to-seq 1300 --format text
+    python -m utils.event_log logs/events --stats
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from utils.event_system import TimeBound, TopicTrie, _to_ts
+from utils.log_storage import SegmentedLog
+
+
+class EventLogWriter:
+    """Background thread that writes queued event records to a `SegmentedLog`.
+
+    Records are written in groups: a batch is committed once it holds
+    ``flush_size`` records, once ``flush_interval`` seconds have passed
+    since its first record, on `flush`, and on `close`.  Segment rotation
+    and gzip compression happen here too.
+    """
+
+    _STOP = object()
+
+    def __init__(self, storage: SegmentedLog, stats: Dict[str, Any], flush_size: int = 64,
+                 flush_interval: float = 0.5, max_queue: int = 10000):
+        self.storage = storage
+        self.stats = stats
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="ultron-event-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict[str, Any], timestamp: float) -> bool:
+        """Queue a record for writing; returns False if the queue is full."""
+        try:
+            self._queue.put_nowait((timestamp, record))
+            return True
+        except queue.Full:
+            return False
+
+    @property
+    def queued(self) -> int:
+        """Records waiting to be written."""
+        return self._queue.qsize()
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Block until everything submitted so far is on disk."""
+        if not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self) -> None:
+        batch: List[Tuple[float, Dict[str, Any]]] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._commit(batch)
+                batch = []
+                continue
+            if item is self._STOP:
+                self._commit(batch)
+                return
+            if isinstance(item, threading.Event):
+                self._commit(batch)
+                batch = []
+                item.set()
+                continue
+            batch.append(item)
+            if len(batch) == 1:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.flush_size:
+                self._commit(batch)
+                batch = []
+
+    def _commit(self, batch: List[Tuple[float, Dict[str, Any]]]) -> None:
+        if not batch:
+            return
+        lines = []
+        for _, record in batch:
+            try:
+                lines.append(json.dumps(record, default=str))
+            except ValueError:
+                lines.append(json.dumps({**record, "data": repr(record["data"])}))
+        times = [ts for ts, _ in batch]
+        try:
+            self.storage.write_many(lines, min(times), max(times))
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except OSError as e:
+            self.stats["write_errors"] += 1
+            logging.getLogger(__name__).error(
+                f"Failed to write events {batch[0][1]['seq']}-{batch[-1][1]['seq']} to {self.storage.directory}: {e}"
+            )
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Write the remaining records and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+
+class EventLog:
+    """Append-only event log with sequence numbers on top of `SegmentedLog`."""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        prefix: str = "events",
+        read_only: bool = False,
+        flush_size: int = 64,
+        flush_interval: float = 0.5,
+        max_queue: int = 10000,
+        **storage_kwargs: Any,
+    ):
+        storage_kwargs.setdefault("max_segment_bytes", 4 * 1024 * 1024)
+        self.storage = SegmentedLog(directory, prefix, read_only=read_only, **storage_kwargs)
+        # Only guards sequence numbering; all disk I/O happens on the writer thread
+        self.lock = threading.Lock()
+        # Storage segment number -> sequence number of its first event
+        self._first_seqs: Dict[int, Optional[int]] = {}
+        self.stats = {"appended": 0, "written": 0, "batches": 0, "dropped": 0, "write_errors": 0, "corrupt_lines": 0}
+        self.next_seq = self._recover_next_seq()
+        self.writer: Optional[EventLogWriter] = None
+        if not read_only:
+            self.writer = EventLogWriter(self.storage, self.stats, flush_size, flush_interval, max_queue)
+            atexit.register(self.close)
+
+    def _parse(self, line: str) -> Optional[Dict[str, Any]]:
+        try:
+            record = json.loads(line)
+            record["seq"] = int(record["seq"])
+            return record
+        except (ValueError, KeyError, TypeError):
+            # A torn last write from a crash, or foreign content
+            self.stats["corrupt_lines"] += 1
+            return None
+
+    def _recover_next_seq(self) -> int:
+        for seg in reversed(self.storage.segments_between()):
+            last = None
+            for line in self.storage.segment_lines(seg):
+                record = self._parse(line)
+                if record is not None:
+                    last = record["seq"] if last is None else max(last, record["seq"])
+            if last is not None:
+                return last + 1
+        return 1
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest logged event (0 if none)."""
+        return self.next_seq - 1
+
+    def append(self, event_name: str, data: Any = None, timestamp: Optional[float] = None) -> Optional[int]:
+        """Queue one event for logging and return its sequence number.
+
+        Returns None (and counts a drop) if the writer has fallen
+        ``max_queue`` records behind.
+        """
+        if self.writer is None:
+            raise PermissionError(f"{self.storage.prefix} log was opened read-only")
+        now = time.time() if timestamp is None else timestamp
+        record = {"seq": 0, "timestamp": datetime.fromtimestamp(now).isoformat(), "event": event_name, "data": data}
+        with self.lock:
+            record["seq"] = seq = self.next_seq
+            if not self.writer.submit(record, now):
+                self.stats["dropped"] += 1
+                return None
+            self.next_seq += 1
+            self.stats["appended"] += 1
+            return seq
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Block until every appended event is on disk; False on timeout."""
+        return self.writer.flush(timeout) if self.writer is not None else True
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _first_seq(self, seg: Dict[str, Any]) -> Optional[int]:
+        key = seg["seq"]
+        # A segment's first event never changes; an empty one is only final once compressed
+        if key in self._first_seqs:
+            return self._first_seqs[key]
+        first = None
+        for line in self.storage.segment_lines(seg):
+            record = self._parse(line)
+            if record is not None:
+                first = record["seq"]
+                break
+        if first is not None or seg.get("file", "").endswith(".gz"):
+            self._first_seqs[key] = first
+        return first
+
+    def _segments_from(self, from_seq: int, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop the leading segments that only hold events older than ``from_seq``."""
+        segments = [seg for seg in segments if seg["lines"] != 0 and self._first_seq(seg) is not None]
+        lo, hi = 0, len(segments)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self._first_seq(segments[mid]) <= from_seq:
+                lo = mid
+            else:
+                hi = mid
+        return segments[lo:]
+
+    def read(
+        self,
+        from_seq: int = 0,
+        to_seq: Optional[int] = None,
+        event_name: Optional[str] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield logged events with ``from_seq <= seq <= to_seq``, oldest first.
+
+        ``event_name`` may be an exact name or a wildcard pattern
+        (``maverick.*``, ``voice.#``); ``since``/``until`` take the same
+        values as `EventSystem.get_events`.
+        """
+        start, end = _to_ts(since), _to_ts(until)
+        trie = None
+        if event_name is not None and TopicTrie.is_pattern(event_name):
+            trie = TopicTrie()
+            trie.add(event_name)
+        self.flush()
+        segments = self.storage.segments_between(start, end)
+        count = 0
+        for seg in self._segments_from(from_seq, segments):
+            for line in self.storage.segment_lines(seg):
+                record = self._parse(line)
+                if record is None or record["seq"] < from_seq:
+                    continue
+                if to_seq is not None and record["seq"] > to_seq:
+                    return
+                if event_name is not None and record.get("event") != event_name and not (trie and trie.match(record.get("event", ""))):
+                    continue
+                if start is not None or end is not None:
+                    try:
+                        ts = datetime.fromisoformat(record["timestamp"]).timestamp()
+                    except (KeyError, TypeError, ValueError):
+                        ts = None
+                    if ts is not None and start is not None and ts < start:
+                        continue
+                    if ts is not None and end is not None and ts > end:
+                        continue
+                yield record
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Sequence range, segment count, on-disk size and append/error counters."""
+        segments = self.storage.segments_between()
+        with self.lock:
+            return {
+                **self.stats,
+                "next_seq": self.next_seq,
+                "queued": self.writer.queued if self.writer is not None else 0,
+                "segments": len(segments),
+                "bytes": sum(seg["bytes"] or 0 for seg in segments),
+            }
+
+    def close(self) -> None:
+        """Write the queued events, stop the writer and close the active segment."""
+        if self.writer is not None:
+            self.writer.close()
+            atexit.unregister(self.close)
+        self.storage.close()
+
+
+def _parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Dump or filter a durable Ultron event log")
+    parser.add_argument("directory", help="Event log directory (e.g. logs/events)")
+    parser.add_argument("--prefix", default="events", help="Segment file prefix (default: events)")
+    parser.add_argument("--from-seq", type=int, default=0, help="First sequence number to show")
+    parser.add_argument("--to-seq", type=int, help="Last sequence number to show")
+    parser.add_argument("--event", "-e", help="Event name or pattern, e.g. 'maverick.*' or 'voice.#'")
+    parser.add_argument("--since", type=_parse_time, help="ISO datetime or UNIX timestamp")
+    parser.add_argument("--until", type=_parse_time, help="ISO datetime or UNIX timestamp")
+    parser.add_argument("--limit", "-n", type=int, help="Show at most this many events")
+    parser.add_argument("--format", choices=("json", "text"), default="json", help="Output format (default: json lines)")
+    parser.add_argument("--stats", action="store_true", help="Show sequence range and size instead of events")
+    args = parser.parse_args(argv)
+
+    if not Path(args.directory).is_dir():
+        parser.error(f"{args.directory} is not a directory")
+    log = EventLog(args.directory, args.prefix, read_only=True)
+    if args.stats:
+        print(json.dumps(log.get_stats(), indent=2))
+        return 0
+    records = log.read(args.from_seq, args.to_seq, args.event, args.since, args.until, args.limit)
+    try:
+        for record in records:
+            if args.format == "text":
+                print(f"{record['seq']:>8}  {record.get('timestamp', '')}  {record.get('event')}  {json.dumps(record.get('data'), default=str)}")
+            else:
+                print(json.dumps(record, default=str))
+    except BrokenPipeError:
+        # Output piped into head/less that exited early
+        sys.stderr.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -1,56 +1,875 @@
+"""
+In-process publish/subscribe event bus.
+
+`EventSystem.emit` dispatches an event to all of its subscribers
+concurrently: coroutine handlers are gathered on the event loop and plain
+callables run on a small thread pool, so a slow handler delays neither the
+other subscribers nor (beyond its timeout) the emitter.  Each handler runs
+under its own timeout and error isolation, and per-handler call, error,
+timeout and latency counters are available from `get_metrics`.
+`emit_nowait` schedules an emit without waiting for it, for hot paths;
+from threads without an event loop it is delivered on a background loop
+thread owned by the bus.
+
+History is kept in an `EventHistory` ring buffer with a per-event-name
+index, so `get_events` can answer "the last N ``maverick.error_detected``
+events in the past hour" without scanning or copying the whole history.
+
+Event names are dot-separated topics.  Besides exact names, subscribers may
+use the wildcards ``*`` (exactly one level, ``maverick.*``) and ``#`` (zero
+or more trailing levels, ``voice.#``).  Wildcard patterns live in a
+`TopicTrie`; the patterns matching a given event name are computed once
+and cached, so dispatch cost depends on topic depth, not subscriber count.
+
+With ``queued=True`` the bus decouples producers from handlers: `emit`
+only puts the event on a bounded queue per priority and a few dispatcher
+tasks deliver it.  When a queue is full the overflow policy applies:
+``block`` (backpressure on the emitter), ``drop_oldest``, ``drop_newest``
+or ``coalesce`` (a pending event with the same key is replaced by the new
+one, so pollers only ever have their latest state queued).
+
+State channels (`publish_state`) are for values where only the latest one
+matters (CPU/memory snapshots, audio levels, model status).  Updates to a
+channel within its interval are merged, latest value wins, and subscribers
+and history see at most one event per interval.  `get_state` always
+returns the newest value.
+
+With an ``event_log`` (`utils.event_log.EventLog`) every dispatched event
+is also appended to a durable, sequence-numbered log on disk, and
+``subscribe(..., replay_from=seq)`` lets a late subscriber catch up on the
+logged events before it receives live ones.
+"""
+
 import asyncio
-from typing import Dict, List, Callable, Any
-from datetime import datetime
+import contextvars
+import functools
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Union
+
+_DEFAULT = object()
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest", "coalesce")
+
+TimeBound = Union[None, float, datetime, timedelta]
+
+
+def _to_ts(value: TimeBound) -> Optional[float]:
+    """Convert a bound to a UNIX timestamp; a timedelta means "that long ago"."""
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return time.time() - value.total_seconds()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class EventHistory:
+    """Fixed-capacity ring buffer of event records with a per-event-name index.
+
+    Appending at capacity overwrites the oldest slot in O(1) instead of
+    copying the history.  It behaves like a list for reading (``len``,
+    indexing, slicing, iteration, ``==``).  Time-range queries binary-search
+    the append order, so timestamps are clamped to be non-decreasing.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self._capacity = max(0, capacity)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * self._capacity
+        self._times: List[float] = [0.0] * self._capacity
+        self._first = 0  # sequence number of the oldest retained entry
+        self._next = 0   # sequence number of the next entry
+        self._last_ts = float("-inf")
+        # event name -> [sequence numbers in append order, index of the first live one]
+        self._by_name: Dict[str, List[Any]] = {}
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def resize(self, capacity: int) -> None:
+        """Change the capacity, keeping the most recent entries."""
+        keep = [(self._entries[seq % self._capacity], self._times[seq % self._capacity])
+                for seq in range(self._first, self._next)]
+        self.__init__(capacity)
+        if self._capacity:
+            for entry, ts in keep[max(0, len(keep) - self._capacity):]:
+                self.append(entry, ts)
+
+    def append(self, entry: Dict[str, Any], ts: Optional[float] = None) -> None:
+        if not self._capacity:
+            return
+        if ts is None:
+            try:
+                ts = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            except (KeyError, TypeError, ValueError):
+                ts = time.time()
+        ts = max(ts, self._last_ts)
+        self._last_ts = ts
+        if self._next - self._first == self._capacity:
+            self._evict_oldest()
+        slot = self._next % self._capacity
+        self._entries[slot] = entry
+        self._times[slot] = ts
+        name = entry.get("event") if isinstance(entry, dict) else None
+        index = self._by_name.get(name)
+        if index is None:
+            index = self._by_name[name] = [[], 0]
+        index[0].append(self._next)
+        self._next += 1
+
+    def _evict_oldest(self) -> None:
+        slot = self._first % self._capacity
+        entry = self._entries[slot]
+        name = entry.get("event") if isinstance(entry, dict) else None
+        index = self._by_name[name]
+        index[1] += 1
+        if index[1] == len(index[0]):
+            del self._by_name[name]
+        elif index[1] > 64 and index[1] * 2 > len(index[0]):
+            # Compact the consumed prefix so name indexes stay bounded
+            index[0] = index[0][index[1]:]
+            index[1] = 0
+        self._entries[slot] = None
+        self._first += 1
+
+    def clear(self) -> None:
+        self.__init__(self._capacity)
+
+    def __len__(self) -> int:
+        return self._next - self._first
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for seq in range(self._first, self._next):
+            yield self._entries[seq % self._capacity]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("event history index out of range")
+        return self._entries[(self._first + item) % self._capacity]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (EventHistory, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other, strict=True))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EventHistory({list(self)!r})"
+
+    def names(self) -> Dict[str, int]:
+        """Number of retained events per event name."""
+        return {name: len(index[0]) - index[1] for name, index in self._by_name.items()}
+
+    def query(
+        self,
+        event_name: Optional[str] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Entries matching the name and ``[since, until]`` window, oldest first.
+
+        With ``limit`` only the most recent ``limit`` matches are returned.
+        Uses the name index and binary search, never a full scan.
+        """
+        if event_name is not None:
+            index = self._by_name.get(event_name)
+            if index is None:
+                return []
+            seqs, lo, hi = index[0], index[1], len(index[0])
+            seq_at = seqs.__getitem__
+        else:
+            lo, hi = self._first, self._next
+            seq_at = lambda k: k  # noqa: E731
+        since_ts, until_ts = _to_ts(since), _to_ts(until)
+        if since_ts is not None:
+            lo = self._bisect(seq_at, lo, hi, since_ts, right=False)
+        if until_ts is not None:
+            hi = self._bisect(seq_at, lo, hi, until_ts, right=True)
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return [self._entries[seq_at(k) % self._capacity] for k in range(lo, hi)]
+
+    def _bisect(self, seq_at: Callable[[int], int], lo: int, hi: int, ts: float, right: bool) -> int:
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._times[seq_at(mid) % self._capacity]
+            if value < ts or (right and value == ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class TopicTrie:
+    """Trie of dot-separated wildcard patterns (``*`` = one level, ``#`` = the rest)."""
 
-class EventSystem:
     def __init__(self):
+        self._root: Dict[str, Any] = {"children": {}, "patterns": []}
+        self._cache: Dict[str, tuple] = {}
+        self.max_cache = 4096
+
+    @staticmethod
+    def is_pattern(topic: str) -> bool:
+        return any(level in ("*", "#") for level in topic.split("."))
+
+    def add(self, pattern: str) -> None:
+        levels = pattern.split(".")
+        if "#" in levels[:-1]:
+            raise ValueError(f"'#' must be the last level of a topic pattern: {pattern!r}")
+        node = self._root
+        for level in levels:
+            node = node["children"].setdefault(level, {"children": {}, "patterns": []})
+        if pattern not in node["patterns"]:
+            node["patterns"].append(pattern)
+            self._cache.clear()
+
+    def remove(self, pattern: str) -> None:
+        levels = pattern.split(".")
+        path = [self._root]
+        for level in levels:
+            node = path[-1]["children"].get(level)
+            if node is None:
+                return
+            path.append(node)
+        if pattern in path[-1]["patterns"]:
+            path[-1]["patterns"].remove(pattern)
+            self._cache.clear()
+        # Prune branches left empty
+        for depth in range(len(levels), 0, -1):
+            if path[depth]["children"] or path[depth]["patterns"]:
+                break
+            del path[depth - 1]["children"][levels[depth - 1]]
+
+    def match(self, topic: str) -> tuple:
+        """Patterns matching ``topic``, cached per topic."""
+        cached = self._cache.get(topic)
+        if cached is None:
+            found: List[str] = []
+            self._match(self._root, topic.split("."), 0, found)
+            cached = tuple(found)
+            if len(self._cache) >= self.max_cache:
+                self._cache.clear()
+            self._cache[topic] = cached
+        return cached
+
+    def _match(self, node: Dict[str, Any], levels: List[str], i: int, found: List[str]) -> None:
+        children = node["children"]
+        if "#" in children:
+            found.extend(children["#"]["patterns"])
+        if i == len(levels):
+            found.extend(node["patterns"])
+            return
+        child = children.get(levels[i])
+        if child is not None:
+            self._match(child, levels, i + 1, found)
+        star = children.get("*")
+        if star is not None:
+            self._match(star, levels, i + 1, found)
+
+
+class StateChannel:
+    """Latest-value-wins channel emitted at most once per ``interval`` seconds."""
+
+    __slots__ = ("name", "interval", "value", "updates", "emitted", "last_emit", "scheduled")
+
+    def __init__(self, name: str, interval: float):
+        self.name = name
+        self.interval = interval
+        self.value: Any = None
+        self.updates = 0
+        self.emitted = 0
+        self.last_emit = float("-inf")
+        self.scheduled = False
+
+
+class EventSystem:
+    def __init__(
+        self,
+        handler_timeout: Optional[float] = 10.0,
+        max_workers: int = 4,
+        max_history: int = 1000,
+        queued: bool = False,
+        queue_size: int = 1000,
+        dispatch_workers: int = 2,
+        overflow_policy: str = "block",
+        event_log: Optional[Any] = None,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}")
         self.subscribers: Dict[str, List[Callable]] = {}
-        self.event_history: List[Dict[str, Any]] = []
-        self.max_history = 1000
+        self.event_history = EventHistory(max_history)
+        self.handler_timeout = handler_timeout
+        self.max_workers = max_workers
+        # Per-subscription options keyed by (event name or pattern, callback)
+        self._handler_options: Dict[tuple, Dict[str, Any]] = {}
+        self.topics = TopicTrie()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Delivers emit_nowait calls made while no loop is attached
+        self._background_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background_thread: Optional[threading.Thread] = None
+        self._pending: Set[Any] = set()
+        self._metrics_lock = threading.Lock()
+        self.metrics: Dict[str, Any] = {"events_emitted": 0, "handlers": {}}
+        # Queued mode: one bounded deque per priority, drained by dispatcher tasks
+        self.queued = queued
+        self.queue_size = queue_size
+        self.dispatch_workers = dispatch_workers
+        self.overflow_policy = overflow_policy
+        self._queues = [deque() for _ in (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)]
+        self._queued_by_key: Dict[Any, List[Any]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._worker_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._items_ready: Optional[asyncio.Event] = None
+        self._space_ready: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._unfinished = 0
+        self._wait_samples: deque = deque(maxlen=1024)
+        self.queue_stats = {"enqueued": 0, "dispatched": 0, "coalesced": 0, "blocked": 0,
+                            "dropped_oldest": 0, "dropped_newest": 0, "max_wait_ms": 0.0}
+        self._channels: Dict[str, StateChannel] = {}
+        self._state_lock = threading.Lock()
+        # Held while an event is numbered and its handlers looked up, and while a
+        # replaying subscriber is added or released, so catch-up has neither gaps
+        # nor duplicates.  No disk I/O happens under it.
+        self.event_log = event_log
+        self._log_lock = threading.RLock()
+        # (subscription key, callback) -> live events held back while it replays the log
+        self._catching_up: Dict[tuple, List[tuple]] = {}
 
-    async def emit(self, event_name: str, data: Any = None) -> None:
-        """Emit an event to all subscribers."""
+    async def emit(self, event_name: str, data: Any = None, priority: int = PRIORITY_NORMAL, key: Any = None) -> None:
+        """Emit an event to all subscribers and wait for them (each bounded by its timeout).
+
+        In queued mode the event is only enqueued (``priority`` selects the
+        queue, ``key`` the coalescing key, default the event name) and this
+        returns once it is accepted, dropped or coalesced.
+        """
+        if self.queued:
+            try:
+                await self._enqueue(event_name, data, priority, event_name if key is None else key)
+            except Exception as e:
+                logging.error(f"Error queueing event {event_name}: {e}")
+            return
+        await self._dispatch(event_name, data)
+
+    async def _dispatch(self, event_name: str, data: Any) -> None:
         try:
+            now = datetime.now()
             event_data = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now.isoformat(),
                 'event': event_name,
                 'data': data
             }
-            self.event_history.append(event_data)
-            
-            # Trim history if needed
-            if len(self.event_history) > self.max_history:
-                self.event_history = self.event_history[-self.max_history:]
-            
-            if event_name in self.subscribers:
-                for callback in self.subscribers[event_name]:
-                    try:
-                        if asyncio.iscoroutinefunction(callback):
-                            await callback(data)
-                        else:
-                            callback(data)
-                    except Exception as e:
-                        logging.error(f"Error in event handler for {event_name}: {e} - event_system.py:34")
+            self.event_history.append(event_data, now.timestamp())
+
+            self._loop = asyncio.get_running_loop()
+            with self._metrics_lock:
+                self.metrics["events_emitted"] += 1
+
+            if self.event_log is None:
+                handlers = self._handlers_for(event_name)
+            else:
+                with self._log_lock:
+                    self._append_log(event_name, data, now.timestamp())
+                    handlers = self._handlers_for(event_name)
+                    if self._catching_up:
+                        handlers = self._hold_back(event_name, data, handlers)
+            if len(handlers) == 1:
+                await self._run_handler(event_name, *handlers[0], data)
+            elif handlers:
+                await asyncio.gather(*(self._run_handler(event_name, key, callback, data) for key, callback in handlers))
         except Exception as e:
             logging.error(f"Error emitting event {event_name}: {e} - event_system.py:36")
 
-    def subscribe(self, event_name: str, callback: Callable) -> Callable:
-        """Subscribe to an event."""
-        if event_name not in self.subscribers:
-            self.subscribers[event_name] = []
-        self.subscribers[event_name].append(callback)
-        
+    def _append_log(self, event_name: str, data: Any, ts: float) -> None:
+        try:
+            self.event_log.append(event_name, data, ts)
+        except Exception as e:
+            # A full disk must not stop event delivery
+            logging.error(f"Error logging event {event_name}: {e}")
+
+    def _hold_back(self, event_name: str, data: Any, handlers: List[tuple]) -> List[tuple]:
+        """Buffer the event for subscribers still replaying the log; return the others."""
+        live = []
+        for handler in handlers:
+            held = self._catching_up.get(handler)
+            if held is None:
+                live.append(handler)
+            else:
+                held.append((event_name, data))
+        return live
+
+    def _handlers_for(self, event_name: str) -> List[tuple]:
+        """(subscription key, callback) pairs for an event: exact subscribers, then wildcard ones."""
+        handlers = [(event_name, callback) for callback in self.subscribers.get(event_name, ())]
+        for pattern in self.topics.match(event_name):
+            handlers.extend((pattern, callback) for callback in self.subscribers.get(pattern, ()))
+        return handlers
+
+    # ------------------------------------------------------------------
+    # Queued mode
+    # ------------------------------------------------------------------
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._workers and self._worker_loop is loop:
+            return
+        # (Re)start on this loop; events left from a closed loop are kept
+        self._worker_loop = self._loop = loop
+        self._items_ready = asyncio.Event()
+        self._space_ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        if not self._unfinished:
+            self._idle.set()
+        if any(self._queues):
+            self._items_ready.set()
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.dispatch_workers)]
+
+    async def _enqueue(self, event_name: str, data: Any, priority: int, key: Any) -> None:
+        self._ensure_workers()
+        queue = self._queues[min(max(priority, PRIORITY_HIGH), PRIORITY_LOW)]
+        if self.overflow_policy == "coalesce":
+            pending = self._queued_by_key.get(key)
+            if pending is not None:
+                pending[1] = data
+                self.queue_stats["coalesced"] += 1
+                return
+        while len(queue) >= self.queue_size:
+            if self.overflow_policy == "block":
+                self.queue_stats["blocked"] += 1
+                self._space_ready.clear()
+                await self._space_ready.wait()
+            elif self.overflow_policy == "drop_newest":
+                self.queue_stats["dropped_newest"] += 1
+                return
+            else:
+                dropped = queue.popleft()
+                self._forget(dropped)
+                self._task_done()
+                self.queue_stats["dropped_oldest"] += 1
+        # The emitter's context travels with the event (trace spans, bridge origin)
+        item = [event_name, data, time.perf_counter(), key, contextvars.copy_context()]
+        queue.append(item)
+        if self.overflow_policy == "coalesce":
+            self._queued_by_key[key] = item
+        self._unfinished += 1
+        self._idle.clear()
+        self.queue_stats["enqueued"] += 1
+        self._items_ready.set()
+
+    def _forget(self, item: List[Any]) -> None:
+        if self._queued_by_key.get(item[3]) is item:
+            del self._queued_by_key[item[3]]
+
+    def _task_done(self) -> None:
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._idle.set()
+
+    def _next_item(self) -> Optional[List[Any]]:
+        for queue in self._queues:
+            if queue:
+                item = queue.popleft()
+                self._forget(item)
+                self._space_ready.set()
+                return item
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            item = self._next_item()
+            if item is None:
+                self._items_ready.clear()
+                await self._items_ready.wait()
+                continue
+            event_name, data, enqueued_at, _, context = item
+            wait_ms = (time.perf_counter() - enqueued_at) * 1000
+            self._wait_samples.append(wait_ms)
+            self.queue_stats["max_wait_ms"] = max(self.queue_stats["max_wait_ms"], wait_ms)
+            try:
+                await context.run(asyncio.get_running_loop().create_task, self._dispatch(event_name, data))
+            finally:
+                self.queue_stats["dispatched"] += 1
+                self._task_done()
+
+    async def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued event has been dispatched; False on timeout."""
+        if not self.queued or not self._unfinished:
+            return True
+        self._ensure_workers()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop_workers(self, drain: bool = True, timeout: Optional[float] = 5.0) -> None:
+        """Stop the dispatcher tasks, optionally delivering queued events first."""
+        if drain:
+            await self.join(timeout)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def get_queue_metrics(self) -> Dict[str, Any]:
+        """Queue depth per priority, drop/coalesce counters and queue wait latency."""
+        samples = sorted(self._wait_samples)
+        return {
+            **self.queue_stats,
+            "depth": {"high": len(self._queues[0]), "normal": len(self._queues[1]), "low": len(self._queues[2])},
+            "unfinished": self._unfinished,
+            "avg_wait_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+            "p95_wait_ms": round(samples[max(0, -(-len(samples) * 95 // 100) - 1)], 3) if samples else 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # State channels
+    # ------------------------------------------------------------------
+    def state_channel(self, name: str, interval: float = 0.25) -> StateChannel:
+        """Create (or re-configure) the state channel ``name``."""
+        with self._state_lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                channel = self._channels[name] = StateChannel(name, interval)
+            channel.interval = interval
+            return channel
+
+    def publish_state(self, name: str, value: Any) -> None:
+        """Set the latest value of a state channel; safe to call from any thread.
+
+        After a quiet period the channel is emitted on the next loop
+        iteration; updates arriving until then, or within ``interval`` of
+        the previous emit, are merged into a single emit of the latest value.
+        """
+        with self._state_lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                channel = self._channels[name] = StateChannel(name, 0.25)
+            channel.value = value
+            channel.updates += 1
+            if channel.scheduled:
+                return
+            channel.scheduled = True
+            delay = max(0.0, channel.last_emit + channel.interval - time.monotonic())
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = self._loop if self._loop is not None and self._loop.is_running() else None
+            if loop is None:
+                # No loop to deliver on yet; the value stays readable via get_state
+                with self._state_lock:
+                    channel.scheduled = False
+                return
+            loop.call_soon_threadsafe(loop.call_later, delay, self._flush_state, channel)
+            return
+        self._loop = loop
+        loop.call_later(delay, self._flush_state, channel)
+
+    def _flush_state(self, channel: StateChannel) -> None:
+        with self._state_lock:
+            value = channel.value
+            channel.scheduled = False
+            channel.last_emit = time.monotonic()
+            channel.emitted += 1
+        self.emit_nowait(channel.name, value)
+
+    def get_state(self, name: str, default: Any = None) -> Any:
+        """Latest value published to a state channel, whether or not it was emitted yet."""
+        with self._state_lock:
+            channel = self._channels.get(name)
+            return channel.value if channel is not None and channel.updates else default
+
+    def get_state_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Updates received vs. events emitted per state channel."""
+        with self._state_lock:
+            return {
+                name: {"interval": c.interval, "updates": c.updates, "emitted": c.emitted,
+                       "coalesced": c.updates - c.emitted - (1 if c.scheduled else 0)}
+                for name, c in self._channels.items()
+            }
+
+    async def _run_handler(self, event_name: str, key: str, callback: Callable, data: Any) -> None:
+        """Run one subscriber with its timeout; never raises."""
+        options = self._handler_options.get((key, callback), {})
+        timeout = options.get("timeout", _DEFAULT)
+        if timeout is _DEFAULT:
+            timeout = self.handler_timeout
+        args = (event_name, data) if options.get("pass_event") else (data,)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            if asyncio.iscoroutinefunction(callback):
+                await asyncio.wait_for(callback(*args), timeout)
+            elif options.get("inline"):
+                callback(*args)
+            else:
+                # Copy the context so the handler sees the emitter's trace span
+                context = contextvars.copy_context()
+                future = asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), functools.partial(context.run, callback, *args)
+                )
+                await asyncio.wait_for(future, timeout)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logging.error(f"Event handler {_handler_name(callback)} for {event_name} timed out after {timeout}s")
+        except Exception as e:
+            outcome = "error"
+            logging.error(f"Error in event handler for {event_name}: {e} - event_system.py:34")
+        finally:
+            self._record(callback, outcome, (time.perf_counter() - start) * 1000)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="event-handler")
+            return self._executor
+
+    def _record(self, callback: Callable, outcome: str, duration_ms: float) -> None:
+        name = _handler_name(callback)
+        with self._metrics_lock:
+            stats = self.metrics["handlers"].get(name)
+            if stats is None:
+                stats = self.metrics["handlers"][name] = {
+                    "calls": 0, "errors": 0, "timeouts": 0, "cancelled": 0, "total_ms": 0.0, "max_ms": 0.0
+                }
+            stats["calls"] += 1
+            if outcome == "error":
+                stats["errors"] += 1
+            elif outcome == "timeout":
+                stats["timeouts"] += 1
+            elif outcome == "cancelled":
+                stats["cancelled"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+    def emit_nowait(self, event_name: str, data: Any = None, priority: int = PRIORITY_NORMAL, key: Any = None) -> None:
+        """Fire-and-forget emit: schedule the event and return immediately.
+
+        Inside a running event loop this creates a task; from another thread
+        it is handed to the loop the bus last emitted on, or failing that to
+        the bus's background loop thread.  Use `drain` (or ``shutdown(wait=True)``)
+        to wait for scheduled emits.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            loop = self._loop
+            if loop is None or not loop.is_running():
+                loop = self._get_background_loop()
+            task = asyncio.run_coroutine_threadsafe(self.emit(event_name, data, priority, key), loop)
+        else:
+            task = loop.create_task(self.emit(event_name, data, priority, key))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _get_background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._executor_lock:
+            if self._background_loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="event-bus-loop", daemon=True)
+                thread.start()
+                self._background_loop, self._background_thread = loop, thread
+            return self._background_loop
+
+    async def _finish_background(self) -> None:
+        # Runs on the background loop: wait for the emits handed to it
+        current = asyncio.current_task()
+        tasks = [t for t in asyncio.all_tasks() if t is not current and t not in self._workers]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._worker_loop is asyncio.get_running_loop():
+            await self.stop_workers()
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Wait until emits scheduled with `emit_nowait` from this loop (and queued events) have finished."""
+        loop = asyncio.get_running_loop()
+        pending = []
+        for task in list(self._pending):
+            if isinstance(task, asyncio.Task):
+                if task.get_loop() is loop:
+                    pending.append(task)
+            else:
+                pending.append(asyncio.wrap_future(task))
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        await self.join(timeout)
+
+    def subscribe(
+        self,
+        event_name: str,
+        callback: Callable,
+        timeout: Any = _DEFAULT,
+        inline: bool = False,
+        pass_event: bool = False,
+        replay_from: Optional[int] = None,
+    ) -> Callable:
+        """Subscribe to an event name or a wildcard topic pattern (``maverick.*``, ``voice.#``).
+
+        ``timeout`` overrides the bus-wide ``handler_timeout`` for this
+        handler (``None`` disables it).  ``inline=True`` runs a plain callable
+        on the event loop instead of the thread pool, for cheap handlers that
+        must not run concurrently with the emitter.  With ``pass_event=True``
+        the handler is called as ``callback(event_name, data)``, which
+        wildcard subscribers usually want.
+
+        With ``replay_from`` (a sequence number, needs an ``event_log``) the
+        logged events matching ``event_name`` from that number on are first
+        passed to ``callback`` in the calling thread, then it receives live
+        events; each event is delivered exactly once, in order.  Events
+        emitted while the log is being read are held back and passed on
+        once replay is done.  Replay only supports plain callables.
+        """
+        if replay_from is not None:
+            if self.event_log is None:
+                raise ValueError("replay_from requires an event_log")
+            if asyncio.iscoroutinefunction(callback):
+                raise TypeError("replay_from only supports plain callables")
+        options = {}
+        if timeout is not _DEFAULT:
+            options["timeout"] = timeout
+        if inline:
+            options["inline"] = True
+        if pass_event:
+            options["pass_event"] = True
+        if options:
+            self._handler_options[(event_name, callback)] = options
+        with self._log_lock:
+            if replay_from is not None:
+                replay_to = self.event_log.last_seq
+                held = self._catching_up[(event_name, callback)] = []
+            if TopicTrie.is_pattern(event_name):
+                self.topics.add(event_name)
+            if event_name not in self.subscribers:
+                self.subscribers[event_name] = []
+            self.subscribers[event_name].append(callback)
+        if replay_from is not None:
+            try:
+                self._replay(event_name, callback, replay_from, replay_to, pass_event)
+            finally:
+                with self._log_lock:
+                    for name, data in held:
+                        self._deliver_replayed(callback, name, data, pass_event)
+                    del self._catching_up[(event_name, callback)]
+
         def unsubscribe():
             if event_name in self.subscribers and callback in self.subscribers[event_name]:
                 self.subscribers[event_name].remove(callback)
-        
+                if callback not in self.subscribers[event_name]:
+                    self._handler_options.pop((event_name, callback), None)
+                if not self.subscribers[event_name] and TopicTrie.is_pattern(event_name):
+                    self.topics.remove(event_name)
+
         return unsubscribe
 
-    def get_recent_events(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get recent events from history."""
-        return self.event_history[-limit:]
+    def _replay(self, event_name: str, callback: Callable, from_seq: int, to_seq: int, pass_event: bool) -> None:
+        replayed = 0
+        for record in self.event_log.read(from_seq, to_seq, event_name=event_name):
+            if self._deliver_replayed(callback, record["event"], record["data"], pass_event, record["seq"]):
+                replayed += 1
+        logging.debug(f"Replayed {replayed} logged events for {event_name} from seq {from_seq} to {to_seq}")
+
+    def _deliver_replayed(self, callback: Callable, event_name: str, data: Any, pass_event: bool,
+                          seq: Optional[int] = None) -> bool:
+        try:
+            if pass_event:
+                callback(event_name, data)
+            else:
+                callback(data)
+            return True
+        except Exception as e:
+            logging.error(f"Error replaying event {event_name if seq is None else seq} to {_handler_name(callback)}: {e}")
+            return False
+
+    @property
+    def max_history(self) -> int:
+        return self.event_history.capacity
+
+    @max_history.setter
+    def max_history(self, value: int) -> None:
+        self.event_history.resize(value)
+
+    def get_recent_events(self, limit: int = 100, event_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get recent events from history, optionally only those named ``event_name``."""
+        return self.event_history.query(event_name, limit=limit)
+
+    def get_events(
+        self,
+        event_name: Optional[str] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Events from history by name and time range, oldest first.
+
+        ``since``/``until`` take a datetime, a UNIX timestamp or a timedelta
+        meaning "that long ago", e.g. ``get_events("error", since=timedelta(hours=1))``.
+        """
+        return self.event_history.query(event_name, since, until, limit)
+
+    def get_event_counts(self) -> Dict[str, int]:
+        """Number of events per name currently held in history."""
+        return self.event_history.names()
 
     def clear_history(self) -> None:
         """Clear event history."""
-        self.event_history = []
+        self.event_history.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Events emitted and per-handler calls, errors, timeouts and latency."""
+        with self._metrics_lock:
+            handlers = {
+                name: {**stats, "avg_ms": round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0}
+                for name, stats in self.metrics["handlers"].items()
+            }
+            metrics = {"events_emitted": self.metrics["events_emitted"], "pending": len(self._pending), "handlers": handlers}
+        if self.queued:
+            metrics["queue"] = self.get_queue_metrics()
+        if self._channels:
+            metrics["state_channels"] = self.get_state_metrics()
+        if self.event_log is not None:
+            metrics["event_log"] = self.event_log.get_stats()
+        return metrics
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the background emit loop and the handler thread pool.
+
+        With ``wait`` the emits already handed to the background loop are
+        delivered first.
+        """
+        with self._executor_lock:
+            loop, thread = self._background_loop, self._background_thread
+            self._background_loop = self._background_thread = None
+        if loop is not None:
+            if wait:
+                asyncio.run_coroutine_threadsafe(self._finish_background(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+def _handler_name(callback: Callable) -> str:
+    name = getattr(callback, "__qualname__", None)
+    return name if isinstance(name, str) else repr(callback)
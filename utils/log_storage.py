@@ -0,0 +1,314 @@
+"""
+Segmented log storage with rotation, gzip compression and retention.
+
+A `SegmentedLog` appends lines to an active segment file.  When the segment
+reaches ``max_segment_bytes`` or ``max_segment_age`` seconds it is closed,
+gzip-compressed (streamed, never read into memory) and recorded in a
+``<prefix>.index.json`` file together with the time range it covers.
+Retention drops the oldest closed segments by age and by total size.
+Time-window reads consult the index and open only the overlapping segments.
+With ``read_only=True`` a log can be inspected (e.g. by a CLI) while another
+process is still writing to it: nothing is created, compressed or deleted.
+
+`SegmentedLogHandler` puts a standard ``logging`` handler on top of it so
+text logs such as ``ultron_agent_core.log`` stop growing without bound.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+_SEGMENT_RE = r"^{prefix}-(\d+)-(\d+)\.log(\.gz)?$"
+
+
+class SegmentedLog:
+    """Append-only line log split into rotated, compressed segments."""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        prefix: str,
+        max_segment_bytes: int = 8 * 1024 * 1024,
+        max_segment_age: Optional[float] = 3600.0,
+        retention_seconds: Optional[float] = 7 * 24 * 3600.0,
+        max_total_bytes: Optional[int] = 256 * 1024 * 1024,
+        compress: bool = True,
+        read_only: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.read_only = read_only
+        if not read_only:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.retention_seconds = retention_seconds
+        self.max_total_bytes = max_total_bytes
+        self.compress = compress
+        self.index_file = self.directory / f"{prefix}.index.json"
+        self.lock = threading.RLock()
+        self.stats = {"rotations": 0, "segments_removed": 0, "bytes_removed": 0, "bytes_compressed_saved": 0}
+        self.segments: List[Dict[str, Any]] = self._load_index()
+        self._seq = max((seg["seq"] for seg in self.segments), default=0)
+        self._active = None
+        self._active_info: Optional[Dict[str, Any]] = None
+        if read_only:
+            self._recover_orphans(finish=False)
+            return
+        if self._recover_orphans():
+            self._save_index()
+        self._open_segment()
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+    def _load_index(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                segments = json.load(f)
+            return [seg for seg in segments if (self.directory / seg["file"]).exists()]
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logging.error(f"Failed to load log index {self.index_file}: {e}")
+            return []
+
+    def _save_index(self) -> None:
+        tmp = self.index_file.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.segments, f, indent=1)
+        os.replace(tmp, self.index_file)
+
+    def _recover_orphans(self, finish: bool = True) -> int:
+        """Close and index segment files left behind by a crashed process.
+
+        With ``finish=False`` (read-only mode) they are only listed, which
+        also picks up the segment a live writer currently has open.
+        """
+        recovered = 0
+        pattern = re.compile(_SEGMENT_RE.format(prefix=re.escape(self.prefix)))
+        indexed = {seg["file"] for seg in self.segments}
+        if not self.directory.is_dir():
+            return 0
+        for path in sorted(self.directory.iterdir()):
+            match = pattern.match(path.name)
+            if not match or path.name in indexed:
+                continue
+            seq = int(match.group(2))
+            self._seq = max(self._seq, seq)
+            info = {
+                "file": path.name,
+                "seq": seq,
+                "start": int(match.group(1)) / 1000.0,
+                "end": path.stat().st_mtime,
+                "lines": None,
+                "bytes": path.stat().st_size,
+            }
+            self.segments.append(self._finish(info) if finish and not match.group(3) else info)
+            recovered += 1
+        self.segments.sort(key=lambda seg: seg["seq"])
+        return recovered
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _open_segment(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self._seq += 1
+        name = f"{self.prefix}-{int(now * 1000)}-{self._seq}.log"
+        self._active = open(self.directory / name, "a", encoding="utf-8")
+        self._active_info = {"file": name, "seq": self._seq, "start": now, "end": now, "lines": 0, "bytes": 0}
+
+    def write(self, line: str, timestamp: Optional[float] = None) -> None:
+        """Append one line (a trailing newline is added if missing)."""
+        self.write_many([line], timestamp)
+
+    def write_many(self, lines: Iterable[str], timestamp: Optional[float] = None, end: Optional[float] = None) -> None:
+        """Append several lines in one write; ``timestamp``..``end`` is the time range they cover."""
+        if self.read_only:
+            raise PermissionError(f"{self.prefix} log was opened read-only")
+        now = time.time() if timestamp is None else timestamp
+        end = now if end is None else max(now, end)
+        data = "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+        if not data:
+            return
+        with self.lock:
+            if self._should_rotate(now):
+                self.rotate(now)
+            self._active.write(data)
+            self._active.flush()
+            info = self._active_info
+            if not info["lines"]:
+                info["start"] = info["end"] = now
+            info["lines"] += data.count("\n")
+            info["bytes"] += len(data.encode("utf-8"))
+            info["start"] = min(info["start"], now)
+            info["end"] = max(info["end"], end)
+
+    def _should_rotate(self, now: float) -> bool:
+        info = self._active_info
+        if not info["lines"]:
+            return False
+        if info["bytes"] >= self.max_segment_bytes:
+            return True
+        return self.max_segment_age is not None and now - info["start"] >= self.max_segment_age
+
+    def rotate(self, now: Optional[float] = None) -> None:
+        """Close the active segment, compress it and start a new one."""
+        if self.read_only:
+            raise PermissionError(f"{self.prefix} log was opened read-only")
+        with self.lock:
+            self._active.close()
+            info = self._active_info
+            if info["lines"]:
+                self.segments.append(self._finish(info))
+                self.stats["rotations"] += 1
+            else:
+                (self.directory / info["file"]).unlink(missing_ok=True)
+            self.apply_retention(now)
+            self._save_index()
+            self._open_segment(now)
+
+    def _finish(self, info: Dict[str, Any]) -> Dict[str, Any]:
+        """Compress a closed segment file, streaming it through gzip."""
+        if not self.compress:
+            return info
+        source = self.directory / info["file"]
+        target = source.with_name(source.name + ".gz")
+        try:
+            with open(source, "rb") as src, gzip.open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.utime(target, (info["end"], info["end"]))
+            source.unlink()
+        except OSError as e:
+            logging.error(f"Failed to compress log segment {source}: {e}")
+            return info
+        compressed = target.stat().st_size
+        self.stats["bytes_compressed_saved"] += max(0, info["bytes"] - compressed)
+        return {**info, "file": target.name, "bytes": compressed, "raw_bytes": info["bytes"]}
+
+    def apply_retention(self, now: Optional[float] = None) -> List[str]:
+        """Delete closed segments older than the retention window or beyond the size budget."""
+        if self.read_only:
+            return []
+        now = time.time() if now is None else now
+        with self.lock:
+            removed: List[Dict[str, Any]] = []
+            if self.retention_seconds is not None:
+                cutoff = now - self.retention_seconds
+                while self.segments and self.segments[0]["end"] < cutoff:
+                    removed.append(self.segments.pop(0))
+            if self.max_total_bytes is not None:
+                closed_bytes = sum(seg["bytes"] for seg in self.segments)
+                while self.segments and closed_bytes > self.max_total_bytes:
+                    removed.append(self.segments.pop(0))
+                    closed_bytes -= removed[-1]["bytes"]
+            for seg in removed:
+                (self.directory / seg["file"]).unlink(missing_ok=True)
+                self.stats["segments_removed"] += 1
+                self.stats["bytes_removed"] += seg["bytes"]
+            return [seg["file"] for seg in removed]
+
+    def current_segment(self) -> Optional[Path]:
+        """Path of the segment being written, or None once the log is closed."""
+        with self.lock:
+            if self._active is None or self._active.closed:
+                return None
+            return self.directory / self._active_info["file"]
+
+    def total_bytes(self) -> int:
+        """On-disk size of all closed segments plus the active one."""
+        active = self._active_info["bytes"] if self._active_info is not None else 0
+        return sum(seg["bytes"] for seg in self.segments) + active
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def segments_between(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Index entries (including the active segment) whose time range overlaps ``[start, end]``."""
+        with self.lock:
+            candidates = self.segments + ([dict(self._active_info)] if self._active_info is not None else [])
+        return [
+            seg for seg in candidates
+            if (start is None or seg["end"] >= start) and (end is None or seg["start"] <= end)
+        ]
+
+    def read_lines(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        timestamp_of: Optional[Callable[[str], Optional[float]]] = None,
+    ) -> Iterator[str]:
+        """Yield lines from the segments covering ``[start, end]``, oldest first.
+
+        With ``timestamp_of`` the individual lines are filtered to the
+        window as well; otherwise whole overlapping segments are returned.
+        """
+        with self.lock:
+            if self._active is not None:
+                self._active.flush()
+        for seg in self.segments_between(start, end):
+            for line in self.segment_lines(seg):
+                if timestamp_of is not None:
+                    ts = timestamp_of(line)
+                    if ts is not None and ((start is not None and ts < start) or (end is not None and ts > end)):
+                        continue
+                yield line
+
+    def segment_lines(self, seg: Dict[str, Any]) -> Iterator[str]:
+        """Yield the lines of one segment (an index entry), decompressing if needed."""
+        path = self.directory / seg["file"]
+        opener = gzip.open if path.suffix == ".gz" else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield line.rstrip("\n")
+        except FileNotFoundError:
+            return
+
+    def close(self) -> None:
+        """Close the active segment and persist the index."""
+        with self.lock:
+            if self._active is None or self._active.closed:
+                return
+            self._active.close()
+            info = self._active_info
+            if info["lines"]:
+                self.segments.append(self._finish(info))
+            else:
+                (self.directory / info["file"]).unlink(missing_ok=True)
+            self._save_index()
+
+
+def json_timestamp(line: str, field: str = "timestamp") -> Optional[float]:
+    """Extract an ISO-8601 ``field`` from a JSON line as a UNIX timestamp."""
+    try:
+        return datetime.fromisoformat(json.loads(line)[field]).timestamp()
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class SegmentedLogHandler(logging.Handler):
+    """``logging`` handler that writes formatted records into a `SegmentedLog`."""
+
+    def __init__(self, directory: Union[str, Path], prefix: str, level: int = logging.NOTSET, **kwargs):
+        super().__init__(level)
+        self.storage = SegmentedLog(directory, prefix, **kwargs)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.storage.write(self.format(record), record.created)
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.storage.close()
+        super().close()
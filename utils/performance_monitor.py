@@ -6,7 +6,8 @@ from typing import Dict, List, Optional
 import asyncio
 
 class PerformanceMonitor:
-    def __init__(self):
+    def __init__(self, event_system=None):
+        self.event_system = event_system
         self.metrics_history: List[Dict] = []
         self.max_history = 3600  # 1 hour of metrics at 1-second intervals
         self.monitoring = False
@@ -58,6 +59,10 @@ class PerformanceMonitor:
                 if len(self.metrics_history) > self.max_history:
                     self.metrics_history = self.metrics_history[-self.max_history:]
 
+                # Latest-value state channel: GUI/WebSocket subscribers get at most one update per interval
+                if self.event_system is not None:
+                    self.event_system.publish_state("system.metrics", metrics)
+
                 await asyncio.sleep(1)
         except Exception as e:
             logging.error(f"Error collecting performance metrics: {e}")
@@ -1,53 +1,356 @@
+"""
+Scheduled task runner.
+
+Due times live in a min-heap keyed on ``next_run``, so the scheduler loop
+sleeps exactly until the next task is due (or until a task is added or
+changed) instead of polling every task once a second.  Changing, disabling
+or deleting a task does not search the heap: the task's version number is
+bumped and its old heap entries are skipped when they surface (lazy
+deletion).
+
+Due tasks are handed to a bounded pool of worker coroutines
+(``max_concurrency``), so a slow ``maverick_analysis`` run no longer holds
+up ``health_check``.  A task never overlaps with itself: it is re-armed
+only after its run finishes, and a trigger while it is queued or running is
+skipped.  Each run is bounded by the task's ``timeout`` (or
+``default_timeout``) and can be cancelled with `cancel_run`;
+`get_scheduler_metrics` separates time spent waiting for a worker from
+time spent executing.
+
+State is kept in SQLite (`TaskStore`): one row per task plus bounded
+execution/error history rows.  Changed tasks are tracked as dirty, so a run
+writes only its own task row and history entries in one small transaction
+instead of rewriting every task.  A legacy ``scheduled_tasks.json`` next to
+the database is imported on first start.
+
+``{"type": "cron", "cron": "*/15 9-17 * * MON-FRI", "timezone": "Europe/Berlin"}``
+schedules use the full cron engine in `utils.cron`.
+
+Each task picks an execution ``mode``:
+
+* ``inline`` (default): the command handler (or target) runs on the event
+  loop, as before.
+* ``thread``: a synchronous handler or target runs in a thread pool, so
+  blocking I/O does not stall the loop.  A timed-out thread cannot be
+  stopped; its result is discarded, and the task is not run again until the
+  thread has returned.
+* ``process``: a ``"module:function"`` target with JSON-serializable
+  ``args``/``kwargs`` runs in a `ProcessPoolExecutor`, for CPU-bound work
+  such as analysis passes.  A run can set an address-space limit
+  (``memory_limit_mb``) for its worker; this needs the ``resource`` module,
+  so on Windows a task with a memory limit is rejected.  Its pickled result
+  is capped at ``max_result_bytes``.  A worker that crashes (segfault, OOM kill,
+  ``os._exit``) fails only that run and the pool is recreated.  A run with
+  a timeout gets its own single-worker executor, so a timeout or
+  `cancel_run` kills only that run's worker.  Cancelling a run without a
+  timeout kills the shared pool's workers, which also fails any other
+  untimed process run in flight.
+
+    scheduler.schedule_task("event_log_stats", "event log stats", {"type": "daily", "time": {"hour": 2}},
+                            mode="process", target="utils.event_log:main", args=[["logs/events", "--stats"]],
+                            memory_limit_mb=512, timeout=60)
+"""
+
 import asyncio
+import calendar
+import functools
+import heapq
+import importlib
+import inspect
+import itertools
+import math
+import multiprocessing
+import pickle
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Dict, List, Callable, Optional, Any
+from typing import Dict, List, Callable, Optional, Any, Iterable, Tuple, Union
 import logging
 import json
 from pathlib import Path
 
+from utils.cron import compile_cron
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+# Task fields that live in the history table rather than in the task row
+_HISTORY_KINDS = {'execution_history': 'execution', 'error_history': 'error'}
+
+EXECUTION_MODES = ("inline", "thread", "process")
+# Default cap on the pickled result of a process-mode run
+DEFAULT_MAX_RESULT_BYTES = 1024 * 1024
+
+
+class TaskResultTooLarge(Exception):
+    """A process-mode run returned more than ``max_result_bytes`` of pickled data."""
+
+
+def resolve_target(target: str) -> Callable:
+    """Import the callable named by ``"package.module:function"`` (``module:Class.method`` works too)."""
+    module_name, sep, attr = target.partition(":")
+    if not sep or not module_name or not attr:
+        raise ValueError(f"Target must look like 'module:function', got {target!r}")
+    obj = importlib.import_module(module_name)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    if not callable(obj):
+        raise ValueError(f"Target {target!r} is not callable")
+    return obj
+
+
+def _set_memory_limit(limit_mb: Optional[float]):
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = hard
+    if limit_mb:
+        soft = int(limit_mb * 1024 * 1024)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _process_entry(spec: Dict[str, Any]) -> bytes:
+    """Process-pool entry point: apply limits, run the target, return its pickled result."""
+    # Workers are reused, so every run sets (or lifts) the limit
+    _set_memory_limit(spec.get('memory_limit_mb'))
+    result = resolve_target(spec['target'])(*spec['args'], **spec['kwargs'])
+    if inspect.iscoroutine(result):
+        result = asyncio.run(result)
+    payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    limit = spec.get('max_result_bytes')
+    # Checked here so an oversized result never crosses the pipe
+    if limit is not None and len(payload) > limit:
+        raise TaskResultTooLarge(f"Result of {len(payload)} bytes exceeds the {limit} byte limit")
+    return payload
+
+
+class TaskStore:
+    """SQLite store of scheduler state: a row per task and bounded history rows."""
+
+    def __init__(self, path: Union[str, Path], history_limit: int = 10):
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.history_limit = history_limit
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self.stats = {"transactions": 0, "task_rows_written": 0, "history_rows_written": 0}
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS tasks (task_id TEXT PRIMARY KEY, state TEXT NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY, task_id TEXT NOT NULL, kind TEXT NOT NULL, entry TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_task ON history (task_id, kind, id)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._db.commit()
+
+    @staticmethod
+    def _encode(task: Dict) -> str:
+        state = {k: v for k, v in task.items() if k not in _HISTORY_KINDS}
+        if state.get('next_run'):
+            state['next_run'] = state['next_run'].isoformat()
+        return json.dumps(state, default=str)
+
+    def load(self) -> Dict[str, Dict]:
+        """All tasks, with ``next_run`` as datetime and their history lists attached."""
+        tasks: Dict[str, Dict] = {}
+        with self._lock:
+            rows = self._db.execute("SELECT task_id, state FROM tasks").fetchall()
+            history = self._db.execute("SELECT task_id, kind, entry FROM history ORDER BY id").fetchall()
+        for task_id, state in rows:
+            try:
+                task = json.loads(state)
+                if task.get('next_run'):
+                    task['next_run'] = datetime.fromisoformat(task['next_run'])
+                tasks[task_id] = task
+            except (ValueError, TypeError) as e:
+                logging.error(f"Skipping unreadable task {task_id}: {e}")
+        fields = {kind: field for field, kind in _HISTORY_KINDS.items()}
+        for task_id, kind, entry in history:
+            if task_id in tasks and kind in fields:
+                tasks[task_id].setdefault(fields[kind], []).append(json.loads(entry))
+        return tasks
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def write(
+        self,
+        tasks: Dict[str, Dict],
+        dirty: Iterable[str] = (),
+        deleted: Iterable[str] = (),
+        history: Iterable[Tuple[str, str, Dict]] = (),
+    ) -> None:
+        """Upsert the ``dirty`` task rows, drop ``deleted`` ones and append history, in one transaction."""
+        rows = [(task_id, self._encode(tasks[task_id])) for task_id in dirty if task_id in tasks]
+        deleted = [(task_id,) for task_id in deleted]
+        gone = {row[0] for row in deleted}
+        history = [
+            (task_id, kind, json.dumps(entry, default=str)) for task_id, kind, entry in history if task_id not in gone
+        ]
+        if not (rows or deleted or history):
+            return
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO tasks (task_id, state) VALUES (?, ?)", rows)
+                self._db.executemany("DELETE FROM tasks WHERE task_id = ?", deleted)
+                self._db.executemany("DELETE FROM history WHERE task_id = ?", deleted)
+                self._db.executemany("INSERT INTO history (task_id, kind, entry) VALUES (?, ?, ?)", history)
+                for task_id, kind in {(row[0], row[1]) for row in history}:
+                    self._db.execute(
+                        "DELETE FROM history WHERE task_id = ? AND kind = ? AND id <= "
+                        "(SELECT id FROM history WHERE task_id = ? AND kind = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (task_id, kind, task_id, kind, self.history_limit),
+                    )
+            self.stats["transactions"] += 1
+            self.stats["task_rows_written"] += len(rows)
+            self.stats["history_rows_written"] += len(history)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
 class TaskScheduler:
-    def __init__(self, save_file: str = "scheduled_tasks.json"):
+    def __init__(
+        self,
+        save_file: str = "scheduled_tasks.db",
+        max_sleep: float = 300.0,
+        max_concurrency: int = 4,
+        default_timeout: Optional[float] = None,
+        stop_timeout: float = 10.0,
+        process_workers: int = 2,
+        max_result_bytes: Optional[int] = DEFAULT_MAX_RESULT_BYTES,
+        process_start_method: str = "spawn",
+    ):
         self.tasks: Dict[str, Dict] = {}
         self.save_file = Path(save_file)
+        self.store = TaskStore(self.save_file.with_suffix(".db"))
+        # Dirty tracking: only these reach the store on the next save
+        self._dirty: set = set()
+        self._deleted: set = set()
+        self._pending_history: List[Tuple[str, str, Dict]] = []
         self.running = False
+        # Timer heap of (next_run timestamp, version, task_id); an entry is live
+        # only while its version is the task's current one
+        self._timers: List[tuple] = []
+        self._versions: Dict[str, int] = {}
+        self._version_counter = itertools.count(1)
+        # Upper bound on one sleep, so wall-clock jumps are noticed eventually
+        self.max_sleep = max_sleep
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Worker pool
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.stop_timeout = stop_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: set = set()
+        self._active: Dict[str, asyncio.Task] = {}
+        # Thread-mode runs that timed out or were cancelled but whose thread is still going
+        self._lingering: Dict[str, Future] = {}
+        self._wait_samples: deque = deque(maxlen=1024)
+        self._exec_samples: deque = deque(maxlen=1024)
+        self.metrics = {"dispatched": 0, "completed": 0, "failed": 0, "timeouts": 0,
+                        "cancelled": 0, "skipped_overlap": 0, "process_crashes": 0,
+                        "process_pool_restarts": 0}
+        # Executors for thread and process mode, created on first use.  Spawned
+        # (not forked) workers, since the agent process runs many threads.
+        self.process_workers = process_workers
+        self.max_result_bytes = max_result_bytes
+        self.process_start_method = process_start_method
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
         self._load_tasks()
 
     def _load_tasks(self):
-        """Load scheduled tasks from file."""
+        """Load scheduled tasks from the store (importing a legacy JSON file once)."""
         try:
-            if self.save_file.exists():
-                with open(self.save_file, 'r') as f:
-                    saved_tasks = json.load(f)
-                for task_id, task in saved_tasks.items():
-                    # Convert stored datetime strings back to datetime objects
-                    if task.get('next_run'):
-                        task['next_run'] = datetime.fromisoformat(task['next_run'])
-                    self.tasks[task_id] = task
-                logging.info(f"Loaded {len(self.tasks)} scheduled tasks - task_scheduler.py:26")
+            legacy_file = self.save_file.with_suffix(".json")
+            if legacy_file.exists() and self.store.get_meta('imported_json') is None:
+                self._import_json(legacy_file)
+                self.store.set_meta('imported_json', str(legacy_file))
+            for task_id, task in self.store.load().items():
+                self.tasks[task_id] = task
+                self._reschedule(task_id)
+            logging.info(f"Loaded {len(self.tasks)} scheduled tasks - task_scheduler.py:26")
         except Exception as e:
             logging.error(f"Error loading scheduled tasks: {e} - task_scheduler.py:28")
 
-    def _save_tasks(self):
-        """Save scheduled tasks to file."""
+    def _import_json(self, legacy_file: Path):
+        with open(legacy_file, 'r') as f:
+            saved_tasks = json.load(f)
+        history = []
+        for task_id, task in saved_tasks.items():
+            # Convert stored datetime strings back to datetime objects
+            if task.get('next_run'):
+                task['next_run'] = datetime.fromisoformat(task['next_run'])
+            for field, kind in _HISTORY_KINDS.items():
+                history.extend((task_id, kind, entry) for entry in task.pop(field, []))
+        self.store.write(saved_tasks, dirty=saved_tasks, history=history)
+        logging.info(f"Imported {len(saved_tasks)} scheduled tasks from {legacy_file}")
+
+    def _save_tasks(self, task_id: Optional[str] = None):
+        """Persist ``task_id`` (if given) and any other pending changes."""
+        if task_id is not None:
+            (self._dirty if task_id in self.tasks else self._deleted).add(task_id)
         try:
-            tasks_to_save = {}
-            for task_id, task in self.tasks.items():
-                task_copy = task.copy()
-                # Convert datetime objects to ISO format strings for JSON serialization
-                if task_copy.get('next_run'):
-                    task_copy['next_run'] = task_copy['next_run'].isoformat()
-                tasks_to_save[task_id] = task_copy
-            
-            with open(self.save_file, 'w') as f:
-                json.dump(tasks_to_save, f, indent=2)
+            self.store.write(self.tasks, self._dirty, self._deleted, self._pending_history)
+            self._dirty.clear()
+            self._deleted.clear()
+            self._pending_history.clear()
         except Exception as e:
+            # Changes stay pending and are retried on the next save
             logging.error(f"Error saving scheduled tasks: {e} - task_scheduler.py:44")
 
-    def schedule_task(self, task_id: str, command: str, schedule: Dict[str, Any], description: str = "") -> bool:
-        """Schedule a new task."""
+    def schedule_task(
+        self,
+        task_id: str,
+        command: str,
+        schedule: Dict[str, Any],
+        description: str = "",
+        timeout: Optional[float] = None,
+        mode: str = "inline",
+        target: Optional[str] = None,
+        args: Optional[List[Any]] = None,
+        kwargs: Optional[Dict[str, Any]] = None,
+        memory_limit_mb: Optional[float] = None,
+        max_result_bytes: Optional[int] = None,
+    ) -> bool:
+        """Schedule a new task; ``timeout`` (seconds) overrides ``default_timeout`` for its runs.
+
+        ``mode`` is ``inline``, ``thread`` or ``process`` (see the module
+        docstring).  With a ``target`` (``"module:function"``) the task calls
+        ``target(*args, **kwargs)`` instead of passing ``command`` to the
+        command handler; process mode requires one.
+        """
         try:
             if task_id in self.tasks:
                 return False
+            if schedule.get('type') == 'cron':
+                # Reject malformed expressions up front rather than never running
+                compile_cron(schedule['cron'], schedule.get('timezone'))
+            execution = {'mode': mode, 'target': target, 'args': list(args or []), 'kwargs': dict(kwargs or {}),
+                         'memory_limit_mb': memory_limit_mb, 'max_result_bytes': max_result_bytes}
+            self._check_execution(execution)
 
             task = {
                 'command': command,
@@ -61,15 +364,45 @@ class TaskScheduler:
                 'failures': 0,
                 'last_error': None
             }
+            if timeout is not None:
+                task['timeout'] = timeout
+            if mode != 'inline':
+                task['mode'] = mode
+            if target is not None:
+                task.update(target=target, args=execution['args'], kwargs=execution['kwargs'])
+            for key in ('memory_limit_mb', 'max_result_bytes'):
+                if execution[key] is not None:
+                    task[key] = execution[key]
             
             self.tasks[task_id] = task
-            self._save_tasks()
+            self._reschedule(task_id)
+            self._save_tasks(task_id)
             logging.info(f"Scheduled new task: {task_id} - task_scheduler.py:67")
             return True
         except Exception as e:
             logging.error(f"Error scheduling task {task_id}: {e} - task_scheduler.py:70")
             return False
 
+    @staticmethod
+    def _check_execution(task: Dict[str, Any]):
+        """Raise ValueError for an unknown mode or a task that cannot run in its mode."""
+        mode = task.get('mode') or 'inline'
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode {mode!r} (expected one of {', '.join(EXECUTION_MODES)})")
+        target = task.get('target')
+        if target is not None:
+            resolve_target(target)
+        if mode == 'process':
+            if target is None:
+                raise ValueError("Process mode needs a 'module:function' target")
+            # Arguments cross the process boundary and are stored as JSON
+            json.dumps([task.get('args', []), task.get('kwargs', {})])
+        for key in ('memory_limit_mb', 'max_result_bytes'):
+            if task.get(key) is not None and task[key] <= 0:
+                raise ValueError(f"{key} must be positive")
+        if task.get('memory_limit_mb') is not None and resource is None:
+            raise ValueError("memory_limit_mb is not supported on this platform (no resource module)")
+
     def _calculate_next_run(self, schedule: Dict[str, Any]) -> Optional[datetime]:
         """Calculate the next run time based on schedule configuration."""
         try:
@@ -106,23 +439,25 @@ class TaskScheduler:
             elif schedule.get('type') == 'monthly':
                 time = schedule['time']
                 day = schedule.get('day', 1)
-                next_run = now.replace(
-                    day=day,
-                    hour=time['hour'],
-                    minute=time.get('minute', 0),
-                    second=time.get('second', 0)
-                )
-                if next_run <= now:
+                year, month = now.year, now.month
+                for _ in range(2):
+                    # Days past the end of a month (31 in April) run on its last day
+                    next_run = now.replace(
+                        year=year,
+                        month=month,
+                        day=min(day, calendar.monthrange(year, month)[1]),
+                        hour=time['hour'],
+                        minute=time.get('minute', 0),
+                        second=time.get('second', 0)
+                    )
+                    if next_run > now:
+                        break
                     # Move to next month
-                    if next_run.month == 12:
-                        next_run = next_run.replace(year=next_run.year + 1, month=1)
-                    else:
-                        next_run = next_run.replace(month=next_run.month + 1)
+                    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
                 return next_run
             elif schedule.get('type') == 'cron':
-                # Basic cron-like scheduling
                 cron = schedule['cron']
-                return self._calculate_cron_next_run(cron, now)
+                return self._calculate_cron_next_run(cron, now, schedule.get('timezone'))
             elif schedule.get('type') == 'conditional':
                 # Conditional scheduling based on system state
                 condition = schedule['condition']
@@ -131,27 +466,16 @@ class TaskScheduler:
             logging.error(f"Error calculating next run time: {e} - task_scheduler.py:130")
             return None
 
-    def _calculate_cron_next_run(self, cron_expr: str, now: datetime) -> Optional[datetime]:
-        """Calculate next run time based on cron expression (basic implementation)."""
+    def _calculate_cron_next_run(self, cron_expr: str, now: datetime, tz: Optional[str] = None) -> Optional[datetime]:
+        """Calculate next run time from a 5/6-field cron expression (see `utils.cron`).
+
+        With ``tz`` the expression is evaluated in that time zone; the
+        result is always naive local time, like every other ``next_run``.
+        """
         try:
-            # Basic cron: minute hour day month weekday
-            parts = cron_expr.split()
-            if len(parts) != 5:
-                return None
-            
-            minute, hour, day, month, weekday = parts
-            
-            next_run = now.replace(second=0, microsecond=0)
-            
-            # Simple implementation - full cron would be more complex
-            if minute != '*':
-                next_run = next_run.replace(minute=int(minute))
-            if hour != '*':
-                next_run = next_run.replace(hour=int(hour))
-            
-            if next_run <= now:
-                next_run += timedelta(days=1)
-            
+            next_run = compile_cron(cron_expr, tz).next_after(now)
+            if next_run is not None and next_run.tzinfo is not None:
+                next_run = next_run.astimezone().replace(tzinfo=None)
             return next_run
         except Exception as e:
             logging.error(f"Error parsing cron expression {cron_expr}: {e}")
@@ -268,25 +592,171 @@ class TaskScheduler:
             'system_health_score': round(system_success_rate * 0.8 + (enabled_tasks / max(total_tasks, 1)) * 20, 2)
         }
 
+    def _reschedule(self, task_id: str) -> None:
+        """Invalidate a task's timer entries and push a new one for its current next_run."""
+        task = self.tasks.get(task_id)
+        if task is None:
+            self._versions.pop(task_id, None)
+        else:
+            version = self._versions[task_id] = next(self._version_counter)
+            if task.get('enabled', True) and task.get('next_run'):
+                heapq.heappush(self._timers, (task['next_run'].timestamp(), version, task_id))
+        # Stale entries are normally dropped as they surface; compact if they pile up
+        if len(self._timers) > 2 * len(self.tasks) + 64:
+            self._timers = [entry for entry in self._timers if self._versions.get(entry[2]) == entry[1]]
+            heapq.heapify(self._timers)
+        self._notify()
+
+    def _notify(self) -> None:
+        """Wake the scheduler loop so it recomputes how long to sleep."""
+        if self._wakeup is None or self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _is_live(self, entry: tuple) -> bool:
+        _, version, task_id = entry
+        return self._versions.get(task_id) == version and self.tasks[task_id].get('enabled', True)
+
+    def _pop_due(self, now: float) -> List[str]:
+        """Remove and return the ids of tasks due at ``now``, earliest first."""
+        due = []
+        while self._timers and self._timers[0][0] <= now:
+            entry = heapq.heappop(self._timers)
+            if self._is_live(entry):
+                # Consumed: the task is re-armed after it runs
+                self._versions[entry[2]] = next(self._version_counter)
+                due.append(entry[2])
+        return due
+
+    def _next_delay(self, now: float) -> Optional[float]:
+        """Seconds until the next live timer, or None when nothing is scheduled."""
+        while self._timers and not self._is_live(self._timers[0]):
+            heapq.heappop(self._timers)
+        if not self._timers:
+            return None
+        return min(max(0.0, self._timers[0][0] - now), self.max_sleep)
+
     async def start(self):
         """Start the task scheduler."""
         self.running = True
-        while self.running:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._queue = asyncio.Queue()
+        workers = [self._loop.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        try:
+            while self.running:
+                try:
+                    # Cleared before looking at the heap so no change in between is missed
+                    self._wakeup.clear()
+                    for task_id in self._pop_due(datetime.now().timestamp()):
+                        self._dispatch(task_id)
+                    delay = self._next_delay(datetime.now().timestamp())
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                except Exception as e:
+                    logging.error(f"Error in task scheduler main loop: {e} - task_scheduler.py:123")
+                    await asyncio.sleep(5)
+        finally:
+            await self._shutdown_workers(workers)
+
+    def _dispatch(self, task_id: str) -> bool:
+        """Queue a run for a worker unless the task is already queued or running."""
+        if task_id in self._queued or task_id in self._active or task_id in self._lingering:
+            self.metrics["skipped_overlap"] += 1
+            logging.info(f"Skipping run of {task_id}: previous run still in progress")
+            return False
+        self._queued.add(task_id)
+        self._queue.put_nowait((task_id, time.perf_counter()))
+        self.metrics["dispatched"] += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            task_id, enqueued_at = await self._queue.get()
+            self._queued.discard(task_id)
+            queue_wait = time.perf_counter() - enqueued_at
+            self._wait_samples.append(queue_wait)
+            # A child task per run, so cancel_run stops the run but not the worker
+            run = asyncio.get_running_loop().create_task(self._execute_task(task_id, queue_wait))
+            self._active[task_id] = run
             try:
-                now = datetime.now()
-                for task_id, task in self.tasks.items():
-                    if (task['enabled'] and task['next_run'] 
-                        and task['next_run'] <= now):
-                        await self._execute_task(task_id)
-                        
-                await asyncio.sleep(1)
-            except Exception as e:
-                logging.error(f"Error in task scheduler main loop: {e} - task_scheduler.py:123")
-                await asyncio.sleep(5)
+                await asyncio.wait({run})
+            finally:
+                if not run.done():
+                    run.cancel()
+                self._active.pop(task_id, None)
+                self._queue.task_done()
+
+    async def _shutdown_workers(self, workers: List[asyncio.Task]):
+        """Let in-flight runs finish (up to ``stop_timeout``), then stop the pool."""
+        if self._active:
+            await asyncio.wait(list(self._active.values()), timeout=self.stop_timeout)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Runs that never got a worker stay due for the next start()
+        for task_id in list(self._queued):
+            self._reschedule(task_id)
+        self._queued.clear()
+        self._close_executors()
+
+    def trigger_task(self, task_id: str) -> bool:
+        """Run a task now (on the running scheduler's loop), outside its schedule."""
+        if task_id not in self.tasks or self._queue is None or not self.running:
+            return False
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return self._dispatch(task_id)
+        return asyncio.run_coroutine_threadsafe(self._dispatch_async(task_id), self._loop).result(5)
+
+    async def _dispatch_async(self, task_id: str) -> bool:
+        return self._dispatch(task_id)
+
+    def cancel_run(self, task_id: str) -> bool:
+        """Cancel the in-flight run of a task; it is recorded as a failure and re-armed."""
+        run = self._active.get(task_id)
+        if run is None or run.done():
+            return False
+        self._loop.call_soon_threadsafe(run.cancel)
+        return True
+
+    def get_scheduler_metrics(self) -> Dict[str, Any]:
+        """Run counters, queue depth and queue-wait vs execution time percentiles (ms)."""
+        def summary(samples):
+            values = sorted(samples)
+            if not values:
+                return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+
+            def pick(p):
+                return values[max(0, math.ceil(p * len(values)) - 1)] * 1000
+
+            return {"p50_ms": round(pick(0.5), 3), "p95_ms": round(pick(0.95), 3), "max_ms": round(values[-1] * 1000, 3)}
+
+        return {
+            **self.metrics,
+            "queued": len(self._queued),
+            "running": sorted(set(self._active) | set(self._lingering)),
+            "max_concurrency": self.max_concurrency,
+            "queue_wait": summary(self._wait_samples),
+            "execution": summary(self._exec_samples),
+        }
 
     async def stop(self):
         """Stop the task scheduler."""
         self.running = False
+        self._notify()
         self._save_tasks()
 
     def register_command_handler(self, handler: Callable[[str], Any]):
@@ -294,23 +764,134 @@ class TaskScheduler:
         self.command_handler = handler
         logging.info("Command handler registered with TaskScheduler - task_scheduler.py:134")
 
-    async def _execute_task(self, task_id: str):
+    async def _run_command(self, task_id: str, task: Dict) -> Any:
+        """Run one task in its execution mode and return the result."""
+        mode = task.get('mode', 'inline')
+        if mode == 'process':
+            return await self._run_in_process(task, task.get('timeout', self.default_timeout) is not None)
+        if task.get('target'):
+            func = resolve_target(task['target'])
+            call = functools.partial(func, *task.get('args', ()), **task.get('kwargs', {}))
+        else:
+            func = self.command_handler
+            call = functools.partial(func, task['command'])
+        if mode == 'thread':
+            if asyncio.iscoroutinefunction(func):
+                raise RuntimeError("Thread mode needs a synchronous command handler or target")
+            future = self._get_thread_pool().submit(call)
+            try:
+                return await asyncio.wrap_future(future)
+            finally:
+                if not future.done():
+                    self._track_lingering(task_id, future)
+        result = call()
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _track_lingering(self, task_id: str, future: Future) -> None:
+        """Keep a task busy until its abandoned thread returns, then re-arm it."""
+        self._lingering[task_id] = future
+        loop = asyncio.get_running_loop()
+
+        def finished(_):
+            try:
+                loop.call_soon_threadsafe(self._thread_finished, task_id, future)
+            except RuntimeError:  # loop already closed
+                pass
+
+        future.add_done_callback(finished)
+
+    def _thread_finished(self, task_id: str, future: Future) -> None:
+        if self._lingering.get(task_id) is future:
+            del self._lingering[task_id]
+            # Timers that fired meanwhile were skipped; run once more if one is due
+            self._reschedule(task_id)
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="task-scheduler")
+        return self._thread_pool
+
+    def _new_process_pool(self, workers: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(self.process_start_method))
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = self._new_process_pool(self.process_workers)
+        return self._process_pool
+
+    def _discard_process_pool(self, pool: ProcessPoolExecutor, kill: bool = False):
+        """Drop a broken or stuck pool; the next process run starts a new one."""
+        if self._process_pool is pool:
+            self._process_pool = None
+            self.metrics["process_pool_restarts"] += 1
+        if kill:
+            # A running call cannot be cancelled, only its worker killed
+            for process in list((getattr(pool, "_processes", None) or {}).values()):
+                process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _close_executors(self):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    async def _run_in_process(self, task: Dict, dedicated: bool = False) -> Any:
+        """Run a process-mode task in the pool, isolating crashes and enforcing limits.
+
+        A ``dedicated`` run (one that may time out) gets a single-worker
+        executor of its own, so killing it leaves the shared pool alone.
+        """
+        spec = {
+            'target': task['target'],
+            'args': list(task.get('args', ())),
+            'kwargs': dict(task.get('kwargs', {})),
+            'memory_limit_mb': task.get('memory_limit_mb'),
+            'max_result_bytes': task.get('max_result_bytes', self.max_result_bytes),
+        }
+        pool = self._new_process_pool(1) if dedicated else self._get_process_pool()
+        try:
+            future = pool.submit(_process_entry, spec)
+            payload = await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self.metrics["process_crashes"] += 1
+            self._discard_process_pool(pool)
+            raise RuntimeError("Worker process crashed") from None
+        except asyncio.CancelledError:
+            # Timed out or cancelled: a run that already started is stopped by killing the workers
+            if not future.done() and not future.cancel():
+                self._discard_process_pool(pool, kill=True)
+            raise
+        finally:
+            if dedicated:
+                pool.shutdown(wait=False, cancel_futures=True)
+        return pickle.loads(payload)
+
+    async def _execute_task(self, task_id: str, queue_wait: float = 0.0):
         """Execute a scheduled task with full integration."""
         if task_id not in self.tasks:
             return
 
         task = self.tasks[task_id]
         start_time = datetime.now()
+        started = time.perf_counter()
+        task['last_queue_wait'] = queue_wait
         
         try:
             # Execute the command through the registered handler
-            if hasattr(self, 'command_handler'):
+            if hasattr(self, 'command_handler') or task.get('target'):
                 logging.info(f"Executing task {task_id}: {task['command']} - task_scheduler.py:147")
                 
-                if asyncio.iscoroutinefunction(self.command_handler):
-                    result = await self.command_handler(task['command'])
-                else:
-                    result = self.command_handler(task['command'])
+                timeout = task.get('timeout', self.default_timeout)
+                try:
+                    result = await asyncio.wait_for(self._run_command(task_id, task), timeout)
+                except asyncio.TimeoutError:
+                    self.metrics["timeouts"] += 1
+                    raise TimeoutError(f"Timed out after {timeout}s") from None
                 
                 # Update task metrics
                 task['last_run'] = start_time.isoformat()
@@ -341,45 +922,64 @@ class TaskScheduler:
                 
             else:
                 raise RuntimeError("No command handler registered")
+            self.metrics["completed"] += 1
             
+        except asyncio.CancelledError:
+            self.metrics["cancelled"] += 1
+            self._record_failure(task_id, task, "Cancelled")
+            logging.warning(f"Task {task_id} was cancelled")
+            raise
+
         except Exception as e:
-            task['failures'] += 1
-            task['last_error'] = str(e)
-            task['last_error_time'] = datetime.now().isoformat()
-            
-            # Update error statistics
-            if 'error_history' not in task:
-                task['error_history'] = []
-            
-            task['error_history'].append({
-                'timestamp': datetime.now().isoformat(),
-                'error': str(e),
-                'command': task['command']
-            })
-            
-            # Keep only last 10 errors
-            task['error_history'] = task['error_history'][-10:]
-            
+            self._record_failure(task_id, task, str(e))
             logging.error(f"Error executing task {task_id}: {e} - task_scheduler.py:202")
         
         finally:
+            self._exec_samples.append(time.perf_counter() - started)
             # Update task execution history
             if 'execution_history' not in task:
                 task['execution_history'] = []
             
-            task['execution_history'].append({
+            entry = {
                 'timestamp': start_time.isoformat(),
                 'duration': (datetime.now() - start_time).total_seconds(),
+                'queue_wait': round(queue_wait, 6),
                 'success': 'last_error' not in task or task['last_error'] is None,
                 'error': task.get('last_error'),
                 'result': task.get('last_result', '')
-            })
+            }
+            task['execution_history'].append(entry)
+            self._pending_history.append((task_id, 'execution', entry))
             
             # Keep only last 10 executions
             task['execution_history'] = task['execution_history'][-10:]
             
-            # Save task state
-            self._save_tasks()
+            self._reschedule(task_id)
+            # Save this task's row and new history entries only
+            self._save_tasks(task_id)
+
+    def _record_failure(self, task_id: str, task: Dict, error: str):
+        self.metrics["failed"] += 1
+        task['failures'] += 1
+        task['last_error'] = error
+        task['last_error_time'] = datetime.now().isoformat()
+        
+        # Update error statistics
+        if 'error_history' not in task:
+            task['error_history'] = []
+        
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'error': error,
+            'command': task['command']
+        }
+        task['error_history'].append(entry)
+        self._pending_history.append((task_id, 'error', entry))
+        
+        # Keep only last 10 errors
+        task['error_history'] = task['error_history'][-10:]
+        # Move on to the next slot rather than retrying immediately
+        task['next_run'] = self._calculate_next_run(task['schedule'])
 
     def get_task(self, task_id: str) -> Optional[Dict]:
         """Get task details by ID."""
@@ -393,7 +993,8 @@ class TaskScheduler:
         """Enable a task."""
         if task_id in self.tasks:
             self.tasks[task_id]['enabled'] = True
-            self._save_tasks()
+            self._reschedule(task_id)
+            self._save_tasks(task_id)
             return True
         return False
 
@@ -401,7 +1002,8 @@ class TaskScheduler:
         """Disable a task."""
         if task_id in self.tasks:
             self.tasks[task_id]['enabled'] = False
-            self._save_tasks()
+            self._reschedule(task_id)
+            self._save_tasks(task_id)
             return True
         return False
 
@@ -409,7 +1011,8 @@ class TaskScheduler:
         """Delete a task."""
         if task_id in self.tasks:
             del self.tasks[task_id]
-            self._save_tasks()
+            self._reschedule(task_id)
+            self._save_tasks(task_id)
             return True
         return False
 
@@ -420,12 +1023,16 @@ class TaskScheduler:
         
         try:
             task = self.tasks[task_id]
+            self._check_execution({**task, **updates})
             for key, value in updates.items():
                 if key == 'schedule':
+                    if value.get('type') == 'cron':
+                        compile_cron(value['cron'], value.get('timezone'))
                     task['next_run'] = self._calculate_next_run(value)
                 task[key] = value
             
-            self._save_tasks()
+            self._reschedule(task_id)
+            self._save_tasks(task_id)
             return True
         except Exception as e:
             logging.error(f"Error updating task {task_id}: {e} - task_scheduler.py:270")
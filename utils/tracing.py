@@ -0,0 +1,304 @@
+"""
+Lightweight in-process span tracing.
+
+A span measures one step of a request (speech-to-text, intent routing,
+``plan_and_act``, an LLM call, a tool, text-to-speech).  The active span is
+kept in a ``contextvars.ContextVar`` so nested spans pick up their parent
+automatically, across ``await`` boundaries, asyncio tasks and
+``asyncio.to_thread``.  A span opened with no active parent starts a new
+trace.
+
+Finished spans go into a ring buffer of the most recent traces, which can
+be summarised per span name (`Tracer.latency_breakdown`) or exported as
+Chrome trace-event JSON (`Tracer.chrome_trace`) for chrome://tracing or
+Perfetto flame views.
+
+    from utils.tracing import span, traced
+
+    with span("voice.stt", engine="google"):
+        text = recognizer.recognize_google(audio)
+
+    @traced("brain.plan_and_act")
+    async def plan_and_act(self, message): ...
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("ultron_current_span", default=None)
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "attributes", "error",
+        "start_wall", "_start", "duration_ms", "thread_name",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_wall = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.thread_name = threading.current_thread().name
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, error: Union[BaseException, str]) -> None:
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def _finish(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": datetime.fromtimestamp(self.start_wall).isoformat(),
+            "duration_ms": self.duration_ms,
+            "attributes": dict(self.attributes),
+            "error": self.error,
+            "thread": self.thread_name,
+        }
+
+
+def current_span() -> Optional[Span]:
+    """The span active in the current context, if any."""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current_span.get()
+    return active.trace_id if active is not None else None
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    rank = max(1, math.ceil(round(p * len(sorted_values), 9)))
+    return sorted_values[rank - 1]
+
+
+class Tracer:
+    """Records finished spans into a ring buffer of the most recent traces."""
+
+    def __init__(self, max_traces: int = 200, max_spans_per_trace: int = 500):
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"spans": 0, "traces_evicted": 0, "spans_dropped": 0}
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as a child of the current span (or as a new trace)."""
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        active = Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+        token = _current_span.set(active)
+        try:
+            yield active
+        except BaseException as e:
+            if active.error is None:
+                active.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            active._finish()
+            self._record(active)
+
+    def _record(self, finished: Span) -> None:
+        with self._lock:
+            self.stats["spans"] += 1
+            spans = self._traces.get(finished.trace_id)
+            if spans is None:
+                spans = self._traces[finished.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+                    self.stats["traces_evicted"] += 1
+            else:
+                self._traces.move_to_end(finished.trace_id)
+            if len(spans) >= self.max_spans_per_trace:
+                self.stats["spans_dropped"] += 1
+                return
+            spans.append(finished)
+
+    def _snapshot(self, trace_ids: Optional[List[str]] = None) -> Dict[str, List[Span]]:
+        with self._lock:
+            if trace_ids is None:
+                return {trace_id: list(spans) for trace_id, spans in self._traces.items()}
+            return {trace_id: list(self._traces[trace_id]) for trace_id in trace_ids if trace_id in self._traces}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """All recorded spans of one trace, in start order."""
+        spans = self._snapshot([trace_id]).get(trace_id, [])
+        return [s.to_dict() for s in sorted(spans, key=lambda s: s._start)]
+
+    def recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Summaries of the most recently active traces, newest first."""
+        summaries = []
+        for trace_id, spans in reversed(list(self._snapshot().items())):
+            if len(summaries) >= limit:
+                break
+            root = next((s for s in spans if s.parent_id is None), None)
+            first = min(spans, key=lambda s: s._start)
+            summaries.append({
+                "trace_id": trace_id,
+                "root": root.name if root is not None else None,
+                "start": datetime.fromtimestamp(first.start_wall).isoformat(),
+                "duration_ms": root.duration_ms if root is not None else None,
+                "span_count": len(spans),
+                "errors": sum(1 for s in spans if s.error),
+            })
+        return summaries
+
+    def latency_breakdown(self, root: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Per span name: count, errors, mean/p50/p95/max duration and mean self time.
+
+        Self time is a span's duration minus the time spent in its recorded
+        children, i.e. the time attributable to that step alone.  With
+        ``root`` only traces whose root span has that name are included.
+        """
+        durations: Dict[str, List[float]] = {}
+        self_times: Dict[str, float] = {}
+        errors: Dict[str, int] = {}
+        for spans in self._snapshot().values():
+            if root is not None and not any(s.parent_id is None and s.name == root for s in spans):
+                continue
+            child_ms: Dict[str, float] = {}
+            for s in spans:
+                if s.parent_id is not None:
+                    child_ms[s.parent_id] = child_ms.get(s.parent_id, 0.0) + s.duration_ms
+            for s in spans:
+                durations.setdefault(s.name, []).append(s.duration_ms)
+                self_times[s.name] = self_times.get(s.name, 0.0) + max(0.0, s.duration_ms - child_ms.get(s.span_id, 0.0))
+                if s.error:
+                    errors[s.name] = errors.get(s.name, 0) + 1
+        breakdown = {}
+        for name, values in durations.items():
+            values.sort()
+            breakdown[name] = {
+                "count": len(values),
+                "errors": errors.get(name, 0),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(_percentile(values, 0.5), 3),
+                "p95_ms": round(_percentile(values, 0.95), 3),
+                "max_ms": round(values[-1], 3),
+                "mean_self_ms": round(self_times[name] / len(values), 3),
+            }
+        return dict(sorted(breakdown.items(), key=lambda item: -item[1]["mean_self_ms"]))
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+    def chrome_trace(self, trace_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Chrome trace-event JSON for the buffered (or selected) traces.
+
+        Each trace gets its own ``tid`` row so concurrent requests do not
+        overlap in the flame view.
+        """
+        events: List[Dict[str, Any]] = []
+        for tid, (trace_id, spans) in enumerate(self._snapshot(trace_ids).items(), start=1):
+            root = next((s for s in spans if s.parent_id is None), None)
+            events.append({
+                "name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                "args": {"name": f"{root.name if root is not None else 'trace'} {trace_id}"},
+            })
+            for s in spans:
+                events.append({
+                    "name": s.name,
+                    "cat": s.name.split(".", 1)[0],
+                    "ph": "X",
+                    "ts": round(s.start_wall * 1_000_000),
+                    "dur": round(s.duration_ms * 1000),
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {
+                        **{k: v if isinstance(v, (str, int, float, bool, type(None))) else str(v)
+                           for k, v in s.attributes.items()},
+                        "trace_id": trace_id, "span_id": s.span_id, "parent_id": s.parent_id,
+                        "thread": s.thread_name, **({"error": s.error} if s.error else {}),
+                    },
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: Union[str, Path], trace_ids: Optional[List[str]] = None) -> Path:
+        """Write `chrome_trace` output to ``path`` (open it in chrome://tracing or ui.perfetto.dev)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(trace_ids), f)
+        logging.info(f"Wrote Chrome trace to {path}")
+        return path
+
+
+# Global tracer instance
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Return the global tracer, creating it on first use."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def init_tracer(**kwargs: Any) -> Tracer:
+    """Replace the global tracer (e.g. with a larger ring buffer)"""
+    global _tracer
+    _tracer = Tracer(**kwargs)
+    return _tracer
+
+
+def span(name: str, **attributes: Any):
+    """Open a span on the global tracer."""
+    return get_tracer().span(name, **attributes)
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable:
+    """Decorator that runs a sync or async function inside a span."""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(span_name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -5,6 +5,7 @@ import asyncio
 from elevenlabs import ElevenLabs
 from tools.audio_manager import AudioManager
 from pathlib import Path
+from utils.tracing import traced, current_span
 
 class VoiceAssistant:
     def stop_voice(self):
@@ -39,6 +40,7 @@ class VoiceAssistant:
         except Exception as e:
             logging.error(f"pyttsx3 initialization failed: {e} - voice.py:40")
 
+    @traced("voice.tts")
     async def speak(self, text: str) -> None:
         if not text:
             return
@@ -53,6 +55,7 @@ class VoiceAssistant:
                     f.write(audio.read())
                 self.audio_manager.play_audio(str(temp_audio))
                 temp_audio.unlink(missing_ok=True)
+                current_span().set_attribute("engine", "elevenlabs")
                 return
             except Exception as e:
                 logging.error(f"ElevenLabs TTS error: {e} - voice.py:58")
@@ -62,6 +65,7 @@ class VoiceAssistant:
             try:
                 self.tts_engine.say(text)
                 self.tts_engine.runAndWait()
+                current_span().set_attribute("engine", "pyttsx3")
                 logging.info(f"Used pyttsx3 direct speech for: {text[:50]}... - voice.py:65")
                 return
             except Exception as e:
@@ -71,6 +75,7 @@ class VoiceAssistant:
         print(f"[Voice]: {text} - voice.py:71")
         logging.warning(f"Voice output failed, using text fallback: {text[:50]}... - voice.py:72")
 
+    @traced("voice.stt")
     def listen(self, timeout: int = 10, phrase_time_limit: int = 10) -> str:
         """
         Listen for speech and return recognized text.
@@ -81,6 +86,7 @@ class VoiceAssistant:
             try:
                 audio = self.audio_manager.record_audio(timeout=timeout, phrase_time_limit=phrase_time_limit)
                 text = self.elevenlabs.speech_to_text(audio)
+                current_span().set_attribute("engine", "elevenlabs")
                 logging.info(f"ElevenLabs STT recognized: {text} - voice.py:84")
                 return text
             except Exception as e:
@@ -93,6 +99,7 @@ class VoiceAssistant:
                 logging.info("Listening for speech (fallback STT)... - voice.py:93")
                 audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
                 text = recognizer.recognize_google(audio)
+                current_span().set_attribute("engine", "google")
                 logging.info(f"Fallback STT recognized: {text} - voice.py:96")
                 return text
         except Exception as e: